@@ -1,13 +1,20 @@
 import chess
+import json
 import random
+import threading
 import time
+import warnings
 from collections import OrderedDict
+from contextlib import contextmanager
+
+from Chess_position import SearchBoard
 
 class LRUCache:
     """Limited-size LRU cache for transposition table"""
     def __init__(self, capacity):
         self.cache = OrderedDict()
         self.capacity = capacity
+        self.evictions = 0
 
     def get(self, key):
         if key not in self.cache:
@@ -20,224 +27,976 @@ class LRUCache:
         self.cache.move_to_end(key)
         if len(self.cache) > self.capacity:
             self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.cache.clear()
+
+# The stop event is checked every STOP_CHECK_NODES nodes (a node takes well
+# under a millisecond, so a stop request is honoured within a few ms)
+STOP_CHECK_NODES = 8
+
+# Mate scores are MATE_SCORE minus the distance to the mate in plies, so a
+# shorter mate scores higher; any score beyond MATE_THRESHOLD is a mate score
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+
+
+def score_to_tt(score, ply):
+    """Mate scores are stored relative to the node, not the root, so they stay valid at any ply"""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """Inverse of score_to_tt for a node at the given ply"""
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when a node limit is reached or a stop is requested
+    find_mate lets it through when it stops before the puzzle is decided.
+    """
+    pass
+
+class SearchStats:
+    """Result and statistics of a single search"""
+    def __init__(self):
+        # Result: best move, its score for the side to move and the principal variation
+        self.best_move = None
+        self.score = None
+        self.depth = 0
+        self.pv = []
+        
+        # MultiPV result: ranked (move, score, pv) for the best root moves
+        # of the last completed depth (only the best one in single-PV mode)
+        self.lines = []
+        
+        # Node counts, in total and for each completed iteration; qnodes
+        # are the part of nodes spent in the quiescence search
+        self.nodes = 0
+        self.qnodes = 0
+        self.depth_nodes = []
+        self.eval_calls = 0
+        
+        # Transposition table usage. Keys are SearchBoard.key() tuples of the
+        # whole position, not hashes, so two positions never share an entry:
+        # tt_evictions (entries dropped by the LRU) takes the place of a
+        # collision counter
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.tt_evictions = 0
+        
+        # Beta cutoffs, and how many of them came from the first move tried
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        
+        # True if the search ended early (node limit or stop request)
+        self.aborted = False
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0
+
+    @property
+    def mate(self):
+        """Moves until mate if the score is a mate score (negative when getting mated), else None"""
+        if self.score is None or abs(self.score) <= MATE_THRESHOLD:
+            return None
+        moves = (MATE_SCORE - abs(self.score) + 1) // 2
+        return moves if self.score > 0 else -moves
+
+    def snapshot(self):
+        """Copy of the statistics that later search progress does not change"""
+        copy = SearchStats.__new__(SearchStats)
+        copy.__dict__.update(self.__dict__)
+        copy.pv = list(self.pv)
+        copy.lines = list(self.lines)
+        copy.depth_nodes = list(self.depth_nodes)
+        return copy
+
+    def as_dict(self):
+        """Plain dict of the statistics, e.g. for JSON logging"""
+        return {
+            'best_move': self.best_move.uci() if self.best_move else None,
+            'score': self.score,
+            'mate': self.mate,
+            'depth': self.depth,
+            'pv': [move.uci() for move in self.pv],
+            'lines': [{'move': move.uci(), 'score': score, 'pv': [m.uci() for m in pv]}
+                      for move, score, pv in self.lines],
+            'nodes': self.nodes,
+            'depth_nodes': list(self.depth_nodes),
+            'qnodes': self.qnodes,
+            'eval_calls': self.eval_calls,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_stores': self.tt_stores,
+            'tt_evictions': self.tt_evictions,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'elapsed': self.elapsed,
+            'nps': self.nps,
+            'aborted': self.aborted,
+        }
+
+    def report(self, title="Bot Move Analysis"):
+        """Human-readable summary of the search"""
+        pv = ' '.join(move.uci() for move in self.pv)
+        lines = [f"  {rank}. {move.uci()} {score} ({' '.join(m.uci() for m in line_pv)})"
+                 for rank, (move, score, line_pv) in enumerate(self.lines, 1)]
+        return '\n'.join([
+            f"{title}:",
+            f"- Depth: {self.depth} (nodes per iteration: {self.depth_nodes})",
+            f"- Score: {self.score}" + (f" (mate in {self.mate})" if self.mate else ""),
+            f"- PV: {pv}",
+        ] + (["- Lines:"] + lines if len(self.lines) > 1 else []) + [
+            f"- Nodes evaluated: {self.nodes} ({self.qnodes} quiescence, {self.eval_calls} evaluations)",
+            f"- Cache hits: {self.tt_hits}/{self.tt_probes} ({self.tt_hit_rate:.1%}), "
+            f"{self.tt_stores} stores, {self.tt_evictions} evictions",
+            f"- Beta cutoffs: {self.beta_cutoffs} ({self.first_move_cutoff_rate:.1%} on first move)",
+            f"- Time taken: {self.elapsed:.2f} seconds",
+            f"- Nodes per second: {self.nps:.0f}",
+        ])
+
+# Difficulty levels. Strength comes from the search budget rather than a
+# fixed depth: iterative deepening runs until max_depth, max_nodes or
+# max_time is reached, whichever comes first. eval_noise (centipawns) is the
+# standard deviation of a random offset given to each root move per search,
+# which makes weaker levels pick plausible second-best moves. p50 and p99 are
+# the think-time targets (seconds) that Chess_bench.py --latency checks.
+DIFFICULTY_LEVELS = {
+    'easy': {'max_depth': 3, 'max_nodes': 600, 'max_time': 0.3, 'eval_noise': 120,
+             'p50': 0.3, 'p99': 0.4},
+    'medium': {'max_depth': 5, 'max_nodes': 4000, 'max_time': 1.0, 'eval_noise': 30,
+               'p50': 1.05, 'p99': 1.2},
+    'hard': {'max_depth': 8, 'max_nodes': 20000, 'max_time': 3.0, 'eval_noise': 0,
+             'p50': 3.1, 'p99': 3.3},
+}
+
+# Transposition table size for each difficulty
+TT_SIZES = {'easy': 10000, 'medium': 100000, 'hard': 1000000}
+
+# With a time budget, no new iteration is started once this fraction of the
+# budget is used up: it would most likely be aborted before it finishes
+ITERATION_TIME_FRACTION = 0.5
+
+# Static evaluators: 'classic' scores leaves one at a time with evaluate_board;
+# 'batch' scores all children of a frontier node in one NumPy call (see Chess_eval);
+# 'nnue' scores leaves with a small network updated on every move (see Chess_nnue)
+EVALUATORS = ('classic', 'batch', 'nnue')
+
+# Piece values
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 20000
+}
+
+# Piece-square tables for positional evaluation, as seen by white with a8
+# first: white reads entry 63 - square, black reads entry square
+PAWN_TABLE = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5,  5, 10, 25, 25, 10,  5,  5,
+    0,  0,  0, 20, 20,  0,  0,  0,
+    5, -5,-10,  0,  0,-10, -5,  5,
+    5, 10, 10,-20,-20, 10, 10,  5,
+    0,  0,  0,  0,  0,  0,  0,  0,
+)
+
+KNIGHT_TABLE = (
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50,
+)
+
+BISHOP_TABLE = (
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5,  5,  5,  5,  5,-10,
+    -10,  0,  5,  0,  0,  5,  0,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20,
+)
+
+ROOK_TABLE = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    0,  0,  0,  5,  5,  0,  0,  0,
+)
+
+QUEEN_TABLE = (
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+    -5,  0,  5,  5,  5,  5,  0, -5,
+    0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20,
+)
+
+KING_TABLE_MIDDLEGAME = (
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+    20, 20,  0,  0,  0,  0, 20, 20,
+    20, 30, 10,  0,  0, 10, 30, 20,
+)
+
+KING_TABLE_ENDGAME = (
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50,
+)
+
+PIECE_TABLES = {
+    chess.PAWN: PAWN_TABLE,
+    chess.KNIGHT: KNIGHT_TABLE,
+    chess.BISHOP: BISHOP_TABLE,
+    chess.ROOK: ROOK_TABLE,
+    chess.QUEEN: QUEEN_TABLE,
+    chess.KING: KING_TABLE_MIDDLEGAME
+}
+
+
+# Weights of the evaluate_board terms that are not piece values or tables
+TERM_WEIGHTS = {'mobility': 0.1, 'king_safety': 0.2, 'pawn_structure': 0.1}
+
+
+def _square_tables(king_table, piece_tables=PIECE_TABLES):
+    """
+    Signed tables indexed [color][piece_type][square], ready to be summed
+    Black entries are the flipped table negated, so no per-piece branching is needed.
+    """
+    tables = [[None] * 7, [None] * 7]
+    for piece_type, table in piece_tables.items():
+        if piece_type == chess.KING:
+            table = king_table
+        tables[chess.WHITE][piece_type] = tuple(table[63 - square] for square in chess.SQUARES)
+        tables[chess.BLACK][piece_type] = tuple(-table[square] for square in chess.SQUARES)
+    return tuple(tuple(color_tables) for color_tables in tables)
+
+
+SQUARE_TABLES_MIDDLEGAME = _square_tables(KING_TABLE_MIDDLEGAME)
+SQUARE_TABLES_ENDGAME = _square_tables(KING_TABLE_ENDGAME)
+
+
+class EvalParams:
+    """
+    The tunable constants of evaluate_board: piece values, piece-square tables
+    (a8 first like PAWN_TABLE; the king entry is the middlegame table) and the
+    weights of the other terms. Chess_tune.py fits them to game results and
+    saves them as JSON, which load() reads back; missing entries keep the defaults.
+    """
+    def __init__(self, piece_values=None, piece_tables=None, king_table_endgame=None,
+                 term_weights=None):
+        self.piece_values = dict(PIECE_VALUES)
+        self.piece_values.update(piece_values or {})
+        self.piece_tables = dict(PIECE_TABLES)
+        self.piece_tables.update({piece_type: tuple(table)
+                                  for piece_type, table in (piece_tables or {}).items()})
+        self.king_table_endgame = tuple(king_table_endgame or KING_TABLE_ENDGAME)
+        self.term_weights = dict(TERM_WEIGHTS)
+        self.term_weights.update(term_weights or {})
+        self.square_tables_middlegame = _square_tables(self.piece_tables[chess.KING],
+                                                       self.piece_tables)
+        self.square_tables_endgame = _square_tables(self.king_table_endgame, self.piece_tables)
+    
+    @classmethod
+    def load(cls, path):
+        with open(path) as stream:
+            data = json.load(stream)
+        piece_types = {chess.piece_name(piece_type): piece_type for piece_type in chess.PIECE_TYPES}
+        return cls({piece_types[name]: value for name, value in data.get('piece_values', {}).items()},
+                   {piece_types[name]: table for name, table in data.get('piece_tables', {}).items()},
+                   data.get('king_table_endgame'), data.get('term_weights'))
+    
+    def as_dict(self):
+        """Plain dict in the JSON layout load() reads"""
+        return {
+            'piece_values': {chess.piece_name(piece_type): value
+                             for piece_type, value in self.piece_values.items()},
+            'piece_tables': {chess.piece_name(piece_type): list(table)
+                             for piece_type, table in self.piece_tables.items()},
+            'king_table_endgame': list(self.king_table_endgame),
+            'term_weights': dict(self.term_weights),
+        }
+    
+    def save(self, path):
+        """Write as JSON with one table per line"""
+        sections = []
+        for key, value in self.as_dict().items():
+            if isinstance(value, dict):
+                entries = ",\n".join(f"  {json.dumps(name)}: {json.dumps(entry)}"
+                                     for name, entry in value.items())
+                sections.append(f" {json.dumps(key)}: {{\n{entries}\n }}")
+            else:
+                sections.append(f" {json.dumps(key)}: {json.dumps(value)}")
+        with open(path, 'w') as stream:
+            stream.write("{\n" + ",\n".join(sections) + "\n}\n")
+
+
+DEFAULT_EVAL_PARAMS = EvalParams()
+
+# Files next to each file, for the isolated pawn test
+ADJACENT_FILES = tuple((chess.BB_FILES[file - 1] if file > 0 else 0) |
+                       (chess.BB_FILES[file + 1] if file < 7 else 0) for file in range(8))
+
 
 class ChessBot:
-    def __init__(self, difficulty='medium'):
+    def __init__(self, difficulty='medium', verbose=False, profile=None, evaluator='classic',
+                 nnue_weights=None, params=None):
         """
         Initialize chess bot with difficulty level
         :param difficulty: 'easy', 'medium', or 'hard'
+        :param verbose: print search statistics after each move
+        :param profile: profile every search: 'cprofile', 'timers' or a Chess_profile.SearchProfiler
+        :param evaluator: static evaluator, one of EVALUATORS ('batch' and 'nnue' need NumPy)
+        :param nnue_weights: .npz network for evaluator='nnue' (default: Chess_nnue.DEFAULT_WEIGHTS);
+                             if it cannot be loaded the bot warns and uses 'classic'
+        :param params: EvalParams, or the path of a JSON file from Chess_tune.py, for
+                       the classic and batch evaluators (default: the built-in constants)
         """
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"Unknown evaluator: {evaluator}")
         self.difficulty = difficulty
-        # Set search depth based on difficulty
-        if difficulty == 'easy':
-            self.max_depth = 2
-        elif difficulty == 'medium':
-            self.max_depth = 3
-        else:  # hard
-            self.max_depth = 4
-            
-        # Initialize transposition table with appropriate size for each difficulty
-        if difficulty == 'easy':
-            self.transposition_table = LRUCache(10000)  # Smaller cache for easy
-        elif difficulty == 'medium':
-            self.transposition_table = LRUCache(100000)  # Medium-sized cache
-        else:  # hard
-            self.transposition_table = LRUCache(1000000)  # Large cache for hard
-            
-        # Piece values
-        self.piece_values = {
-            chess.PAWN: 100,
-            chess.KNIGHT: 320,
-            chess.BISHOP: 330,
-            chess.ROOK: 500,
-            chess.QUEEN: 900,
-            chess.KING: 20000
-        }
+        self.verbose = verbose
+        self.transposition_table = LRUCache(TT_SIZES[difficulty])
         
-        # Piece-square tables for positional evaluation
-        self.pawn_table = [
-            0,  0,  0,  0,  0,  0,  0,  0,
-            50, 50, 50, 50, 50, 50, 50, 50,
-            10, 10, 20, 30, 30, 20, 10, 10,
-            5,  5, 10, 25, 25, 10,  5,  5,
-            0,  0,  0, 20, 20,  0,  0,  0,
-            5, -5,-10,  0,  0,-10, -5,  5,
-            5, 10, 10,-20,-20, 10, 10,  5,
-            0,  0,  0,  0,  0,  0,  0,  0
-        ]
-        
-        self.knight_table = [
-            -50,-40,-30,-30,-30,-30,-40,-50,
-            -40,-20,  0,  0,  0,  0,-20,-40,
-            -30,  0, 10, 15, 15, 10,  0,-30,
-            -30,  5, 15, 20, 20, 15,  5,-30,
-            -30,  0, 15, 20, 20, 15,  0,-30,
-            -30,  5, 10, 15, 15, 10,  5,-30,
-            -40,-20,  0,  5,  5,  0,-20,-40,
-            -50,-40,-30,-30,-30,-30,-40,-50,
-        ]
-        
-        self.bishop_table = [
-            -20,-10,-10,-10,-10,-10,-10,-20,
-            -10,  0,  0,  0,  0,  0,  0,-10,
-            -10,  0, 10, 10, 10, 10,  0,-10,
-            -10,  5,  5, 10, 10,  5,  5,-10,
-            -10,  0,  5, 10, 10,  5,  0,-10,
-            -10,  5,  5,  5,  5,  5,  5,-10,
-            -10,  0,  5,  0,  0,  5,  0,-10,
-            -20,-10,-10,-10,-10,-10,-10,-20,
-        ]
-        
-        self.rook_table = [
-            0,  0,  0,  0,  0,  0,  0,  0,
-            5, 10, 10, 10, 10, 10, 10,  5,
-            -5,  0,  0,  0,  0,  0,  0, -5,
-            -5,  0,  0,  0,  0,  0,  0, -5,
-            -5,  0,  0,  0,  0,  0,  0, -5,
-            -5,  0,  0,  0,  0,  0,  0, -5,
-            -5,  0,  0,  0,  0,  0,  0, -5,
-            0,  0,  0,  5,  5,  0,  0,  0
-        ]
-        
-        self.queen_table = [
-            -20,-10,-10, -5, -5,-10,-10,-20,
-            -10,  0,  0,  0,  0,  0,  0,-10,
-            -10,  0,  5,  5,  5,  5,  0,-10,
-            -5,  0,  5,  5,  5,  5,  0, -5,
-            0,  0,  5,  5,  5,  5,  0, -5,
-            -10,  5,  5,  5,  5,  5,  0,-10,
-            -10,  0,  5,  0,  0,  0,  0,-10,
-            -20,-10,-10, -5, -5,-10,-10,-20
-        ]
-        
-        self.king_table_middlegame = [
-            -30,-40,-40,-50,-50,-40,-40,-30,
-            -30,-40,-40,-50,-50,-40,-40,-30,
-            -30,-40,-40,-50,-50,-40,-40,-30,
-            -30,-40,-40,-50,-50,-40,-40,-30,
-            -20,-30,-30,-40,-40,-30,-30,-20,
-            -10,-20,-20,-20,-20,-20,-20,-10,
-            20, 20,  0,  0,  0,  0, 20, 20,
-            20, 30, 10,  0,  0, 10, 30, 20
-        ]
-        
-        self.king_table_endgame = [
-            -50,-40,-30,-20,-20,-30,-40,-50,
-            -30,-20,-10,  0,  0,-10,-20,-30,
-            -30,-10, 20, 30, 30, 20,-10,-30,
-            -30,-10, 30, 40, 40, 30,-10,-30,
-            -30,-10, 30, 40, 40, 30,-10,-30,
-            -30,-10, 20, 30, 30, 20,-10,-30,
-            -30,-30,  0,  0,  0,  0,-30,-30,
-            -50,-30,-30,-30,-30,-30,-30,-50
-        ]
-        
-        self.piece_tables = {
-            chess.PAWN: self.pawn_table,
-            chess.KNIGHT: self.knight_table,
-            chess.BISHOP: self.bishop_table,
-            chess.ROOK: self.rook_table,
-            chess.QUEEN: self.queen_table,
-            chess.KING: self.king_table_middlegame
-        }
+        # Shared module-level tables
+        self.piece_values = PIECE_VALUES
+        self.piece_tables = PIECE_TABLES
+        
+        # Constants of the static evaluation, see EvalParams
+        if params is None:
+            params = DEFAULT_EVAL_PARAMS
+        elif not isinstance(params, EvalParams):
+            params = EvalParams.load(params)
+        self.eval_params = params
+        
+        # Statistics of the current (or last) search
+        self.stats = SearchStats()
+        
+        # Search budget (max_depth, max_nodes, max_time, eval_noise), see DIFFICULTY_LEVELS
+        self.apply_level()
         
-        # Statistics for performance monitoring
-        self.nodes_evaluated = 0
-        self.cache_hits = 0
-        self.start_time = 0
+        # Stop event and time limit of the running search, see search()
+        self.stop_event = None
+        self.deadline = None
+        
+        # Ply of the root position of the running search (for mate distances)
+        self.root_ply = 0
+        
+        # Repetition keys of the game positions since the last irreversible
+        # move and of the positions on the current search path, oldest first
+        self.key_history = []
+        
+        # Vectorized evaluator for evaluator='batch'
+        self.evaluator = evaluator
+        self.batch_evaluator = None
+        if evaluator == 'batch':
+            from Chess_eval import BatchEvaluator
+            self.batch_evaluator = BatchEvaluator(params)
+        
+        # Network for evaluator='nnue'; the search then runs on its NNUEBoard
+        self.network = None
+        if evaluator == 'nnue':
+            try:
+                from Chess_nnue import Network, DEFAULT_WEIGHTS
+                self.network = Network.load(nnue_weights or DEFAULT_WEIGHTS)
+            except (ImportError, OSError, KeyError, ValueError) as error:
+                warnings.warn(f"NNUE evaluator unavailable ({error}), using the classic evaluator")
+                self.evaluator = 'classic'
+        
+        # Optional search profiler, see Chess_profile
+        self.profiler = None
+        if profile:
+            from Chess_profile import SearchProfiler
+            self.profiler = profile if isinstance(profile, SearchProfiler) else SearchProfiler(profile)
+    
+    def apply_level(self):
+        """Set the search budget from the bot's difficulty level"""
+        level = DIFFICULTY_LEVELS[self.difficulty]
+        self.max_depth = level['max_depth']
+        self.max_nodes = level['max_nodes']
+        self.max_time = level['max_time']
+        self.eval_noise = level['eval_noise']
     
-    def get_best_move(self, board):
+    def set_fixed_depth(self, depth):
+        """Search exactly to depth, without node or time budget or noise (benchmarks, analysis)"""
+        self.max_depth = depth
+        self.max_nodes = None
+        self.max_time = None
+        self.eval_noise = 0
+    
+    def reset(self):
+        """Forget everything from previous games so the bot can start a new one"""
+        self.apply_level()
+        self.transposition_table.clear()
+        self.stats = SearchStats()
+        self.stop_event = None
+    
+    def get_best_move(self, board, on_info=None, stop_event=None):
         """Find the best move using minimax with alpha-beta pruning and transposition table"""
-        self.nodes_evaluated = 0
-        self.cache_hits = 0
-        self.start_time = time.time()
+        return self.search(board, on_info, stop_event).best_move
+    
+    def get_top_moves(self, board, count=3, on_info=None, stop_event=None):
+        """Ranked (move, score, pv) for the best count moves, from a single MultiPV search"""
+        return self.search(board, on_info, stop_event, multipv=count).lines
+    
+    def search(self, board, on_info=None, stop_event=None, multipv=1):
+        """
+        Search the position with iterative deepening within the bot's budget
+        (max_depth, max_nodes and max_time)
+        :param on_info: optional callback, called with the SearchStats after each completed depth
+        :param stop_event: optional threading.Event; setting it (e.g. from another
+                           thread) ends the search early with the best move found so far
+        :param multipv: number of best root moves to score exactly (see SearchStats.lines)
+        The search runs on a SearchBoard copy of board, so board is not touched.
+        :return: SearchStats holding the best move, score, PV and search statistics
+        """
+        if not self.profiler:
+            return self.run_search(board, on_info, stop_event, multipv)
         
-        # For easy difficulty, sometimes make a random legal move
-        if self.difficulty == 'easy' and random.random() < 0.3:
-            legal_moves = list(board.legal_moves)
-            return random.choice(legal_moves)
+        self.profiler.start_search(self, board)
+        try:
+            return self.run_search(board, on_info, stop_event, multipv)
+        finally:
+            self.profiler.end_search(self, board)
+    
+    def run_search(self, board, on_info, stop_event=None, multipv=1):
+        """Iterative deepening loop behind search()"""
+        stats = SearchStats()
+        self.stats = stats
+        self.stop_event = stop_event
+        # The time limit only applies once depth 1 has produced a move
+        self.deadline = None
         
-        best_move = None
-        alpha = float('-inf')
+        self.key_history = self.game_keys(board)
+        board = self.network.board(board) if self.network else SearchBoard.from_board(board)
+        
+        # Random offset per root move for the weaker levels, fixed for the whole search
+        root_noise = {}
+        if self.eval_noise:
+            root_noise = {move: random.gauss(0, self.eval_noise) for move in board.legal_moves}
+        
+        evictions = self.transposition_table.evictions
+        root_ply = self.root_ply = len(board.move_stack)
+        try:
+            for depth in range(1, self.max_depth + 1):
+                nodes_before = stats.nodes
+                lines = self.search_root(board, depth, stats, root_noise, multipv)
+                
+                stats.depth = depth
+                stats.depth_nodes.append(stats.nodes - nodes_before)
+                stats.lines = [(move, score, self.extract_pv(board, move, depth))
+                               for move, score in lines]
+                stats.pv = stats.lines[0][2] if stats.lines else []
+                stats.elapsed = time.time() - stats.start_time
+                if on_info:
+                    on_info(stats)
+                
+                # A forced mate found at this depth cannot get shorter by searching deeper
+                if stats.score is not None and stats.score > MATE_THRESHOLD:
+                    break
+                
+                if self.max_time:
+                    if stats.elapsed > self.max_time * ITERATION_TIME_FRACTION:
+                        break
+                    self.deadline = stats.start_time + self.max_time
+        except SearchAborted:
+            # Node limit or stop request: unwind the board and keep the best move found so far
+            stats.aborted = True
+            while len(board.move_stack) > root_ply:
+                board.pop()
+        
+        if not stats.best_move:
+            stats.best_move = random.choice(list(board.legal_moves))
+        stats.tt_evictions = self.transposition_table.evictions - evictions
+        stats.elapsed = time.time() - stats.start_time
+        
+        if self.verbose:
+            print(stats.report(f"Bot Move Analysis ({self.difficulty} difficulty)"))
+        
+        return stats
+    
+    def search_root(self, board, depth, stats, root_noise=None, multipv=1):
+        """
+        Search all root moves to the given depth
+        The lines of the previous iteration are searched first, so
+        stats.best_move stays valid if the iteration is aborted part way.
+        root_noise maps moves to score offsets; each move is searched with the
+        window shifted by its offset, so the offsets take part in the pruning.
+        :return: ranked (move, score) of the best multipv moves
+        """
         beta = float('inf')
-        max_eval = float('-inf')
+        # (score including noise, score, move) of the best moves so far, best first
+        best = []
         
         # Order moves to improve alpha-beta pruning efficiency
-        moves = self.order_moves(board)
+        moves = self.order_moves(board, stats.best_move)
+        previous = [line[0] for line in stats.lines]
+        if len(previous) > 1:
+            moves = previous + [move for move in moves if move not in previous]
         
         for move in moves:
+            # Once multipv moves are scored, a move only needs an exact score
+            # if it beats the worst of them, so that score is the lower bound
+            alpha = best[-1][0] if len(best) == multipv else float('-inf')
+            noise = root_noise.get(move, 0) if root_noise else 0
             board.push(move)
-            eval = self.minimax(board, self.max_depth - 1, alpha, beta, False)
+            eval = self.minimax(board, depth - 1, alpha - noise, beta - noise, False)
             board.pop()
             
-            if eval > max_eval:
-                max_eval = eval
-                best_move = move
-            
-            alpha = max(alpha, eval)
+            if eval + noise > alpha:
+                if len(best) == multipv:
+                    best.pop()
+                index = 0
+                while index < len(best) and best[index][0] >= eval + noise:
+                    index += 1
+                best.insert(index, (eval + noise, eval, move))
+                if index == 0:
+                    stats.best_move = move
+                    stats.score = eval
+        
+        return [(move, score) for _noisy, score, move in best]
+    
+    def extract_pv(self, board, first_move, max_length):
+        """Follow the best moves stored in the transposition table to build the principal variation"""
+        if not first_move:
+            return []
         
-        end_time = time.time()
-        print(f"Bot Move Analysis ({self.difficulty} difficulty):")
-        print(f"- Nodes evaluated: {self.nodes_evaluated}")
-        print(f"- Cache hits: {self.cache_hits}")
-        print(f"- Time taken: {end_time - self.start_time:.2f} seconds")
-        print(f"- Nodes per second: {self.nodes_evaluated / (end_time - self.start_time):.0f}")
+        pv = [first_move]
+        board.push(first_move)
+        while len(pv) < max_length:
+            entry = self.transposition_table.get(self.get_board_hash(board))
+            if not entry or not entry[2] or not board.is_legal(entry[2]):
+                break
+            pv.append(entry[2])
+            board.push(entry[2])
         
-        return best_move if best_move else random.choice(list(board.legal_moves))
+        for _ in pv:
+            board.pop()
+        return pv
+    
+    def game_keys(self, board):
+        """Repetition keys of the game positions since the last irreversible move, ending with board"""
+        replay = board.copy()
+        keys = [SearchBoard.from_board(replay).key()]
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            replay.pop()
+            keys.append(SearchBoard.from_board(replay).key())
+        keys.reverse()
+        return keys
+    
+    def is_repetition(self, key, halfmove_clock):
+        """
+        True if the position repeats one on the search path or earlier in the game
+        Only the positions since the last capture or pawn move (halfmove_clock
+        plies) can repeat, and only every other one has the same side to move.
+        """
+        history = self.key_history
+        length = len(history)
+        for index in range(length - 2, max(length - halfmove_clock, 0) - 1, -2):
+            if history[index] == key:
+                return True
+        return False
     
-    def minimax(self, board, depth, alpha, beta, is_maximizing):
-        """Minimax algorithm with alpha-beta pruning and transposition table"""
-        self.nodes_evaluated += 1
+    def count_node(self):
+        """Count a search node; raises SearchAborted at the node limit, deadline or a stop request"""
+        stats = self.stats
+        stats.nodes += 1
+        if self.max_nodes and stats.nodes > self.max_nodes:
+            raise SearchAborted()
+        if stats.nodes % STOP_CHECK_NODES == 0:
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchAborted()
+            if self.deadline is not None and time.time() >= self.deadline:
+                raise SearchAborted()
+    
+    def minimax(self, board, depth, alpha, beta, is_maximizing, static_eval=None):
+        """
+        Minimax algorithm with alpha-beta pruning and transposition table
+        :param static_eval: evaluate_board score of the position if already known
+        """
+        stats = self.stats
+        self.count_node()
+        ply = len(board.move_stack) - self.root_ply
         
-        # Check for terminal state
+        # Check for terminal state; nearer mates score higher
         if board.is_checkmate():
-            return -10000 if is_maximizing else 10000
+            return -(MATE_SCORE - ply) if is_maximizing else MATE_SCORE - ply
         elif board.is_stalemate() or board.is_insufficient_material():
             return 0
         
-        # Transposition table lookup
+        # Draws by the fifty-move rule or repetition end the line at once, so
+        # the search does not walk into avoidable draws or search cycles
+        if board.halfmove_clock >= 100:
+            return 0
         board_hash = self.get_board_hash(board)
+        if self.is_repetition(board_hash, board.halfmove_clock):
+            return 0
+        
+        # Mate distance pruning: no line from here can mate sooner than next
+        # ply, so a window outside those bounds cannot be improved on
+        mate_bound = MATE_SCORE - ply - 1
+        if alpha >= mate_bound or beta <= -mate_bound:
+            return mate_bound if alpha >= mate_bound else -mate_bound
+        
+        # Transposition table lookup
+        # Entries are (depth, score, best move), with mate scores relative to the node
+        stats.tt_probes += 1
         cached_entry = self.transposition_table.get(board_hash)
         if cached_entry and cached_entry[0] >= depth:
-            self.cache_hits += 1
-            return cached_entry[1]
+            stats.tt_hits += 1
+            return score_from_tt(cached_entry[1], ply)
         
-        # Leaf node evaluation
+        # Leaf node: resolve pending captures before evaluating. The result
+        # depends on the window, so it is not stored in the transposition table
         if depth == 0:
-            evaluation = self.evaluate_board(board)
-            self.transposition_table.put(board_hash, (depth, evaluation))
-            return evaluation
+            return self.quiescence(board, alpha, beta, is_maximizing, static_eval)
         
-        # Order moves to improve alpha-beta pruning efficiency
-        moves = self.order_moves(board)
+        # Order moves to improve alpha-beta pruning efficiency, trying the
+        # best move from a shallower search of this position first
+        moves = self.order_moves(board, cached_entry[2] if cached_entry else None)
+        best_move = None
+        self.key_history.append(board_hash)
+        
+        # Frontier node: the children are leaves, so they are scored in one
+        # batch, but only once the first move failed to cause a cutoff
+        static_evals = None
+        batch_children = depth == 1 and self.batch_evaluator is not None and len(moves) > 2
         
         if is_maximizing:
             max_eval = float('-inf')
-            for move in moves:
+            for index, move in enumerate(moves):
+                if index == 1 and batch_children:
+                    static_evals = [None] + self.evaluate_children(board, moves[1:])
                 board.push(move)
-                eval = self.minimax(board, depth - 1, alpha, beta, False)
+                eval = self.minimax(board, depth - 1, alpha, beta, False,
+                                    static_evals[index] if static_evals else None)
                 board.pop()
-                max_eval = max(max_eval, eval)
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    stats.beta_cutoffs += 1
+                    if index == 0:
+                        stats.first_move_cutoffs += 1
                     break
-            self.transposition_table.put(board_hash, (depth, max_eval))
+            self.key_history.pop()
+            stats.tt_stores += 1
+            self.transposition_table.put(board_hash, (depth, score_to_tt(max_eval, ply), best_move))
             return max_eval
         else:
             min_eval = float('inf')
-            for move in moves:
+            for index, move in enumerate(moves):
+                if index == 1 and batch_children:
+                    static_evals = [None] + self.evaluate_children(board, moves[1:])
                 board.push(move)
-                eval = self.minimax(board, depth - 1, alpha, beta, True)
+                eval = self.minimax(board, depth - 1, alpha, beta, True,
+                                    static_evals[index] if static_evals else None)
                 board.pop()
-                min_eval = min(min_eval, eval)
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    stats.beta_cutoffs += 1
+                    if index == 0:
+                        stats.first_move_cutoffs += 1
                     break
-            self.transposition_table.put(board_hash, (depth, min_eval))
+            self.key_history.pop()
+            stats.tt_stores += 1
+            self.transposition_table.put(board_hash, (depth, score_to_tt(min_eval, ply), best_move))
             return min_eval
     
-    def order_moves(self, board):
-        """Order moves to improve alpha-beta pruning efficiency"""
+    def quiescence(self, board, alpha, beta, is_maximizing, static_eval=None):
+        """
+        Search captures only until the position is quiet
+        The side to move may stand pat on the static evaluation; captures
+        that lose material by static exchange evaluation are pruned.
+        :param static_eval: evaluate_board score of the position if already known
+        """
+        stats = self.stats
+        self.count_node()
+        stats.qnodes += 1
+        
+        # evaluate_board scores for the side to move; convert to the root side's view.
+        # A capture can mate, which is scored by distance like in minimax
+        # (static_eval is only passed for nodes minimax has checked already)
+        if static_eval is None:
+            if board.is_checkmate():
+                ply = len(board.move_stack) - self.root_ply
+                return -(MATE_SCORE - ply) if is_maximizing else MATE_SCORE - ply
+            stats.eval_calls += 1
+            stand_pat = self.evaluate_board(board)
+        else:
+            stand_pat = static_eval
+        if not is_maximizing:
+            stand_pat = -stand_pat
+        
+        if is_maximizing:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+        best = stand_pat
+        
+        for move in self.order_captures(board):
+            board.push(move)
+            eval = self.quiescence(board, alpha, beta, not is_maximizing)
+            board.pop()
+            if is_maximizing:
+                best = max(best, eval)
+                alpha = max(alpha, eval)
+            else:
+                best = min(best, eval)
+                beta = min(beta, eval)
+            if beta <= alpha:
+                stats.beta_cutoffs += 1
+                break
+        return best
+    
+    def order_captures(self, board):
+        """Captures worth trying in the quiescence search, by MVV-LVA; losing captures are dropped"""
+        captures = []
+        for move in board.generate_legal_captures():
+            victim_value = PIECE_VALUES[chess.PAWN] if board.is_en_passant(move) else \
+                PIECE_VALUES[board.piece_type_at(move.to_square)]
+            aggressor_value = PIECE_VALUES[board.piece_type_at(move.from_square)]
+            # Taking a piece worth at least the capturer can never lose material
+            if aggressor_value > victim_value and self.see(board, move) < 0:
+                continue
+            captures.append((10 * victim_value - aggressor_value, move))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        return [move for _score, move in captures]
+    
+    def see(self, board, move):
+        """
+        Static exchange evaluation: material won by move once both sides have
+        made every profitable recapture on its target square, each time with
+        their least valuable attacker
+        Attackers are recomputed from the shrinking occupancy after every
+        capture, so sliders lined up behind a capturer (x-rays) join in.
+        """
+        to_square = move.to_square
+        occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+        if board.is_en_passant(move):
+            gains = [PIECE_VALUES[chess.PAWN]]
+            occupied &= ~chess.BB_SQUARES[to_square - 8 if board.turn == chess.WHITE else to_square + 8]
+        else:
+            victim = board.piece_type_at(to_square)
+            gains = [PIECE_VALUES[victim] if victim else 0]
+        
+        piece_type = board.piece_type_at(move.from_square)
+        if move.promotion:
+            gains[0] += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+            piece_type = move.promotion
+        
+        # gains[i] is the balance after capture i, seen by the side making it
+        color = not board.turn
+        while True:
+            attackers = board.attackers_mask(color, to_square, occupied) & occupied
+            if not attackers:
+                break
+            for attacker_type in chess.PIECE_TYPES:
+                candidates = attackers & board.pieces_mask(attacker_type, color)
+                if candidates:
+                    break
+            # The king may only recapture onto an undefended square
+            if attacker_type == chess.KING and \
+                    board.attackers_mask(not color, to_square, occupied) & occupied:
+                break
+            gains.append(PIECE_VALUES[piece_type] - gains[-1])
+            piece_type = attacker_type
+            occupied &= ~chess.BB_SQUARES[chess.lsb(candidates)]
+            color = not color
+        
+        # Either side may stop capturing when continuing would lose material
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+    
+    def find_mate(self, board, max_moves, checks_only=False, stop_event=None, max_nodes=None,
+                  max_time=None):
+        """
+        Solve a mate puzzle: find the shortest forced mate for the side to move
+        This is a proof search rather than an evaluation search: every
+        defence must be refuted, so the first reply that escapes ends a branch
+        and the first attacking move that mates against every defence ends a
+        node. Checking moves and the moves leaving the defender the fewest
+        replies are tried first. The difficulty's budget does not apply: the
+        search runs until it is decided unless given its own limits. Its
+        statistics are left in self.stats.
+        :param max_moves: longest mate to look for, in moves of the side to move
+        :param checks_only: only try checking moves for the attacker; much
+                            faster, but misses mates that need a quiet move
+        :param max_nodes: optional node limit
+        :param max_time: optional time limit in seconds
+        :return: the mating line (attacker and defender moves), or None if
+                 there is no mate within max_moves
+        :raises SearchAborted: the node limit, time limit or stop_event ended
+                               the search before it was decided
+        """
+        board = SearchBoard.from_board(board)
+        stats = SearchStats()
+        self.stats = stats
+        self.stop_event = stop_event
+        self.deadline = stats.start_time + max_time if max_time else None
+        level_max_nodes = self.max_nodes
+        self.max_nodes = max_nodes
+        self.mate_cache = {}
+        root_ply = self.root_ply = len(board.move_stack)
+        
+        line = None
+        try:
+            # Iterative deepening on the mate length finds the shortest mate first
+            for moves in range(1, max_moves + 1):
+                stats.depth = 2 * moves - 1
+                line = self.prove_mate(board, moves, checks_only)
+                if line:
+                    break
+        except SearchAborted:
+            stats.aborted = True
+            stats.elapsed = time.time() - stats.start_time
+            raise
+        finally:
+            self.max_nodes = level_max_nodes
+            self.deadline = None
+            self.mate_cache = {}
+        
+        if line:
+            stats.best_move = line[0]
+            stats.pv = line
+            stats.score = MATE_SCORE - len(line)
+            stats.lines = [(line[0], stats.score, line)]
+        stats.elapsed = time.time() - stats.start_time
+        return line
+    
+    def prove_mate(self, board, moves, checks_only):
+        """Attacker to move: a line that mates within moves against any defence, or None"""
+        self.count_node()
+        key = ('attack', self.get_board_hash(board), moves)
+        if key in self.mate_cache:
+            return self.mate_cache[key]
+        
+        # The mating move itself always gives check, so only checks are tried
+        # with one move left. Candidates are ordered checks first, then by the
+        # number of replies they leave (a proof-number estimate).
+        candidates = []
+        for move in board.legal_moves:
+            gives_check = board.gives_check(move)
+            if not gives_check and (moves == 1 or checks_only):
+                continue
+            board.push(move)
+            replies = board.legal_moves.count()
+            board.pop()
+            if replies == 0:
+                if gives_check:
+                    self.mate_cache[key] = [move]
+                    return [move]
+                continue  # stalemate
+            candidates.append((not gives_check, replies, move))
+        
+        line = None
+        if moves > 1:
+            candidates.sort(key=lambda candidate: candidate[:2])
+            for _quiet, _replies, move in candidates:
+                board.push(move)
+                defence = self.refute_mate(board, moves - 1, checks_only)
+                board.pop()
+                if defence is not None:
+                    line = [move] + defence
+                    break
+        
+        self.mate_cache[key] = line
+        return line
+    
+    def refute_mate(self, board, moves, checks_only):
+        """
+        Defender to move: None if some reply escapes a mate within moves,
+        otherwise the line against the longest-lasting defence
+        """
+        self.count_node()
+        key = ('defend', self.get_board_hash(board), moves)
+        if key in self.mate_cache:
+            return self.mate_cache[key]
+        
+        # King moves and captures are the most likely escapes, so they go first
+        king_square = board.king(board.turn)
+        replies = sorted(board.legal_moves,
+                         key=lambda move: (move.from_square != king_square, not board.is_capture(move)))
+        
+        longest = []
+        for reply in replies:
+            board.push(reply)
+            line = self.prove_mate(board, moves, checks_only)
+            board.pop()
+            if line is None:
+                # One escape disproves the whole node
+                longest = None
+                break
+            if len(line) + 1 > len(longest):
+                longest = [reply] + line
+        
+        self.mate_cache[key] = longest
+        return longest
+    
+    def order_moves(self, board, first_move=None):
+        """
+        Order moves to improve alpha-beta pruning efficiency
+        :param first_move: move to try before all others (e.g. the best move from a previous search)
+        """
         # Simple move ordering: captures first, then other moves
         moves = list(board.legal_moves)
         move_scores = []
@@ -253,6 +1012,12 @@ class ChessBot:
                     if aggressor:
                         aggressor_value = self.piece_values.get(aggressor.piece_type, 0)
                         score = 10 * victim_value - aggressor_value
+                        # Captures that lose material by static exchange go
+                        # behind the quiet moves
+                        if aggressor_value > victim_value:
+                            exchange = self.see(board, move)
+                            if exchange < 0:
+                                score = exchange - 1000
                 else:
                     # En passant capture
                     score = 100  # Pawn value
@@ -271,23 +1036,54 @@ class ChessBot:
         
         # Sort moves by score in descending order
         move_scores.sort(key=lambda x: x[1], reverse=True)
-        return [move for move, _ in move_scores]
+        ordered = [move for move, _ in move_scores]
+        
+        if first_move in ordered:
+            ordered.remove(first_move)
+            ordered.insert(0, first_move)
+        return ordered
+    
+    def evaluate_children(self, board, moves):
+        """
+        evaluate_board scores of the positions after each move, from one call
+        to the batch evaluator (terminal positions are not recognised, so the
+        caller has to rule them out before using a score)
+        """
+        from Chess_eval import position_masks
+        
+        masks = []
+        for move in moves:
+            board.push(move)
+            masks.append(position_masks(board))
+            board.pop()
+        self.stats.eval_calls += len(masks)
+        scores = self.batch_evaluator.evaluate_masks(masks).tolist()
+        # The children have the other side to move
+        return scores if board.turn == chess.BLACK else [-score for score in scores]
     
     def get_board_hash(self, board):
-        """Generate a unique hash for the board position"""
-        return board.fen()
+        """
+        Transposition and repetition key of a SearchBoard position
+        The move clocks are not part of it, so a key also identifies the
+        position for the repetition rule.
+        """
+        return board.key()
     
     def evaluate_board(self, board):
         """
         Evaluate the board position
-        Positive score favors white, negative score favors black
+        Positive score favors the side to move, negative score its opponent
         """
         if board.is_checkmate():
-            # If checkmate, return a high score favoring the winner
-            return -10000 if board.turn else 10000
+            # The side to move is mated
+            return -MATE_SCORE
             
         if board.is_stalemate() or board.is_insufficient_material():
             return 0  # Draw
+        
+        # The network scores for the side to move, like the terms below
+        if self.network:
+            return self.network.evaluate(board)
             
         # Material evaluation
         material_score = self.evaluate_material(board)
@@ -295,8 +1091,12 @@ class ChessBot:
         # Positional evaluation
         positional_score = self.evaluate_position(board)
         
-        # Mobility evaluation (number of legal moves)
-        mobility_score = self.evaluate_mobility(board)
+        # Mobility evaluation (number of legal moves); the batch evaluator
+        # counts pseudo-legal moves, so it is matched here
+        if self.batch_evaluator:
+            mobility_score = self.evaluate_pseudo_mobility(board)
+        else:
+            mobility_score = self.evaluate_mobility(board)
         
         # King safety evaluation
         king_safety_score = self.evaluate_king_safety(board)
@@ -304,12 +1104,13 @@ class ChessBot:
         # Pawn structure evaluation
         pawn_structure_score = self.evaluate_pawn_structure(board)
         
+        weights = self.eval_params.term_weights
         total_score = (
             material_score +
             positional_score +
-            0.1 * mobility_score +
-            0.2 * king_safety_score +
-            0.1 * pawn_structure_score
+            weights['mobility'] * mobility_score +
+            weights['king_safety'] * king_safety_score +
+            weights['pawn_structure'] * pawn_structure_score
         )
         
         # Perspective adjustment - positive is good for the current player
@@ -319,11 +1120,10 @@ class ChessBot:
         """Evaluate material balance"""
         score = 0
         
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                value = self.piece_values[piece.piece_type]
-                score += value if piece.color == chess.WHITE else -value
+        for piece_type, value in self.eval_params.piece_values.items():
+            white_count = chess.popcount(board.pieces_mask(piece_type, chess.WHITE))
+            black_count = chess.popcount(board.pieces_mask(piece_type, chess.BLACK))
+            score += value * (white_count - black_count)
                 
         return score
     
@@ -332,25 +1132,17 @@ class ChessBot:
         score = 0
         
         # Determine game phase for king table selection
-        is_endgame = self.is_endgame(board)
-        king_table = self.king_table_endgame if is_endgame else self.king_table_middlegame
-        
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                # Get appropriate piece-square table
-                if piece.piece_type == chess.KING:
-                    table = king_table
-                else:
-                    table = self.piece_tables[piece.piece_type]
-                
-                # Get position value
-                if piece.color == chess.WHITE:
-                    position_value = table[63 - square]
-                else:
-                    position_value = table[square]
-                
-                score += position_value if piece.color == chess.WHITE else -position_value
+        if self.is_endgame(board):
+            tables = self.eval_params.square_tables_endgame
+        else:
+            tables = self.eval_params.square_tables_middlegame
+        
+        for color in chess.COLORS:
+            color_tables = tables[color]
+            for piece_type in chess.PIECE_TYPES:
+                table = color_tables[piece_type]
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    score += table[square]
                 
         return score
     
@@ -372,6 +1164,37 @@ class ChessBot:
         
         return white_moves - black_moves
     
+    def evaluate_pseudo_mobility(self, board):
+        """
+        Mobility as Chess_eval counts it: the squares each piece can move to or
+        capture on, ignoring pins, checks, castling and en passant
+        """
+        score = 0
+        occupied = board.occupied
+        for color, sign in ((chess.WHITE, 1), (chess.BLACK, -1)):
+            own = board.occupied_co[color]
+            theirs = board.occupied_co[not color]
+            pawns = board.pieces_mask(chess.PAWN, color)
+            moves = 0
+            for square in chess.scan_forward(own & ~pawns):
+                moves += chess.popcount(board.attacks_mask(square) & ~own)
+            
+            if color == chess.WHITE:
+                pushes = pawns << 8 & ~occupied & chess.BB_ALL
+                doubles = (pushes & chess.BB_RANK_3) << 8 & ~occupied
+                captures_left = (pawns & ~chess.BB_FILE_A) << 7 & theirs
+                captures_right = (pawns & ~chess.BB_FILE_H) << 9 & theirs
+            else:
+                pushes = pawns >> 8 & ~occupied
+                doubles = (pushes & chess.BB_RANK_6) >> 8 & ~occupied
+                captures_left = (pawns & ~chess.BB_FILE_A) >> 9 & theirs
+                captures_right = (pawns & ~chess.BB_FILE_H) >> 7 & theirs
+            moves += (chess.popcount(pushes) + chess.popcount(doubles) +
+                      chess.popcount(captures_left) + chess.popcount(captures_right))
+            score += sign * moves
+        
+        return score
+    
     def evaluate_king_safety(self, board):
         """Evaluate king safety"""
         score = 0
@@ -411,63 +1234,23 @@ class ChessBot:
     def evaluate_pawn_structure(self, board):
         """Evaluate pawn structure"""
         score = 0
+        white_pawns = board.pieces_mask(chess.PAWN, chess.WHITE)
+        black_pawns = board.pieces_mask(chess.PAWN, chess.BLACK)
         
-        # Evaluate doubled pawns
         for file in range(8):
-            white_pawns_on_file = 0
-            black_pawns_on_file = 0
-            
-            for rank in range(8):
-                square = chess.square(file, rank)
-                piece = board.piece_at(square)
-                
-                if piece and piece.piece_type == chess.PAWN:
-                    if piece.color == chess.WHITE:
-                        white_pawns_on_file += 1
-                    else:
-                        black_pawns_on_file += 1
+            white_pawns_on_file = chess.popcount(white_pawns & chess.BB_FILES[file])
+            black_pawns_on_file = chess.popcount(black_pawns & chess.BB_FILES[file])
             
             # Penalty for doubled pawns
             if white_pawns_on_file > 1:
                 score -= 20 * (white_pawns_on_file - 1)
             if black_pawns_on_file > 1:
                 score += 20 * (black_pawns_on_file - 1)
-        
-        # Evaluate isolated pawns
-        for file in range(8):
-            has_white_pawn_on_file = False
-            has_black_pawn_on_file = False
-            
-            for rank in range(8):
-                square = chess.square(file, rank)
-                piece = board.piece_at(square)
-                
-                if piece and piece.piece_type == chess.PAWN:
-                    if piece.color == chess.WHITE:
-                        has_white_pawn_on_file = True
-                    else:
-                        has_black_pawn_on_file = True
-            
-            # Check for isolated pawns
-            has_white_pawn_on_adjacent_file = False
-            has_black_pawn_on_adjacent_file = False
-            
-            for adjacent_file in [file - 1, file + 1]:
-                if 0 <= adjacent_file <= 7:
-                    for rank in range(8):
-                        square = chess.square(adjacent_file, rank)
-                        piece = board.piece_at(square)
-                        
-                        if piece and piece.piece_type == chess.PAWN:
-                            if piece.color == chess.WHITE:
-                                has_white_pawn_on_adjacent_file = True
-                            else:
-                                has_black_pawn_on_adjacent_file = True
             
-            # Penalty for isolated pawns
-            if has_white_pawn_on_file and not has_white_pawn_on_adjacent_file:
+            # Penalty for isolated pawns (once per file)
+            if white_pawns_on_file and not white_pawns & ADJACENT_FILES[file]:
                 score -= 20
-            if has_black_pawn_on_file and not has_black_pawn_on_adjacent_file:
+            if black_pawns_on_file and not black_pawns & ADJACENT_FILES[file]:
                 score += 20
         
         return score
@@ -475,16 +1258,63 @@ class ChessBot:
     def is_endgame(self, board):
         """Determine if the position is an endgame"""
         # Simple endgame detection: no queens or at most one minor piece per side
-        white_queens = len(board.pieces(chess.QUEEN, chess.WHITE))
-        black_queens = len(board.pieces(chess.QUEEN, chess.BLACK))
+        white_queens = chess.popcount(board.pieces_mask(chess.QUEEN, chess.WHITE))
+        black_queens = chess.popcount(board.pieces_mask(chess.QUEEN, chess.BLACK))
         
         white_minors = (
-            len(board.pieces(chess.KNIGHT, chess.WHITE)) +
-            len(board.pieces(chess.BISHOP, chess.WHITE))
+            chess.popcount(board.pieces_mask(chess.KNIGHT, chess.WHITE)) +
+            chess.popcount(board.pieces_mask(chess.BISHOP, chess.WHITE))
         )
         black_minors = (
-            len(board.pieces(chess.KNIGHT, chess.BLACK)) +
-            len(board.pieces(chess.BISHOP, chess.BLACK))
+            chess.popcount(board.pieces_mask(chess.KNIGHT, chess.BLACK)) +
+            chess.popcount(board.pieces_mask(chess.BISHOP, chess.BLACK))
         )
         
-        return (white_queens + black_queens == 0) or (white_minors <= 1 and black_minors <= 1)
\ No newline at end of file
+        return (white_queens + black_queens == 0) or (white_minors <= 1 and black_minors <= 1)
+
+
+class ChessBotPool:
+    """
+    Hands out reset-but-warm ChessBot instances
+    A released bot is kept and reused for the next game of the same
+    difficulty, so starting a game costs a reset() instead of a new bot.
+    Safe to share between threads.
+    :param max_idle: bots kept per difficulty; further released bots are dropped
+    """
+    def __init__(self, max_idle=16):
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, difficulty='medium'):
+        """A bot of the given difficulty that remembers nothing from earlier games"""
+        with self.lock:
+            bots = self.idle.get(difficulty)
+            bot = bots.pop() if bots else None
+            if bot is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if bot is None:
+            return ChessBot(difficulty=difficulty)
+        bot.reset()
+        return bot
+
+    def release(self, bot):
+        """Return a bot that is no longer searching"""
+        with self.lock:
+            bots = self.idle.setdefault(bot.difficulty, [])
+            if len(bots) < self.max_idle:
+                bots.append(bot)
+
+    @contextmanager
+    def bot(self, difficulty='medium'):
+        """with pool.bot('hard') as bot: ... acquires and releases a bot"""
+        bot = self.acquire(difficulty)
+        try:
+            yield bot
+        finally:
+            self.release(bot)
+
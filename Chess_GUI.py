@@ -1,15 +1,11 @@
 import pygame as pg
 import chess
-import chess.svg
-import cairosvg
-import io
-from Chess_Bot import ChessBot
+from Chess_engine import BOT_INFO_EVENT, BOT_MOVE_EVENT, BOT_PROGRESS_EVENT, EngineHost
+from Chess_render import BoardRenderer, RenderScheduler, get_font
 import sys
-import time
-from PIL import Image
 
 class ChessGame:
-    def __init__(self, width=600, height=700):  # Increased height for start screen
+    def __init__(self, width=600, height=700, max_fps=60, record_path=None):  # Increased height for start screen
         pg.init()
         self.width = width
         self.height = height
@@ -23,8 +19,8 @@ class ChessGame:
         # Initialize chess board
         self.board = chess.Board()
         
-        # Initialize the bot (will be set when game starts)
-        self.bot = None
+        # Engine host process running the bot (will be set when game starts)
+        self.engine = None
         
         # Game state
         self.selected_square = None
@@ -32,10 +28,6 @@ class ChessGame:
         self.game_over = False
         self.result_message = ""
         
-        # Font for rendering text
-        self.font = pg.font.SysFont('Arial', 20)
-        self.title_font = pg.font.SysFont('Arial', 36, bold=True)
-        
         # Start screen UI elements
         self.start_button = pg.Rect(width//2 - 75, height//2 + 50, 150, 50)
         self.easy_button_start = pg.Rect(width//2 - 200, height//2 - 50, 120, 40)
@@ -58,6 +50,28 @@ class ChessGame:
         self.promotion_move = None
         self.promotion_buttons = {}
         
+        # Board renderer (created with the first board image)
+        self.renderer = None
+        
+        # Only repaint when something changed; max_fps caps continuous drawing
+        self.scheduler = RenderScheduler(max_fps)
+        
+        # Every game is appended to record_path (a Chess_record file) if given
+        self.record_writer = None
+        self.recorder = None
+        if record_path:
+            from Chess_record import GameWriter
+            self.record_writer = GameWriter(record_path)
+        
+    @property
+    def font(self):
+        """Font for rendering text, loaded on first use"""
+        return get_font('Arial', 20)
+    
+    @property
+    def title_font(self):
+        return get_font('Arial', 36, bold=True)
+    
     def init_game_ui(self):
         """Initialize in-game UI elements"""
         button_height = 30
@@ -77,36 +91,15 @@ class ChessGame:
 
     def update_board_image(self):
         """Update the board image based on current state"""
-        # Generate SVG of the board
-        orientation = chess.WHITE if self.white_at_bottom else chess.BLACK
-        last_move = self.board.peek() if self.board.move_stack else None
-        check_square = self.board.king(self.board.turn) if self.board.is_check() else None
-        
-        # Create squares list for highlighting
-        squares = []
-        if self.selected_square:
-            squares = [self.selected_square]
-        
-        svg_data = chess.svg.board(
-            self.board, 
-            size=min(self.width, self.height - 100),  # Leave space for UI
-            orientation=orientation,
-            lastmove=last_move,
-            check=check_square,
-            arrows=[],
-            squares=squares
-        )
+        if self.renderer is None:
+            # Leave space for UI below the board
+            self.renderer = BoardRenderer(min(self.width, self.height - 100), self.white_at_bottom)
         
-        # Convert SVG to PNG
-        png_data = cairosvg.svg2png(bytestring=svg_data.encode('utf-8'))
-        
-        # Convert PNG to pygame surface
-        image = Image.open(io.BytesIO(png_data))
-        mode = image.mode
-        size = image.size
-        data = image.tobytes()
-        
-        self.board_image = pg.image.fromstring(data, size, mode)
+        # Only squares whose piece or highlight changed are redrawn
+        self.renderer.set_orientation(self.white_at_bottom)
+        self.renderer.update(self.board, self.selected_square)
+        self.board_image = self.renderer.surface
+        self.scheduler.request_redraw()
         
     def draw_start_screen(self):
         """Draw the start screen"""
@@ -229,9 +222,10 @@ class ChessGame:
             self.selected_difficulty = 'hard'
         elif self.start_button.collidepoint(x, y):
             # Start the game
-            self.bot = ChessBot(difficulty=self.selected_difficulty)
+            self.engine = EngineHost(self.selected_difficulty)
             self.game_state = "playing"
             self.init_game_ui()
+            self.start_record()
 
     def handle_promotion_click(self, pos):
         """Handle clicks on promotion dialog"""
@@ -251,13 +245,10 @@ class ChessGame:
                 self.promotion_move = None
                 self.update_board_image()
                 self.check_game_over()
+                self.record()
                 
                 # If game is not over, let the bot make a move
                 if not self.game_over:
-                    self.thinking = True
-                    self.status_message = f"Bot is thinking... ({self.selected_difficulty} difficulty)"
-                    self.draw()
-                    pg.display.flip()
                     self.make_bot_move()
                 break
 
@@ -267,7 +258,12 @@ class ChessGame:
         
         # Check if user clicked on game buttons
         if self.new_game_button and self.new_game_button.collidepoint(x, y):
+            # Abandon the bot's search for the old game
+            self.engine.stop()
+            self.thinking = False
+            self.finish_record()
             self.board = chess.Board()
+            self.start_record()
             self.game_over = False
             self.result_message = ""
             self.selected_square = None
@@ -338,13 +334,10 @@ class ChessGame:
                 self.selected_square = None
                 self.update_board_image()
                 self.check_game_over()
+                self.record()
                 
                 # If game is not over, let the bot make a move
                 if not self.game_over:
-                    self.thinking = True
-                    self.status_message = f"Bot is thinking... ({self.selected_difficulty} difficulty)"
-                    self.draw()
-                    pg.display.flip()
                     self.make_bot_move()
             else:
                 # Invalid move, select the new square if it has a piece of the player's color
@@ -363,20 +356,21 @@ class ChessGame:
                 self.update_board_image()
     
     def make_bot_move(self):
-        """Let the bot make a move"""
-        # Add a small delay to show "thinking" status
-        start_time = time.time()
-        bot_move = self.bot.get_best_move(self.board)
-        elapsed_time = time.time() - start_time
-        
-        # Ensure minimum thinking time for UI feedback
-        if elapsed_time < 0.5:
-            time.sleep(0.5 - elapsed_time)
+        """Let the bot make a move: the search runs in the background and ends in apply_bot_move"""
+        self.thinking = True
+        self.status_message = "Bot is thinking..."
+        self.engine.start_search(self.board)
+        self.scheduler.request_redraw()
+    
+    def apply_bot_move(self, bot_move, stats=None):
+        """Play the move found by the engine worker; stats is its search info"""
+        self.engine.finish()
         
         # Make the move
         self.board.push(bot_move)
         self.update_board_image()
         self.check_game_over()
+        self.record(stats)
         
         if not self.game_over:
             color_name = "White" if self.player_color == chess.WHITE else "Black"
@@ -384,6 +378,30 @@ class ChessGame:
         
         self.thinking = False
     
+    def start_record(self):
+        """Start recording the current game, if games are recorded"""
+        if self.record_writer:
+            from Chess_record import GameRecorder
+            bot_name = f"ChessBot ({self.selected_difficulty})"
+            human_white = self.player_color == chess.WHITE
+            self.recorder = GameRecorder(self.record_writer, metadata={
+                'Event': 'ChessBot game',
+                'White': 'human' if human_white else bot_name,
+                'Black': bot_name if human_white else 'human'})
+    
+    def record(self, info=None):
+        """Bring the record up to the board after a move; info is the bot's search info"""
+        if self.recorder:
+            self.recorder.sync(self.board, info)
+            if self.game_over:
+                self.finish_record()
+    
+    def finish_record(self):
+        """Write the current game's record (result '*' if it is not over)"""
+        if self.recorder:
+            self.recorder.finish(self.board)
+            self.recorder = None
+    
     def check_game_over(self):
         """Check if the game is over"""
         if self.board.is_checkmate():
@@ -433,8 +451,11 @@ class ChessGame:
             flip_text = self.font.render('Flip Board', True, (0, 0, 0))
             self.screen.blit(flip_text, (self.flip_board_button.x + 10, self.flip_board_button.y + 5))
         
-        # Draw status message
-        status_text = self.font.render(self.status_message, True, (0, 0, 0))
+        # Draw status message, with the search progress while the bot is thinking
+        status = self.status_message
+        if self.thinking:
+            status = f"{status} {self.engine.progress_text()}"
+        status_text = self.font.render(status, True, (0, 0, 0))
         self.screen.blit(status_text, (10, board_offset_y + board_size + 10))
         
         # Draw difficulty info
@@ -463,7 +484,8 @@ class ChessGame:
         """Run the game loop"""
         running = True
         while running:
-            for event in pg.event.get():
+            # Blocks while idle instead of spinning
+            for event in self.scheduler.wait_events():
                 if event.type == pg.QUIT:
                     running = False
                 elif event.type == pg.MOUSEBUTTONDOWN:
@@ -473,8 +495,24 @@ class ChessGame:
                         self.handle_start_screen_click(pg.mouse.get_pos())
                     else:
                         self.handle_game_click(pg.mouse.get_pos())
+                    # Clicks change buttons, dialogs or messages
+                    self.scheduler.request_redraw()
+                elif event.type == BOT_MOVE_EVENT:
+                    if self.engine.is_current(event):
+                        self.apply_bot_move(event.move, event.stats)
+                elif event.type in (BOT_INFO_EVENT, BOT_PROGRESS_EVENT):
+                    # Refresh the progress readout
+                    if self.thinking:
+                        self.scheduler.request_redraw()
             
-            self.draw()
-            pg.display.flip()
-            
+            if self.scheduler.should_draw():
+                self.draw()
+                pg.display.flip()
+                self.scheduler.frame_done()
+        
+        if self.engine:
+            self.engine.close()
+        self.finish_record()
+        if self.record_writer:
+            self.record_writer.close()
         pg.quit()
\ No newline at end of file
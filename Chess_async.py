@@ -0,0 +1,92 @@
+"""
+Asyncio interface to ChessBot
+The search runs on an executor thread so the event loop stays responsive.
+A running search is an AsyncSearch: await it for the final SearchStats,
+iterate over it for a snapshot after every completed depth, or cancel it
+to get the best move found so far.
+
+Usage:
+    search = search_async(bot, board)
+    async for info in search:
+        print(info.depth, info.best_move, info.score)
+    stats = await search
+
+    search = search_async(bot, board)
+    await asyncio.sleep(0.5)
+    stats = await search.cancel()       # best move so far, stats.aborted is True
+
+One ChessBot can only run one search at a time; use a bot per concurrent search.
+"""
+import asyncio
+import threading
+
+
+class AsyncSearch:
+    """
+    A ChessBot search running on an executor
+    The board is copied, so the caller may keep using it while the search runs.
+    """
+    def __init__(self, bot, board, executor=None):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = threading.Event()
+        self.infos = asyncio.Queue()
+        self.future = self.loop.run_in_executor(executor, self.run, bot, board.copy())
+
+    def run(self, bot, board):
+        """Executor body; per-depth snapshots are handed to the event loop"""
+        def on_info(stats):
+            self.loop.call_soon_threadsafe(self.infos.put_nowait, stats.snapshot())
+
+        try:
+            return bot.search(board, on_info=on_info, stop_event=self.stop_event)
+        finally:
+            # End of the per-depth results
+            self.loop.call_soon_threadsafe(self.infos.put_nowait, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        info = await self.infos.get()
+        if info is None:
+            # Let further iteration end immediately as well
+            self.infos.put_nowait(None)
+            raise StopAsyncIteration
+        return info
+
+    def __await__(self):
+        return self.result().__await__()
+
+    async def result(self):
+        """Final SearchStats; if the awaiting task is cancelled, the search is stopped too"""
+        try:
+            return await asyncio.shield(self.future)
+        except asyncio.CancelledError:
+            self.stop_event.set()
+            raise
+
+    def stop(self):
+        """Ask the search to stop; it finishes within a few milliseconds"""
+        self.stop_event.set()
+
+    async def cancel(self):
+        """Stop the search and return its SearchStats with the best move found so far"""
+        self.stop()
+        return await self.result()
+
+    def done(self):
+        return self.future.done()
+
+
+def search_async(bot, board, executor=None):
+    """
+    Start searching board with bot on executor (default: the loop's default executor)
+    Must be called from a coroutine or callback running in the event loop.
+    """
+    return AsyncSearch(bot, board, executor)
+
+
+async def get_best_move_async(bot, board, executor=None):
+    """Async counterpart of ChessBot.get_best_move"""
+    stats = await search_async(bot, board, executor)
+    return stats.best_move
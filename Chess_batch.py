@@ -0,0 +1,294 @@
+"""
+Headless batch analysis of EPD/PGN files
+Streams positions from the input, searches them on a pool of worker processes
+(one ChessBot per worker) and writes the results as JSONL or CSV. With
+--static the positions are not searched but scored with the vectorized
+static evaluator (Chess_eval, needs NumPy), in chunks of STATIC_CHUNK.
+
+Usage:
+    python Chess_batch.py games.pgn -o results.jsonl
+    python Chess_batch.py positions.epd -o results.csv --difficulty hard --workers 8
+    python Chess_batch.py positions.epd -o results.jsonl --resume
+    python Chess_batch.py games.pgn -o scores.csv --static
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import chess
+
+from Chess_Bot import DIFFICULTY_LEVELS, ChessBot
+
+RESULT_FIELDS = ['id', 'label', 'fen', 'move', 'score', 'depth', 'nodes', 'time', 'pv']
+
+# Positions per task in --static mode: large batches amortize NumPy's call overhead
+STATIC_CHUNK = 2048
+
+# Bot (or static evaluator) owned by each worker process, created once by init_worker
+_worker_bot = None
+_worker_evaluator = None
+
+
+def read_epd_positions(stream):
+    """Yield (fen, label) for every EPD/FEN line in the stream"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            board, operations = chess.Board.from_epd(line)
+        except ValueError:
+            # Plain FEN lines with move counters are accepted as well
+            try:
+                board = chess.Board(line)
+            except ValueError:
+                print(f"Skipping invalid line {line_number}: {line}", file=sys.stderr)
+                continue
+            operations = {}
+        label = operations.get('id', f"line {line_number}")
+        yield board.fen(), str(label)
+
+
+def read_pgn_positions(stream):
+    """Yield (fen, label) for every position reached in the mainline of each game"""
+    # chess.pgn pulls in chess.engine (asyncio) and chess.svg, so workers never import it
+    import chess.pgn
+
+    game_number = 0
+    while True:
+        game = chess.pgn.read_game(stream)
+        if game is None:
+            break
+        game_number += 1
+        board = game.board()
+        ply = 0
+        yield board.fen(), f"game {game_number} ply {ply}"
+        for move in game.mainline_moves():
+            board.push(move)
+            ply += 1
+            yield board.fen(), f"game {game_number} ply {ply}"
+
+
+def read_positions(path, input_format=None):
+    """Stream positions from an EPD or PGN file without loading it into memory"""
+    if input_format is None:
+        input_format = 'pgn' if path.lower().endswith('.pgn') else 'epd'
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        if input_format == 'pgn':
+            yield from read_pgn_positions(stream)
+        else:
+            yield from read_epd_positions(stream)
+
+
+def init_worker(difficulty, depth, static=False):
+    """
+    Create the worker's bot once so every position reuses the same warm instance
+    Analysis is reproducible: the bot searches to a fixed depth (the
+    difficulty's max_depth unless depth is given) without noise or a time
+    budget, so results do not depend on the run or the machine's speed.
+    """
+    global _worker_bot, _worker_evaluator
+    if static:
+        from Chess_eval import BatchEvaluator
+        _worker_evaluator = BatchEvaluator()
+        return
+    _worker_bot = ChessBot(difficulty=difficulty)
+    _worker_bot.set_fixed_depth(depth or DIFFICULTY_LEVELS[difficulty]['max_depth'])
+
+
+def analyse_position(task):
+    """Search a single position in a worker process and return its result record"""
+    index, label, fen = task
+    board = chess.Board(fen)
+    result = {'id': index, 'label': label, 'fen': fen, 'move': None, 'score': None,
+              'depth': 0, 'nodes': 0, 'time': 0.0, 'pv': ''}
+
+    if board.is_game_over():
+        return result
+
+    # Stored scores are relative to the root side, so entries from a
+    # previous position may have the wrong sign for this one
+    _worker_bot.transposition_table.clear()
+
+    stats = _worker_bot.search(board)
+    result['move'] = stats.best_move.uci()
+    if stats.score is not None:
+        result['score'] = round(stats.score, 2)
+    result['depth'] = stats.depth
+    result['nodes'] = stats.nodes
+    result['time'] = round(stats.elapsed, 4)
+    result['pv'] = ' '.join(move.uci() for move in stats.pv)
+    return result
+
+
+def evaluate_positions(tasks):
+    """Score a chunk of positions with the static evaluator in a worker process"""
+    results = []
+    boards = []
+    scored = []
+    for index, label, fen in tasks:
+        board = chess.Board(fen)
+        result = {'id': index, 'label': label, 'fen': fen, 'move': None, 'score': None,
+                  'depth': 0, 'nodes': 0, 'time': 0.0, 'pv': ''}
+        results.append(result)
+        if not board.is_game_over():
+            boards.append(board)
+            scored.append(result)
+
+    # Scores are from white's view; results are for the side to move, like a search
+    for result, board, score in zip(scored, boards, _worker_evaluator.evaluate(boards)):
+        result['score'] = round(float(score if board.turn == chess.WHITE else -score), 2)
+    return results
+
+
+class ResultWriter:
+    """Append result records to a JSONL or CSV file, flushing as they arrive"""
+    def __init__(self, path, output_format, append=False):
+        self.output_format = output_format
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.csv_writer = None
+        if output_format == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            if not append or self.file.tell() == 0:
+                self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.csv_writer:
+            self.csv_writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def count_completed(path, output_format):
+    """
+    Count the complete records in an existing output file
+    A trailing partial line left by an interrupted run is truncated away.
+    Results are written in input order, so the count is also the number of
+    input positions that can be skipped.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'r+b') as f:
+        # Find the end of the last complete line, reading back from the end
+        # of the file in blocks, and cut off whatever follows it
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(end - 65536, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+
+        # Count the records by streaming through the file
+        f.seek(0)
+        count = sum(1 for line in f if line.strip())
+    if output_format == 'csv' and count:
+        count -= 1  # Header row
+    return count
+
+
+def run_batch(input_path, output_path, input_format=None, output_format=None,
+              difficulty='medium', depth=None, workers=None, resume=False, window=None,
+              static=False):
+    """
+    Analyse every position in input_path and write the results to output_path
+    At most `window` tasks (positions, or chunks of them with static=True)
+    are in flight at once, which keeps memory bounded no matter how large
+    the input is.
+    """
+    if output_format is None:
+        output_format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+
+    skip = count_completed(output_path, output_format) if resume else 0
+    if skip:
+        print(f"Resuming after {skip} completed positions", file=sys.stderr)
+
+    writer = ResultWriter(output_path, output_format, append=resume)
+    positions = read_positions(input_path, input_format)
+    done = 0
+    start_time = time.time()
+
+    def write(results):
+        nonlocal done
+        for record in results if static else [results]:
+            writer.write(record)
+            done += 1
+
+    with multiprocessing.Pool(workers, initializer=init_worker,
+                              initargs=(difficulty, depth, static)) as pool:
+        pending = deque()
+        chunk = []
+        try:
+            for index, (fen, label) in enumerate(positions):
+                if index < skip:
+                    continue
+                if static:
+                    chunk.append((index, label, fen))
+                    if len(chunk) < STATIC_CHUNK:
+                        continue
+                    pending.append(pool.apply_async(evaluate_positions, (chunk,)))
+                    chunk = []
+                else:
+                    pending.append(pool.apply_async(analyse_position, ((index, label, fen),)))
+
+                # Write finished results in input order once the window is full
+                while len(pending) >= window:
+                    write(pending.popleft().get())
+
+            if chunk:
+                pending.append(pool.apply_async(evaluate_positions, (chunk,)))
+            while pending:
+                write(pending.popleft().get())
+        finally:
+            writer.close()
+
+    elapsed = time.time() - start_time
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"Analysed {done} positions in {elapsed:.1f} seconds ({rate:.1f} positions/s)",
+          file=sys.stderr)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse EPD/PGN positions with ChessBot")
+    parser.add_argument('input', help="EPD or PGN file")
+    parser.add_argument('-o', '--output', required=True, help="JSONL or CSV results file")
+    parser.add_argument('--input-format', choices=['epd', 'pgn'],
+                        help="Input format (default: from the file extension)")
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'],
+                        help="Output format (default: from the file extension)")
+    parser.add_argument('--difficulty', choices=['easy', 'medium', 'hard'], default='medium',
+                        help="Level whose maximum depth is searched (default: medium)")
+    parser.add_argument('--depth', type=int, help="Search depth (default: the level's maximum)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--window', type=int,
+                        help="Maximum positions in flight (default: 4 per worker)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip positions already present in the output file")
+    parser.add_argument('--static', action='store_true',
+                        help="Score positions with the vectorized static evaluator instead of searching")
+    args = parser.parse_args(argv)
+
+    run_batch(args.input, args.output, args.input_format, args.output_format,
+              args.difficulty, args.depth, args.workers, args.resume, args.window, args.static)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+"""
+Search benchmark over a fixed set of positions
+Every position is searched from a fresh transposition table to a fixed depth
+(or node count), so the total node count is a deterministic signature of the
+search and changes whenever the search behaviour changes.
+
+With --latency it plays every position at each difficulty level and checks
+the think times against the p50/p99 targets in Chess_Bot.DIFFICULTY_LEVELS.
+
+With --startup it measures cold-start time instead: each entry point is
+imported in a fresh interpreter, and engine-side entry points must not load
+any GUI module.
+
+With --mates it checks that mates by a capture, which only the quiescence
+search sees, are scored as mates for both colors.
+
+Usage:
+    python Chess_bench.py
+    python Chess_bench.py --depth 3 --json bench.json
+    python Chess_bench.py --nodes 5000 --compare baseline.json
+    python Chess_bench.py --latency --difficulty medium
+    python Chess_bench.py --startup --json startup.json
+    python Chess_bench.py --mates
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import chess
+
+from Chess_Bot import DIFFICULTY_LEVELS, MATE_SCORE, MATE_THRESHOLD, ChessBot
+from Chess_position import SearchBoard
+from Chess_profile import PROFILE_MODES, SearchProfiler
+
+# Opening, middlegame and endgame positions searched by the benchmark
+BENCH_POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14",
+    "r1bq1r1k/1pp1n1pp/1p1p4/4p2Q/4Pp2/1BNP4/PPP2PPP/3R1RK1 w - - 2 14",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22",
+    "3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5",
+    "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/3P1N2/PPP2PPP/RNBQK2R w KQkq - 1 5",
+    "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1",
+    "3b4/5kp1/1p1p1p1p/pP1PpP1P/P1P1P3/3KN3/8/8 w - - 0 1",
+    "2K5/p7/7P/5pR1/8/5k2/r7/8 w - - 0 1",
+    "8/6pk/1p6/8/PP3p1p/5P2/4KP1q/3Q4 w - - 0 1",
+    "7k/3p2pp/4q3/8/4Q3/5Kp1/P6b/8 w - - 0 1",
+    "8/2p5/8/2kPKp1p/2p4P/2P5/3P4/8 w - - 0 1",
+    "8/1p3pp1/7p/5P1P/2k3P1/8/2K2P2/8 w - - 0 1",
+    "8/pp2r1k1/2p1p3/3pP2p/1P1P1P1P/P5KR/8/8 w - - 0 1",
+    "8/3p4/p1bk3p/Pp6/1Kp1PpPp/2P2P1P/2P5/5B2 b - - 0 1",
+    "5k2/7R/4P2p/5K2/p1r2P1p/8/8/8 b - - 0 1",
+    "6k1/6p1/P6p/r1N5/5p2/7P/1b3PP1/4R1K1 w - - 0 1",
+    "1r3k2/4q3/2Pp3b/3Bp3/2Q2p2/1p1P2P1/1P2KP2/3N4 w - - 0 1",
+    "6k1/4pp1p/3p2p1/P1pPb3/R7/1r2P1PP/3B1P2/6K1 w - - 0 1",
+    "8/3p3B/5p2/5P2/p7/PP5b/k7/6K1 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+    "8/8/8/8/8/8/6k1/4K2R w K - 0 1",
+]
+
+# Positions where a move lets the opponent mate with a capture, with that move
+# and the capture: a depth 1 search must score the move as a mate against the
+# side to move, which only the quiescence search can see
+MATE_CAPTURE_POSITIONS = [
+    ("r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 3 3", "g8e7", "h5f7"),
+    ("rnb1k1nr/pppp1ppp/8/2b1p3/4P2q/2N5/PPPP1PPP/R1BQKBNR w KQkq - 3 3", "g1e2", "h4f2"),
+]
+
+DEFAULT_DEPTH = 3
+
+# Depth limit of a benchmark with a node limit and no depth: deep enough that
+# the node limit always ends the search first
+NODE_LIMIT_DEPTH = 100
+
+# Relative NPS drop that compare mode reports as a regression
+DEFAULT_NPS_TOLERANCE = 0.05
+
+
+def bench_position(bot, fen, depth, nodes):
+    """Search one position from a clean table and return its statistics"""
+    board = chess.Board(fen)
+    bot.transposition_table.clear()
+    bot.set_fixed_depth(depth)
+    bot.max_nodes = nodes
+
+    start_time = time.perf_counter()
+    stats = bot.search(board)
+    elapsed = time.perf_counter() - start_time
+
+    # Effective branching factor: growth of the node count between the last
+    # two completed iterations
+    depth_nodes = stats.depth_nodes
+    if len(depth_nodes) >= 2 and depth_nodes[-2]:
+        branching_factor = depth_nodes[-1] / depth_nodes[-2]
+    else:
+        branching_factor = stats.nodes ** (1 / max(stats.depth, 1))
+
+    return {
+        'fen': fen,
+        'move': stats.best_move.uci(),
+        'depth': stats.depth,
+        'nodes': stats.nodes,
+        'time': elapsed,
+        'nps': stats.nodes / elapsed if elapsed > 0 else 0,
+        'tt_probes': stats.tt_probes,
+        'tt_hits': stats.tt_hits,
+        'tt_hit_rate': stats.tt_hit_rate,
+        'first_move_cutoff_rate': stats.first_move_cutoff_rate,
+        'branching_factor': branching_factor,
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def run_latency_bench(difficulties=None, positions=None, report=print):
+    """
+    Search every position with the budget of each difficulty level
+    Returns the think-time percentiles per level and a list of missed targets.
+    """
+    positions = positions or BENCH_POSITIONS
+    results = {}
+    problems = []
+    for difficulty in difficulties or list(DIFFICULTY_LEVELS):
+        level = DIFFICULTY_LEVELS[difficulty]
+        bot = ChessBot(difficulty=difficulty)
+        times = []
+        depths = []
+        for fen in positions:
+            # Each position counts as the first move of a new game
+            bot.reset()
+            start_time = time.perf_counter()
+            stats = bot.search(chess.Board(fen))
+            times.append(time.perf_counter() - start_time)
+            depths.append(stats.depth)
+
+        p50 = percentile(times, 0.50)
+        p99 = percentile(times, 0.99)
+        results[difficulty] = {'p50': p50, 'p99': p99, 'max': max(times),
+                               'mean_depth': sum(depths) / len(depths)}
+        report(f"{difficulty:8s} p50 {p50:6.3f}s (target {level['p50']}s)  "
+               f"p99 {p99:6.3f}s (target {level['p99']}s)  "
+               f"mean depth {results[difficulty]['mean_depth']:.1f}")
+        for name in ('p50', 'p99'):
+            if results[difficulty][name] > level[name]:
+                problems.append(f"{difficulty} {name} think time {results[difficulty][name]:.3f}s "
+                                f"exceeds the {level[name]}s target")
+    return results, problems
+
+
+# Cold-start entry points: (name, code run in a fresh interpreter, headless)
+STARTUP_TARGETS = [
+    ('python', "pass", True),
+    ('import chess', "import chess", True),
+    ('engine', "import Chess_Bot; Chess_Bot.ChessBot('hard')", True),
+    ('batch worker', "import Chess_batch; Chess_batch.init_worker('medium', None)", True),
+    ('engine host', "import Chess_host", True),
+    ('async API', "import Chess_async", True),
+    ('server', "import Chess_server", True),
+    ('GUI', "import Chess_pygame", False),
+]
+
+# Modules a headless entry point must not import
+GUI_MODULES = ('pygame', 'PIL', 'cairosvg', 'chess.svg')
+
+# Allowed relative slowdown of a startup time in compare mode, and the
+# absolute slowdown (ms) below which differences are treated as noise
+DEFAULT_STARTUP_TOLERANCE = 0.25
+STARTUP_NOISE_MS = 5.0
+
+
+def time_startup(code, repeat=5):
+    """
+    Median wall-clock milliseconds to run code in a fresh interpreter
+    :return: (milliseconds, GUI modules the code imported)
+    """
+    script = code + "\nimport sys\nprint(','.join(m for m in %r if m in sys.modules))" % (GUI_MODULES,)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', script], cwd=directory, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        times.append((time.perf_counter() - start_time) * 1000)
+        loaded = [name for name in output.rstrip('\n').rsplit('\n', 1)[-1].split(',') if name]
+    return statistics.median(times), loaded
+
+
+def run_startup_bench(repeat=5, report=print):
+    """Time every startup target and return the results as a dict"""
+    results = []
+    for name, code, headless in STARTUP_TARGETS:
+        milliseconds, loaded = time_startup(code, repeat)
+        results.append({'name': name, 'ms': milliseconds, 'headless': headless, 'gui_modules': loaded})
+        note = f"  loads {', '.join(loaded)}" if loaded else ""
+        report(f"{name:16s} {milliseconds:8.1f} ms{note}")
+    return {'startup': results, 'repeat': repeat}
+
+
+def compare_startup(bench, baseline, tolerance=DEFAULT_STARTUP_TOLERANCE):
+    """
+    Check startup results: headless targets must not load GUI modules and
+    no target may get slower than the baseline by more than the tolerance
+    Returns a list of regression messages (empty when there are none).
+    """
+    problems = [f"{result['name']} imports GUI modules: {', '.join(result['gui_modules'])}"
+                for result in bench['startup'] if result['headless'] and result['gui_modules']]
+    if baseline is None:
+        return problems
+
+    old_times = {result['name']: result['ms'] for result in baseline.get('startup', [])}
+    for result in bench['startup']:
+        old = old_times.get(result['name'])
+        new = result['ms']
+        if old and new > old * (1 + tolerance) and new - old > STARTUP_NOISE_MS:
+            problems.append(f"{result['name']} startup: {old:.1f} -> {new:.1f} ms "
+                            f"({new / old - 1:+.1%})")
+    return problems
+
+
+def run_bench(depth=None, nodes=None, positions=None, report=print, profile=None):
+    """
+    Search every benchmark position and return the results as a dict
+    :param depth: search depth; by default DEFAULT_DEPTH, or unlimited if
+                  nodes is given, so the node limit decides
+    :param profile: optional profile mode or SearchProfiler, see Chess_profile
+    """
+    if depth is None:
+        depth = NODE_LIMIT_DEPTH if nodes else DEFAULT_DEPTH
+    positions = positions or BENCH_POSITIONS
+    # A fixed depth (no time budget, no noise) keeps the search fully deterministic
+    bot = ChessBot(difficulty='hard', profile=profile)
+
+    results = []
+    for index, fen in enumerate(positions, 1):
+        result = bench_position(bot, fen, depth, nodes)
+        results.append(result)
+        report(f"Position {index:2d}/{len(positions)}: {result['move']:6s} "
+               f"nodes {result['nodes']:8d}  time {result['time']:7.3f}s  "
+               f"nps {result['nps']:7.0f}  tt hit {result['tt_hit_rate']:5.1%}  "
+               f"ebf {result['branching_factor']:5.2f}")
+
+    total_nodes = sum(r['nodes'] for r in results)
+    total_time = sum(r['time'] for r in results)
+    total_probes = sum(r['tt_probes'] for r in results)
+    total_hits = sum(r['tt_hits'] for r in results)
+    summary = {
+        'positions': len(results),
+        'nodes': total_nodes,
+        'time': total_time,
+        'nps': total_nodes / total_time if total_time > 0 else 0,
+        'tt_hit_rate': total_hits / total_probes if total_probes else 0,
+        'branching_factor': sum(r['branching_factor'] for r in results) / len(results),
+    }
+    if bot.profiler:
+        report(bot.profiler.report())
+    return {
+        'depth': depth,
+        'node_limit': nodes,
+        'signature': total_nodes,
+        'summary': summary,
+        'results': results,
+    }
+
+
+def print_summary(bench):
+    summary = bench['summary']
+    print("=" * 60)
+    print(f"Positions:        {summary['positions']}")
+    print(f"Total nodes:      {summary['nodes']}")
+    print(f"Total time:       {summary['time']:.2f} seconds")
+    print(f"Nodes per second: {summary['nps']:.0f}")
+    print(f"TT hit rate:      {summary['tt_hit_rate']:.1%}")
+    print(f"Branching factor: {summary['branching_factor']:.2f}")
+    print(f"Signature:        {bench['signature']}")
+
+
+def compare_bench(bench, baseline, nps_tolerance=DEFAULT_NPS_TOLERANCE):
+    """
+    Compare a benchmark run against a stored baseline
+    Returns a list of regression messages (empty when there are none).
+    """
+    problems = []
+    if (bench['depth'], bench['node_limit']) != (baseline['depth'], baseline['node_limit']):
+        problems.append(f"Settings differ from baseline (depth {baseline['depth']}, "
+                        f"nodes {baseline['node_limit']}); results are not comparable")
+        return problems
+
+    if bench['signature'] != baseline['signature']:
+        problems.append(f"Node signature changed: {baseline['signature']} -> {bench['signature']}")
+        for index, (new, old) in enumerate(zip(bench['results'], baseline['results']), 1):
+            if new['fen'] != old['fen']:
+                continue
+            if new['nodes'] != old['nodes'] or new['move'] != old['move']:
+                problems.append(f"  position {index}: nodes {old['nodes']} -> {new['nodes']}, "
+                                f"move {old['move']} -> {new['move']}")
+
+    old_nps = baseline['summary']['nps']
+    new_nps = bench['summary']['nps']
+    if old_nps and new_nps < old_nps * (1 - nps_tolerance):
+        problems.append(f"NPS regression: {old_nps:.0f} -> {new_nps:.0f} "
+                        f"({new_nps / old_nps - 1:+.1%})")
+    return problems
+
+
+def run_startup_main(args):
+    bench = run_startup_bench(args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(bench, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    problems = compare_startup(bench, baseline)
+    if problems:
+        print("REGRESSIONS:")
+        for problem in problems:
+            print(problem)
+        sys.exit(1)
+    print("No startup regressions")
+
+
+def run_mate_checks(report=print):
+    """Check that mates by capture are scored as mates for both colors; returns the problems"""
+    problems = []
+    bot = ChessBot(difficulty='hard')
+    bot.set_fixed_depth(1)
+    for fen, uci, mate in MATE_CAPTURE_POSITIONS:
+        board = chess.Board(fen)
+        bot.transposition_table.clear()
+        scores = {move.uci(): score for move, score, _pv in bot.get_top_moves(board, 256)}
+        report(f"{fen}: {uci} scores {scores[uci]}")
+        if scores[uci] > -MATE_THRESHOLD:
+            problems.append(f"  {fen}: {uci} allows mate but scores {scores[uci]}")
+
+        # evaluate_board scores for the side to move, which is the mated side
+        board.push_uci(uci)
+        board.push_uci(mate)
+        score = bot.evaluate_board(SearchBoard.from_board(board))
+        if score != -MATE_SCORE:
+            problems.append(f"  {board.fen()}: mated side scores {score}, not {-MATE_SCORE}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ChessBot search")
+    parser.add_argument('--depth', type=int,
+                        help=f"Search depth (default: {DEFAULT_DEPTH}, or unlimited with --nodes)")
+    parser.add_argument('--nodes', type=int, help="Node limit per position")
+    parser.add_argument('--json', help="Write the results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_NPS_TOLERANCE,
+                        help="Allowed relative NPS drop in compare mode (default: 0.05)")
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help="Profile the searches (slows them down, so NPS is not comparable)")
+    parser.add_argument('--profile-out', default='bench-profile',
+                        help="Prefix of the session profile reports (default: bench-profile)")
+    parser.add_argument('--profile-per-search', action='store_true',
+                        help="Also write a report for every position")
+    parser.add_argument('--latency', action='store_true',
+                        help="Check the think-time targets of the difficulty levels instead of searching")
+    parser.add_argument('--difficulty', choices=list(DIFFICULTY_LEVELS), action='append',
+                        help="Level to check with --latency (repeatable; default: all)")
+    parser.add_argument('--startup', action='store_true',
+                        help="Measure cold-start time of the entry points instead of searching")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Interpreter starts per startup target (default: 5)")
+    parser.add_argument('--mates', action='store_true',
+                        help="Check that mates by capture are scored for both colors instead of searching")
+    args = parser.parse_args(argv)
+
+    if args.latency:
+        results, problems = run_latency_bench(args.difficulty)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'latency': results}, f, indent=2)
+        if problems:
+            print("MISSED TARGETS:")
+            for problem in problems:
+                print(problem)
+            sys.exit(1)
+        print("All think-time targets met")
+        return
+
+    if args.startup:
+        run_startup_main(args)
+        return
+
+    if args.mates:
+        problems = run_mate_checks()
+        if problems:
+            print("WRONG MATE SCORES:")
+            for problem in problems:
+                print(problem)
+            sys.exit(1)
+        print("Mates by capture are scored for both colors")
+        return
+
+    profiler = None
+    if args.profile:
+        output = args.profile_out if args.profile_per_search else None
+        profiler = SearchProfiler(args.profile, output)
+
+    bench = run_bench(args.depth, args.nodes, profile=profiler)
+    print_summary(bench)
+
+    if profiler:
+        profiler.dump(args.profile_out)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(bench, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems = compare_bench(bench, baseline, args.tolerance)
+        if problems:
+            print("REGRESSIONS:")
+            for problem in problems:
+                print(problem)
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Background engines for the pygame front ends
+The search runs outside the event loop so it keeps handling input and
+repainting. When the move is ready the engine posts a BOT_MOVE_EVENT;
+while it searches, BOT_INFO_EVENT is posted after every completed depth and
+BOT_PROGRESS_EVENT fires on a timer so the front end can refresh its readout.
+
+EngineHost searches in a separate process (see Chess_host), so the search
+does not compete with rendering for the GIL.
+"""
+import multiprocessing
+import threading
+
+import chess
+import pygame as pg
+
+from Chess_host import run_engine_host
+
+# Custom pygame events posted by the worker
+BOT_MOVE_EVENT = pg.event.custom_type()
+BOT_INFO_EVENT = pg.event.custom_type()
+BOT_PROGRESS_EVENT = pg.event.custom_type()
+
+# Milliseconds between BOT_PROGRESS_EVENTs while searching
+PROGRESS_INTERVAL = 200
+
+
+def format_progress(depth, nodes, best_move):
+    """Status line text for a running search"""
+    text = f"depth {depth}, {nodes} nodes"
+    if best_move:
+        text += f", best {best_move}"
+    return text
+
+
+class EngineHost:
+    """
+    Runs ChessBot searches in an engine host process
+    The host is started on creation and restarted automatically if it dies;
+    a search that was running at the time is sent to the new host.
+    """
+    def __init__(self, difficulty):
+        self.difficulty = difficulty
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.RLock()
+        self.process = None
+        self.conn = None
+        self.closing = False
+        self.restarts = 0
+
+        self.search_id = 0
+        # Id and (fen, moves) of the search whose result is still wanted
+        self.pending = None
+        self.position = None
+        self.last_info = None
+        self.nodes = 0
+
+        self.start_host()
+
+    def start_host(self):
+        """Start a new host process and the thread that listens to it"""
+        with self.lock:
+            parent_conn, child_conn = self.context.Pipe()
+            self.process = self.context.Process(target=run_engine_host,
+                                                args=(child_conn, self.difficulty), daemon=True)
+            self.process.start()
+            child_conn.close()
+            self.conn = parent_conn
+            threading.Thread(target=self.listen, args=(parent_conn,), daemon=True).start()
+
+    def restart_host(self):
+        """Replace a dead host and resend the search in progress"""
+        with self.lock:
+            if self.closing:
+                return
+            self.restarts += 1
+            if self.process.is_alive():
+                self.process.terminate()
+            self.start_host()
+            if self.pending is not None:
+                self.conn.send(('position',) + self.position)
+                self.conn.send(('go', self.pending))
+
+    def send(self, message):
+        """Send a message to the host; False if it had to be restarted first"""
+        with self.lock:
+            try:
+                self.conn.send(message)
+            except OSError:
+                # Host died; the restart resends a pending search itself
+                self.restart_host()
+                if message[0] not in ('position', 'go'):
+                    self.conn.send(message)
+                return False
+            return True
+
+    def listen(self, conn):
+        """Listener thread: turn host messages into pygame events"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind, search_id = message[0], message[1]
+            if search_id != self.pending:
+                continue
+            if kind == 'info':
+                self.last_info = message[2]
+                pg.event.post(pg.event.Event(BOT_INFO_EVENT, search_id=search_id, info=message[2]))
+            elif kind == 'progress':
+                self.nodes = message[2]
+            elif kind == 'bestmove':
+                pg.event.post(pg.event.Event(BOT_MOVE_EVENT, search_id=search_id,
+                                             move=chess.Move.from_uci(message[2]), stats=message[3]))
+
+        # The pipe closed: restart the host unless it is being shut down or was already replaced
+        with self.lock:
+            if not self.closing and conn is self.conn:
+                self.restart_host()
+
+    @property
+    def thinking(self):
+        return self.pending is not None
+
+    def start_search(self, board):
+        """Send the position to the host and start searching; any running search is stopped first"""
+        self.stop()
+        with self.lock:
+            self.search_id += 1
+            self.pending = self.search_id
+            self.position = (board.root().fen(), [move.uci() for move in board.move_stack])
+            self.last_info = None
+            self.nodes = 0
+            # A restart while sending the position has already started the
+            # search on the new host, so 'go' is only sent if there was none
+            if self.send(('position',) + self.position):
+                self.send(('go', self.search_id))
+        pg.time.set_timer(BOT_PROGRESS_EVENT, PROGRESS_INTERVAL)
+
+    def is_current(self, event):
+        """True if an engine event belongs to the search whose result is still wanted"""
+        return self.pending is not None and getattr(event, 'search_id', None) == self.pending
+
+    def finish(self):
+        """Call when the BOT_MOVE_EVENT of the current search has been handled"""
+        pg.time.set_timer(BOT_PROGRESS_EVENT, 0)
+        self.pending = None
+
+    def stop(self):
+        """Cancel the running search (if any); the host drops its result"""
+        if self.pending is not None:
+            self.send(('stop', self.pending))
+        self.finish()
+
+    def progress(self):
+        """Latest (depth, nodes, best move) reported by the host"""
+        depth = self.last_info['depth'] if self.last_info else 0
+        best_move = self.last_info['best_move'] if self.last_info else None
+        nodes = max(self.nodes, self.last_info['nodes'] if self.last_info else 0)
+        return depth, nodes, best_move
+
+    def progress_text(self):
+        return format_progress(*self.progress())
+
+    def close(self):
+        """Shut the host process down"""
+        with self.lock:
+            self.closing = True
+            self.stop()
+            try:
+                self.conn.send(('quit',))
+            except OSError:
+                pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
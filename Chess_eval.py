@@ -0,0 +1,278 @@
+"""
+Vectorized static evaluation with NumPy
+Positions are turned into 12x64 bitplanes (one plane per piece type and
+color, white first) and a whole batch is scored with array operations:
+- material and piece-square tables: one product with a 768-entry weight
+  vector, using the endgame king table for positions ChessBot.is_endgame
+  would call an endgame
+- pawn structure: doubled and isolated pawns from per-file pawn counts
+- king safety: pawns on the three squares in front of each king
+- mobility: approximated by the squares each piece can move to or capture
+  on, ignoring pins, checks, castling and en passant (promotions count once);
+  ChessBot.evaluate_pseudo_mobility is the same count for a single board
+The terms and weights are those of ChessBot.evaluate_board, so scores only
+differ from it through the mobility approximation. Checkmate and stalemate
+are not detected; callers handle terminal positions themselves.
+
+NumPy's per-call overhead makes a batch cost about as much as a few hundred
+microseconds of Python regardless of its size, so batches pay off from a few
+dozen positions up: the search (ChessBot(evaluator='batch')) scores the
+remaining children of a frontier node in one batch once its first move fails
+to cut off, and Chess_batch.py --static scores whole files in chunks.
+
+Usage:
+    evaluator = BatchEvaluator()
+    scores = evaluator.evaluate(boards)     # white's view, one per board
+"""
+import chess
+import numpy as np
+
+from Chess_Bot import (PIECE_VALUES, SQUARE_TABLES_MIDDLEGAME, SQUARE_TABLES_ENDGAME,
+                       ADJACENT_FILES, DEFAULT_EVAL_PARAMS)
+from Chess_position import SearchBoard
+
+# Plane of each (color, piece type); white planes come first
+PLANE_KEYS = [(color, piece_type) for color in (chess.WHITE, chess.BLACK)
+              for piece_type in chess.PIECE_TYPES]
+PLANE_INDEX = {key: index for index, key in enumerate(PLANE_KEYS)}
+WHITE_PLANES = slice(0, 6)
+BLACK_PLANES = slice(6, 12)
+
+# Ray directions as (file step, rank step), diagonal ones first
+DIAGONAL_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ORTHOGONAL_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Index of the padding square appended to the per-square arrays; it ends every ray
+SENTINEL = 64
+
+
+def position_masks(board):
+    """
+    The piece type bitboards (pawns to kings) of a chess.Board or SearchBoard
+    followed by black's and white's occupancy; bitplanes() splits them by color
+    """
+    if isinstance(board, SearchBoard):
+        return board.bbs[1:] + board.occupied_co
+    return [board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+            board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+
+
+def bitplanes(boards):
+    """Bool array of shape (len(boards), 12, 64) with a plane per piece type and color"""
+    return masks_to_planes([position_masks(board) for board in boards])
+
+
+def masks_to_planes(masks):
+    """Bitplanes of a list of position_masks() results"""
+    masks = np.array(masks, dtype='<u8').reshape(-1, 8)
+    piece_types = masks[:, :6]
+    masks = np.concatenate([piece_types & masks[:, 7:8], piece_types & masks[:, 6:7]], axis=1)
+    bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder='little')
+    return bits.reshape(-1, 12, 64).astype(bool)
+
+
+def mirror(planes):
+    """Swap the colors and flip the board vertically: the same position seen by the other side"""
+    count = len(planes)
+    swapped = np.concatenate([planes[:, BLACK_PLANES], planes[:, WHITE_PLANES]], axis=1)
+    return swapped.reshape(count, 12, 8, 8)[:, :, ::-1].reshape(count, 12, 64)
+
+
+def _weight_planes(square_tables, piece_values=PIECE_VALUES):
+    """Material plus piece-square weights, shape (12, 64)"""
+    weights = np.zeros((12, 64))
+    for index, (color, piece_type) in enumerate(PLANE_KEYS):
+        sign = 1 if color == chess.WHITE else -1
+        weights[index] = sign * piece_values[piece_type] + np.array(square_tables[color][piece_type])
+    return weights
+
+
+def _step_table(steps):
+    """(64, 64) table of the squares a piece reaches with one of the given steps"""
+    table = np.zeros((64, 64), dtype=np.float32)
+    for square in chess.SQUARES:
+        for file_step, rank_step in steps:
+            file = chess.square_file(square) + file_step
+            rank = chess.square_rank(square) + rank_step
+            if 0 <= file < 8 and 0 <= rank < 8:
+                table[square, chess.square(file, rank)] = 1
+    return table
+
+
+def _ray_table(directions):
+    """
+    (64, len(directions), 8) table of the squares along each ray from every
+    square, nearest first, padded with the sentinel
+    """
+    rays = np.full((64, len(directions), 8), SENTINEL, dtype=np.intp)
+    for square in chess.SQUARES:
+        for index, (file_step, rank_step) in enumerate(directions):
+            file, rank = chess.square_file(square), chess.square_rank(square)
+            length = 0
+            while True:
+                file += file_step
+                rank += rank_step
+                if not (0 <= file < 8 and 0 <= rank < 8):
+                    break
+                rays[square, index, length] = chess.square(file, rank)
+                length += 1
+    return rays
+
+
+def _shield_table(color):
+    """
+    (64, 64) table of the pawn shield squares in front of a king
+    Matches evaluate_king_safety, which skips a king on a1 (square 0).
+    """
+    table = np.zeros((64, 64), dtype=bool)
+    forward = 1 if color == chess.WHITE else -1
+    for square in chess.SQUARES[1:]:
+        file, rank = chess.square_file(square), chess.square_rank(square)
+        if not 0 <= rank + forward <= 7:
+            continue
+        for file_offset in (-1, 0, 1):
+            if 0 <= file + file_offset <= 7:
+                table[square, chess.square(file + file_offset, rank + forward)] = True
+    return table
+
+
+WEIGHTS_MIDDLEGAME = _weight_planes(SQUARE_TABLES_MIDDLEGAME).reshape(768)
+WEIGHTS_ENDGAME = _weight_planes(SQUARE_TABLES_ENDGAME).reshape(768)
+# Targets of a knight (rows 0-63) or king (rows 64-127) on each square
+STEPPER_TABLE = np.concatenate([
+    _step_table([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]),
+    _step_table(DIAGONAL_DIRECTIONS + ORTHOGONAL_DIRECTIONS)])
+DIAGONAL_RAYS = _ray_table(DIAGONAL_DIRECTIONS)
+ORTHOGONAL_RAYS = _ray_table(ORTHOGONAL_DIRECTIONS)
+SHIELDS = {color: _shield_table(color) for color in chess.COLORS}
+ADJACENT_FILE_TABLE = np.array([[bool(ADJACENT_FILES[file] & chess.BB_FILES[other])
+                                 for other in range(8)] for file in range(8)], dtype=np.float32)
+RANK_2 = np.array([chess.square_rank(square) == 1 for square in chess.SQUARES])
+RANK_7 = np.array([chess.square_rank(square) == 6 for square in chess.SQUARES])
+NOT_FILE_A = np.array([chess.square_file(square) != 0 for square in chess.SQUARES])
+NOT_FILE_H = np.array([chess.square_file(square) != 7 for square in chess.SQUARES])
+
+
+class BatchEvaluator:
+    """
+    Scores batches of positions with the evaluate_board terms, vectorized
+    :param params: Chess_Bot.EvalParams to score with (default: the built-in constants)
+    """
+
+    def __init__(self, params=None):
+        params = params or DEFAULT_EVAL_PARAMS
+        self.term_weights = params.term_weights
+        if params is DEFAULT_EVAL_PARAMS:
+            self.weights_middlegame = WEIGHTS_MIDDLEGAME
+            self.weights_endgame = WEIGHTS_ENDGAME
+        else:
+            self.weights_middlegame = _weight_planes(params.square_tables_middlegame,
+                                                     params.piece_values).reshape(768)
+            self.weights_endgame = _weight_planes(params.square_tables_endgame,
+                                                  params.piece_values).reshape(768)
+
+    def evaluate(self, boards):
+        """Scores from white's point of view as a float array, one per board"""
+        return self.evaluate_masks([position_masks(board) for board in boards])
+
+    def evaluate_masks(self, masks):
+        """Scores of a list of position_masks() results, from white's point of view"""
+        if not len(masks):
+            return np.zeros(0)
+        return self.evaluate_planes(masks_to_planes(masks))
+
+    def evaluate_planes(self, planes):
+        """Scores of a (N, 12, 64) bitplane array, from white's point of view"""
+        counts = planes.sum(axis=2)
+        material = self.material_and_position(planes, counts)
+        mobility = self.mobility(planes)
+        king_safety = self.king_safety(planes)
+        pawn_structure = self.pawn_structure(planes)
+        weights = self.term_weights
+        return (material + weights['mobility'] * mobility +
+                weights['king_safety'] * king_safety +
+                weights['pawn_structure'] * pawn_structure)
+
+    def is_endgame(self, counts):
+        """No queens, or at most one minor piece per side (per row of plane counts)"""
+        queens = counts[:, PLANE_INDEX[chess.WHITE, chess.QUEEN]] + \
+            counts[:, PLANE_INDEX[chess.BLACK, chess.QUEEN]]
+        white_minors = counts[:, PLANE_INDEX[chess.WHITE, chess.KNIGHT]] + \
+            counts[:, PLANE_INDEX[chess.WHITE, chess.BISHOP]]
+        black_minors = counts[:, PLANE_INDEX[chess.BLACK, chess.KNIGHT]] + \
+            counts[:, PLANE_INDEX[chess.BLACK, chess.BISHOP]]
+        return (queens == 0) | ((white_minors <= 1) & (black_minors <= 1))
+
+    def material_and_position(self, planes, counts):
+        flat = planes.reshape(-1, 768).astype(np.float64)
+        middlegame = flat @ self.weights_middlegame
+        # The tables only differ in the king planes
+        endgame = flat @ self.weights_endgame
+        return np.where(self.is_endgame(counts), endgame, middlegame)
+
+    def pawn_structure(self, planes):
+        score = np.zeros(len(planes))
+        for color, sign in ((chess.WHITE, -1), (chess.BLACK, 1)):
+            pawns = planes[:, PLANE_INDEX[color, chess.PAWN]].reshape(-1, 8, 8)
+            files = pawns.sum(axis=1).astype(np.float32)
+            doubled = np.maximum(files - 1, 0).sum(axis=1)
+            isolated = ((files > 0) & (files @ ADJACENT_FILE_TABLE == 0)).sum(axis=1)
+            score += sign * 20 * (doubled + isolated)
+        return score
+
+    def king_safety(self, planes):
+        score = np.zeros(len(planes))
+        for color, sign in ((chess.WHITE, 10), (chess.BLACK, -10)):
+            kings = planes[:, PLANE_INDEX[color, chess.KING]].argmax(axis=1)
+            shields = SHIELDS[color][kings]
+            pawns = planes[:, PLANE_INDEX[color, chess.PAWN]]
+            score += sign * (shields & pawns).sum(axis=1)
+        return score
+
+    def mobility(self, planes):
+        """Approximate white moves minus black moves"""
+        count = len(planes)
+        # Black's moves are white's moves in the mirrored position, so both
+        # sides are counted in one pass over a batch twice the size
+        moves = self.white_moves(np.concatenate([planes, mirror(planes)]))
+        return moves[:count] - moves[count:]
+
+    def white_moves(self, planes):
+        """Approximate number of white moves in each position"""
+        count = len(planes)
+        own = planes[:, WHITE_PLANES].any(axis=1)
+        theirs = planes[:, BLACK_PLANES].any(axis=1)
+        empty = ~(own | theirs)
+
+        # Knights and kings: precomputed target tables
+        steppers = planes[:, [PLANE_INDEX[chess.WHITE, chess.KNIGHT], PLANE_INDEX[chess.WHITE, chess.KING]]]
+        targets = steppers.reshape(count, 128).astype(np.float32) @ STEPPER_TABLE
+        moves = (targets * ~own).sum(axis=1)
+
+        # Pawns: pushes, double pushes from the start rank, and captures
+        pawns = planes[:, PLANE_INDEX[chess.WHITE, chess.PAWN]]
+        pushes = pawns[:, :56] & empty[:, 8:]
+        doubles = pushes[:, :48] & RANK_2[:48] & empty[:, 16:]
+        captures_left = pawns[:, :57] & NOT_FILE_A[:57] & theirs[:, 7:]
+        captures_right = pawns[:, :55] & NOT_FILE_H[:55] & theirs[:, 9:]
+        moves += (pushes.sum(axis=1) + doubles.sum(axis=1) +
+                  captures_left.sum(axis=1) + captures_right.sum(axis=1))
+
+        # Sliders, only on the squares that hold one: the empty squares up to
+        # the first blocker on each ray, plus the blocker if it is black.
+        # The padding square is occupied, so every ray has a blocker.
+        occupied = np.ones((count, 65), dtype=bool)
+        occupied[:, :64] = ~empty
+        capturable = np.zeros((count, 65), dtype=bool)
+        capturable[:, :64] = theirs
+        queens = planes[:, PLANE_INDEX[chess.WHITE, chess.QUEEN]]
+        for piece_type, rays in ((chess.BISHOP, DIAGONAL_RAYS), (chess.ROOK, ORTHOGONAL_RAYS)):
+            rows, squares = np.nonzero(planes[:, PLANE_INDEX[chess.WHITE, piece_type]] | queens)
+            if not len(rows):
+                continue
+            ray_squares = rays[squares]
+            first = occupied[rows[:, np.newaxis, np.newaxis], ray_squares].argmax(axis=2)
+            blockers = np.take_along_axis(ray_squares, first[:, :, np.newaxis], axis=2)[:, :, 0]
+            reach = first.sum(axis=1) + capturable[rows[:, np.newaxis], blockers].sum(axis=1)
+            moves += np.bincount(rows, weights=reach, minlength=count)
+        return moves
@@ -0,0 +1,108 @@
+"""
+Engine host process
+Owns a ChessBot in its own process so the search does not share the GIL
+with the front end. The front end talks to it over a multiprocessing pipe
+with small tuple messages:
+
+    front end -> host
+        ('position', fen, [uci, ...])   set the position (start FEN plus moves played)
+        ('go', search_id)               search the current position
+        ('stop', search_id)             stop this search and any earlier one
+        ('quit',)                       exit the host
+
+    host -> front end
+        ('info', search_id, info)       SearchStats.as_dict() after each completed depth
+        ('progress', search_id, nodes)  node count of the running search, sent periodically
+        ('bestmove', search_id, uci, info)  result of a search that was not stopped
+
+This module does not import pygame, so starting the host is cheap.
+"""
+import queue
+import threading
+
+import chess
+
+from Chess_Bot import ChessBot
+
+# Seconds between 'progress' messages while searching
+PROGRESS_INTERVAL = 0.2
+
+
+def run_engine_host(conn, difficulty):
+    """Host process entry point: serve commands from conn until 'quit' or the pipe closes"""
+    bot = ChessBot(difficulty=difficulty)
+    commands = queue.Queue()
+    send_lock = threading.Lock()
+    # Highest stopped search id and the (search_id, stop event) of the running search
+    state = {'stop_upto': 0, 'current': None}
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def read_commands():
+        """Reader thread: 'stop' is handled at once, everything else is queued"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = ('quit',)
+            if message[0] == 'stop':
+                state['stop_upto'] = max(state['stop_upto'], message[1])
+                current = state['current']
+                if current and current[0] <= state['stop_upto']:
+                    current[1].set()
+                continue
+            commands.put(message)
+            if message[0] == 'quit':
+                current = state['current']
+                if current:
+                    current[1].set()
+                return
+
+    threading.Thread(target=read_commands, daemon=True).start()
+
+    board = chess.Board()
+    while True:
+        message = commands.get()
+        kind = message[0]
+        if kind == 'quit':
+            break
+        elif kind == 'position':
+            board = chess.Board(message[1])
+            for uci in message[2]:
+                board.push_uci(uci)
+        elif kind == 'go':
+            search(bot, board, message[1], state, send)
+
+    conn.close()
+
+
+def search(bot, board, search_id, state, send):
+    """Run one search, reporting progress and the best move unless it was stopped"""
+    stop_event = threading.Event()
+    state['current'] = (search_id, stop_event)
+    if search_id <= state['stop_upto']:
+        state['current'] = None
+        return
+
+    finished = threading.Event()
+
+    def report_progress():
+        while not finished.wait(PROGRESS_INTERVAL):
+            send(('progress', search_id, bot.stats.nodes))
+
+    def on_info(stats):
+        send(('info', search_id, stats.as_dict()))
+
+    progress_thread = threading.Thread(target=report_progress, daemon=True)
+    progress_thread.start()
+    try:
+        stats = bot.search(board, on_info=on_info, stop_event=stop_event)
+    finally:
+        finished.set()
+        progress_thread.join()
+        state['current'] = None
+
+    if not stop_event.is_set():
+        send(('bestmove', search_id, stats.best_move.uci(), stats.as_dict()))
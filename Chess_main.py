@@ -2,25 +2,33 @@
 Chess Bot with Minimax, Alpha-Beta Pruning, and Dynamic Programming
 Main script to run the chess game with starting window
 """
+import argparse
+import importlib.util
 import os
 import sys
 
-# Make sure we're in the correct directory
+# Make sure we're in the correct directory (paths given on the command line
+# are relative to the directory the game was started from)
+launch_dir = os.getcwd()
 chess_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(chess_dir)
 
-# Import essential modules first
-try:
-    import pygame
-    import chess
-except ImportError as e:
-    print(f"Missing core package: {e}")
-    print("Please install the required packages using:")
-    print("pip install pygame python-chess")
-    sys.exit(1)
-
-# Import the updated pygame interface with starting window
-import Chess_pygame
+# Check the essential packages without importing them: this module is also
+# imported by the engine host process, which must not load the GUI stack
+missing = [name for name in ("pygame", "chess") if importlib.util.find_spec(name) is None]
 
 if __name__ == "__main__":
-    Chess_pygame.main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play against ChessBot")
+    parser.add_argument('--record', metavar='PATH',
+                        help="Append every game to this binary game record file")
+    args = parser.parse_args()
+
+    if missing:
+        print(f"Missing core package: {', '.join(missing)}")
+        print("Please install the required packages using:")
+        print("pip install pygame python-chess")
+        sys.exit(1)
+
+    # Import the updated pygame interface with starting window
+    import Chess_pygame
+    Chess_pygame.main(os.path.join(launch_dir, args.record) if args.record else None)
\ No newline at end of file
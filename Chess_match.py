@@ -0,0 +1,438 @@
+"""
+Headless engine-vs-engine matches between two ChessBot configurations
+Games are played on a pool of worker processes (each keeps one warm bot per
+engine and resets it between games). Every opening is played twice with
+the colors swapped, games end by the rules (including claimable draws) or by
+adjudication, and each finished game is appended to the PGN output at once.
+The result is reported as an Elo difference with a 95% error bar, and a
+sequential probability ratio test can stop the match as soon as it is decided.
+
+Engines are given as comma-separated key=value options:
+    name, difficulty, evaluator, params, nnue_weights   ChessBot settings
+    depth, nodes, time                                  search limits per move (0: none)
+    noise                                               root noise in centipawns
+Limits that are not given stay those of the difficulty level.
+
+Usage:
+    python Chess_match.py --engine1 name=nnue,evaluator=nnue --engine2 name=classic \\
+        --each nodes=5000,time=0,noise=0 --games 200 --pgn match.pgn
+    python Chess_match.py --engine1 params=tuned.json --engine2 name=base --games 2000 \\
+        --openings openings.epd --workers 8 --sprt 0,10
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import chess
+
+from Chess_Bot import ChessBot, EVALUATORS
+
+# Openings (UCI moves from the starting position) used without --openings
+OPENINGS = [
+    'e2e4 e7e5 g1f3 b8c6',
+    'e2e4 c7c5 g1f3 d7d6',
+    'e2e4 e7e6 d2d4 d7d5',
+    'e2e4 c7c6 d2d4 d7d5',
+    'd2d4 d7d5 c2c4 e7e6',
+    'd2d4 g8f6 c2c4 g7g6',
+    'd2d4 g8f6 c2c4 e7e6',
+    'c2c4 e7e5 b1c3 g8f6',
+    'g1f3 d7d5 g2g3 g8f6',
+    'e2e4 d7d5 e4d5 d8d5',
+    'd2d4 d7d5 c2c4 c7c6',
+    'e2e4 e7e5 f2f4 e5f4',
+]
+
+# Engine options and how to parse them
+ENGINE_OPTIONS = {
+    'name': str, 'difficulty': str, 'evaluator': str, 'params': str, 'nnue_weights': str,
+    'depth': int, 'nodes': int, 'time': float, 'noise': float,
+}
+
+# Games longer than this many plies are drawn
+MAX_PLIES = 400
+
+# Bots of each worker process, one per engine, created once by init_worker
+_worker_engines = None
+_worker_bots = None
+_worker_adjudication = None
+
+
+class Engine:
+    """A ChessBot configuration with optional per-move limits"""
+    def __init__(self, name, difficulty='hard', evaluator='classic', params=None,
+                 nnue_weights=None, depth=None, nodes=None, time=None, noise=None):
+        if difficulty not in ('easy', 'medium', 'hard'):
+            raise ValueError(f"Unknown difficulty: {difficulty}")
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"Unknown evaluator: {evaluator}")
+        self.name = name
+        self.difficulty = difficulty
+        self.evaluator = evaluator
+        self.params = params
+        self.nnue_weights = nnue_weights
+        self.depth = depth
+        self.nodes = nodes
+        self.time = time
+        self.noise = noise
+
+    @classmethod
+    def parse(cls, spec, default_name):
+        """Engine from 'key=value,...' options (see the module docstring)"""
+        options = {'name': default_name}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            key, separator, value = item.partition('=')
+            if not separator or key not in ENGINE_OPTIONS:
+                raise ValueError(f"Invalid engine option: {item}")
+            options[key] = ENGINE_OPTIONS[key](value)
+        return cls(**options)
+
+    def create(self):
+        bot = ChessBot(self.difficulty, evaluator=self.evaluator, params=self.params,
+                       nnue_weights=self.nnue_weights)
+        self.configure(bot)
+        return bot
+
+    def configure(self, bot):
+        """Reset bot for a new game and apply the limits on top of its level"""
+        bot.reset()
+        if self.depth is not None:
+            bot.max_depth = self.depth or 100
+        if self.nodes is not None:
+            bot.max_nodes = self.nodes or None
+        if self.time is not None:
+            bot.max_time = self.time or None
+        if self.noise is not None:
+            bot.eval_noise = self.noise
+
+
+class Adjudication:
+    """
+    Rules that end games early from the engines' own scores (white's view)
+    - win: the last resign_moves scores of both sides are beyond resign_score
+    - draw: from move draw_after on, the last draw_moves scores of both sides
+      are within draw_score
+    """
+    def __init__(self, resign_score=1000, resign_moves=3, draw_score=10, draw_moves=8,
+                 draw_after=40):
+        self.resign_score = resign_score
+        self.resign_moves = resign_moves
+        self.draw_score = draw_score
+        self.draw_moves = draw_moves
+        self.draw_after = draw_after
+
+    def result(self, scores, ply):
+        """'1-0', '0-1' or '1/2-1/2' if the game can be adjudicated, else None"""
+        if self.resign_moves:
+            recent = scores[-2 * self.resign_moves:]
+            if len(recent) == 2 * self.resign_moves and None not in recent:
+                if min(recent) >= self.resign_score:
+                    return '1-0'
+                if max(recent) <= -self.resign_score:
+                    return '0-1'
+        if self.draw_moves and ply >= 2 * self.draw_after:
+            recent = scores[-2 * self.draw_moves:]
+            if len(recent) == 2 * self.draw_moves and None not in recent and \
+                    max(abs(score) for score in recent) <= self.draw_score:
+                return '1/2-1/2'
+        return None
+
+
+def read_openings(path):
+    """
+    (fen, [uci moves]) start positions: every EPD/FEN line, or the mainline
+    of every game of a PGN file (played out in the match PGN)
+    """
+    openings = []
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        if path.lower().endswith('.pgn'):
+            import chess.pgn
+
+            while True:
+                game = chess.pgn.read_game(stream)
+                if game is None:
+                    break
+                openings.append((game.board().fen(),
+                                 [move.uci() for move in game.mainline_moves()]))
+            return openings
+
+        for line in stream:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                board, _operations = chess.Board.from_epd(line)
+            except ValueError:
+                board = chess.Board(line)
+            openings.append((board.fen(), []))
+    return openings
+
+
+def init_worker(engines, adjudication):
+    global _worker_engines, _worker_bots, _worker_adjudication
+    _worker_engines = engines
+    _worker_bots = [engine.create() for engine in engines]
+    _worker_adjudication = adjudication
+
+
+def play_game(task):
+    """
+    Play one game in a worker process
+    :param task: (game index, start fen, opening moves, index of the engine playing white)
+    :return: dict with the moves, per-move comments, result and termination
+    """
+    index, fen, opening, white = task
+    board = chess.Board(fen)
+    for uci in opening:
+        board.push_uci(uci)
+    for engine, bot in zip(_worker_engines, _worker_bots):
+        engine.configure(bot)
+
+    moves = []
+    comments = []
+    scores = []
+    depths = []
+    times = []
+    result = None
+    termination = None
+    while result is None:
+        outcome = board.outcome(claim_draw=True)
+        if outcome:
+            result = outcome.result()
+            termination = outcome.termination.name.lower().replace('_', ' ')
+            break
+        if len(moves) >= MAX_PLIES:
+            result, termination = '1/2-1/2', 'move limit'
+            break
+
+        engine = white if board.turn == chess.WHITE else 1 - white
+        stats = _worker_bots[engine].search(board)
+        move = stats.best_move
+        score = stats.score
+        if score is not None and board.turn == chess.BLACK:
+            score = -score
+        scores.append(score)
+        depths.append(stats.depth)
+        times.append(stats.elapsed)
+        board.push(move)
+        moves.append(move.uci())
+        score_text = f"{score / 100:+.2f}" if score is not None else "?"
+        comments.append(f"{score_text}/{stats.depth} {stats.elapsed:.2f}s")
+
+        result = _worker_adjudication.result(scores, len(moves))
+        if result:
+            termination = 'adjudication'
+    return {'index': index, 'fen': fen, 'opening': opening, 'white': white, 'moves': moves,
+            'comments': comments, 'scores': scores, 'depths': depths, 'times': times,
+            'result': result, 'termination': termination}
+
+
+def game_pgn(record, engines, event):
+    """PGN text of a play_game record"""
+    import chess.pgn
+
+    game = chess.pgn.Game()
+    game.headers['Event'] = event
+    game.headers['Site'] = 'ChessBot match'
+    game.headers['Date'] = date.today().strftime('%Y.%m.%d')
+    game.headers['Round'] = str(record['index'] + 1)
+    game.headers['White'] = engines[record['white']].name
+    game.headers['Black'] = engines[1 - record['white']].name
+    game.headers['Result'] = record['result']
+    game.headers['Termination'] = record['termination']
+    if record['fen'] != chess.STARTING_FEN:
+        game.setup(record['fen'])
+    node = game
+    for uci in record['opening']:
+        node = node.add_variation(chess.Move.from_uci(uci))
+    if record['opening']:
+        node.comment = 'book'
+    for uci, comment in zip(record['moves'], record['comments']):
+        node = node.add_variation(chess.Move.from_uci(uci))
+        node.comment = comment
+    return str(game)
+
+
+def record_game(writer, record, engines, event):
+    """Append a play_game record to a Chess_record.GameWriter (opening moves without info)"""
+    book = len(record['opening'])
+    moves = [chess.Move.from_uci(uci) for uci in record['opening'] + record['moves']]
+    metadata = {'Event': event, 'Round': record['index'] + 1,
+                'White': engines[record['white']].name,
+                'Black': engines[1 - record['white']].name,
+                'Termination': record['termination'], 'Book': book}
+    writer.write_game(moves, record['result'], record['fen'], metadata,
+                      [None] * book + record['scores'], [0] * book + record['depths'],
+                      [0.0] * book + record['times'])
+
+
+def elo_difference(score):
+    """Elo difference of a score fraction, infinite at 0 and 1"""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_estimate(wins, draws, losses):
+    """(Elo, 95% error) of engine1 from its wins, draws and losses"""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 +
+                losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    elo = elo_difference(score)
+    if math.isinf(elo):
+        return elo, math.inf
+    error = (elo_difference(score + margin) - elo_difference(score - margin)) / 2
+    return elo, error
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    Log-likelihood ratio of H1 (engine1 is elo1 stronger) against H0 (elo0),
+    in the usual normal approximation of the trinomial model
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 +
+                losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha, beta):
+    """(lower, upper) LLR bounds: accept H0 below, H1 above"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_match(engines, games, openings=None, workers=None, pgn_path=None, adjudication=None,
+              sprt=None, shuffle=False, seed=None, event='ChessBot match', record_path=None):
+    """
+    Play games between engines[0] and engines[1] and return (wins, draws,
+    losses) of engines[0]; game i uses opening i // 2 with engines[0] white
+    in even games
+    :param sprt: optional (elo0, elo1, alpha, beta); the match stops once the
+                 LLR leaves its bounds
+    :param record_path: optional Chess_record file the games are appended to
+    """
+    openings = openings or [(chess.STARTING_FEN, line.split()) for line in OPENINGS]
+    if shuffle:
+        openings = list(openings)
+        random.Random(seed).shuffle(openings)
+    games += games % 2
+    workers = workers or os.cpu_count() or 1
+    adjudication = adjudication or Adjudication()
+    tasks = [(index,) + openings[index // 2 % len(openings)] + (index % 2,)
+             for index in range(games)]
+
+    wins = draws = losses = 0
+    bounds = sprt_bounds(*sprt[2:]) if sprt else None
+    pgn_file = open(pgn_path, 'a', encoding='utf-8') if pgn_path else None
+    record_writer = None
+    if record_path:
+        from Chess_record import GameWriter
+        record_writer = GameWriter(record_path)
+    start_time = time.time()
+    try:
+        with multiprocessing.Pool(workers, initializer=init_worker,
+                                  initargs=(engines, adjudication)) as pool:
+            for played, record in enumerate(pool.imap_unordered(play_game, tasks), 1):
+                if pgn_file:
+                    pgn_file.write(game_pgn(record, engines, event) + '\n\n')
+                    pgn_file.flush()
+                if record_writer:
+                    record_game(record_writer, record, engines, event)
+
+                result = record['result']
+                if result == '1/2-1/2':
+                    draws += 1
+                elif (result == '1-0') == (record['white'] == 0):
+                    wins += 1
+                else:
+                    losses += 1
+
+                elo, error = elo_estimate(wins, draws, losses)
+                line = f"Game {played}/{games}: +{wins} ={draws} -{losses}  Elo {elo:+.1f} +/- {error:.1f}"
+                if sprt:
+                    llr = sprt_llr(wins, draws, losses, sprt[0], sprt[1])
+                    line += f"  LLR {llr:.2f} [{bounds[0]:.2f}, {bounds[1]:.2f}]"
+                print(line, file=sys.stderr)
+                if sprt and not bounds[0] < llr < bounds[1]:
+                    print(f"SPRT: {'H1' if llr >= bounds[1] else 'H0'} accepted", file=sys.stderr)
+                    break
+    finally:
+        if pgn_file:
+            pgn_file.close()
+        if record_writer:
+            record_writer.close()
+
+    elapsed = time.time() - start_time
+    print(f"{engines[0].name} vs {engines[1].name}: +{wins} ={draws} -{losses} "
+          f"in {elapsed:.0f} seconds", file=sys.stderr)
+    return wins, draws, losses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play ChessBot configurations against each other")
+    parser.add_argument('--engine1', default='', help="Options of the first engine (key=value,...)")
+    parser.add_argument('--engine2', default='', help="Options of the second engine (key=value,...)")
+    parser.add_argument('--each', default='', help="Options applied to both engines first")
+    parser.add_argument('--games', type=int, default=100, help="Number of games (default: 100)")
+    parser.add_argument('--openings', help="EPD/FEN or PGN file of start positions "
+                                           "(default: a small built-in suite)")
+    parser.add_argument('--shuffle', action='store_true', help="Shuffle the openings")
+    parser.add_argument('--seed', type=int, help="Seed for --shuffle")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--pgn', help="Append every finished game to this PGN file")
+    parser.add_argument('--record', help="Append every finished game to this binary "
+                                         "game record file (see Chess_record)")
+    parser.add_argument('--resign-score', type=int, default=1000,
+                        help="Adjudicate a win beyond this score in centipawns (default: 1000)")
+    parser.add_argument('--resign-moves', type=int, default=3,
+                        help="...for this many moves by each side (0: never, default: 3)")
+    parser.add_argument('--draw-score', type=int, default=10,
+                        help="Adjudicate a draw within this score (default: 10)")
+    parser.add_argument('--draw-moves', type=int, default=8,
+                        help="...for this many moves by each side (0: never, default: 8)")
+    parser.add_argument('--draw-after', type=int, default=40,
+                        help="...but not before this move number (default: 40)")
+    parser.add_argument('--sprt', metavar='ELO0,ELO1',
+                        help="Stop when the SPRT of engine1 being ELO1 rather than ELO0 "
+                             "stronger is decided")
+    parser.add_argument('--alpha', type=float, default=0.05, help="SPRT type I error (default: 0.05)")
+    parser.add_argument('--beta', type=float, default=0.05, help="SPRT type II error (default: 0.05)")
+    args = parser.parse_args(argv)
+
+    try:
+        engines = [Engine.parse(args.each + ',' + args.engine1, 'engine1'),
+                   Engine.parse(args.each + ',' + args.engine2, 'engine2')]
+    except (ValueError, TypeError) as error:
+        parser.error(str(error))
+    sprt = None
+    if args.sprt:
+        elo0, elo1 = (float(value) for value in args.sprt.split(','))
+        sprt = (elo0, elo1, args.alpha, args.beta)
+    openings = read_openings(args.openings) if args.openings else None
+    adjudication = Adjudication(args.resign_score, args.resign_moves, args.draw_score,
+                                args.draw_moves, args.draw_after)
+
+    run_match(engines, args.games, openings, args.workers, args.pgn, adjudication, sprt,
+              args.shuffle, args.seed, record_path=args.record)
+
+
+if __name__ == "__main__":
+    main()
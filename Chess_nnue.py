@@ -0,0 +1,257 @@
+"""
+Small neural evaluator with an incrementally updated accumulator (NNUE style)
+The network sees 768 binary features, one per (color, piece type, square),
+from both sides: from white's side as they are, from black's side with the
+colors swapped and the board flipped, so one first layer serves both. Its
+first layer output is an accumulator per side, the sum of the feature columns
+of all pieces on the board plus a bias. The output layer clips both to [0, 1]
+and takes one dot product, the side to move's half first, which gives a score
+in centipawns for the side to move.
+
+The search runs on an NNUEBoard, which keeps a stack of accumulators: push
+adds the columns of the pieces a move puts down and subtracts those it picks
+up (two to four columns), pop drops the top one. A leaf evaluation is then a
+clip and a dot product instead of the Python evaluation terms.
+
+Weights are read from a .npz file holding:
+    feature_weights  (768, hidden)  rows in feature() order
+    feature_bias     (hidden,)
+    output_weights   (2 * hidden,)  side to move's half first
+    output_bias      ()
+
+Usage:
+    python Chess_nnue.py --init nnue.npz    # network scoring material + piece-square tables
+    python Chess_nnue.py --check nnue.npz   # incremental vs full evaluation on random games
+    bot = ChessBot(evaluator='nnue')        # loads DEFAULT_WEIGHTS, else the classic eval
+"""
+import argparse
+import os
+import random
+import time
+
+import chess
+import numpy as np
+
+from Chess_position import SearchBoard
+
+# Weights file ChessBot(evaluator='nnue') loads unless told otherwise
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nnue.npz')
+
+FEATURES = 768
+
+# Scale of the --init network: its accumulators hold 0.5 + score / INIT_SCALE,
+# which stays inside the clipping range for any reachable material balance
+INIT_SCALE = 32768
+
+
+def feature(color, piece_type, square):
+    """Input index of a piece as seen by white; planes of white pieces come first"""
+    return ((0 if color == chess.WHITE else 6) + piece_type - 1) * 64 + square
+
+
+def mirrored_feature(color, piece_type, square):
+    """Input index of a piece as seen by black: colors swapped and the board flipped"""
+    return ((0 if color == chess.BLACK else 6) + piece_type - 1) * 64 + (square ^ 56)
+
+
+class Network:
+    """First-layer columns and output weights of a network, plus accumulator updates"""
+
+    def __init__(self, feature_weights, feature_bias, output_weights, output_bias):
+        feature_weights = np.asarray(feature_weights, dtype=np.float32)
+        hidden = feature_weights.shape[1] if feature_weights.ndim == 2 else 0
+        if feature_weights.shape != (FEATURES, hidden) or hidden == 0:
+            raise ValueError(f"feature_weights must have shape ({FEATURES}, hidden), "
+                             f"not {feature_weights.shape}")
+        feature_bias = np.asarray(feature_bias, dtype=np.float32)
+        output_weights = np.asarray(output_weights, dtype=np.float32)
+        if feature_bias.shape != (hidden,) or output_weights.shape != (2 * hidden,):
+            raise ValueError(f"feature_bias and output_weights must have shapes "
+                             f"({hidden},) and ({2 * hidden},)")
+        self.hidden = hidden
+        self.feature_weights = feature_weights
+        self.feature_bias = feature_bias
+        self.output_weights = output_weights
+        self.output_bias = float(output_bias)
+
+        # columns[feature(...)] holds the white and black accumulator rows of a
+        # piece, so one addition updates both sides
+        mirror = [mirrored_feature(color, piece_type, square)
+                  for color in (chess.WHITE, chess.BLACK)
+                  for piece_type in chess.PIECE_TYPES for square in chess.SQUARES]
+        self.columns = np.stack([feature_weights, feature_weights[mirror]], axis=1)
+        self.bias = np.stack([feature_bias, feature_bias])
+        # Output weights in accumulator order (white row first) for each side to move
+        self.turn_weights = [np.concatenate([output_weights[hidden:], output_weights[:hidden]]),
+                             output_weights]
+
+    @classmethod
+    def load(cls, path=DEFAULT_WEIGHTS):
+        """Read a network from a .npz file (OSError, KeyError or ValueError if it is unusable)"""
+        with np.load(path) as data:
+            return cls(data['feature_weights'], data['feature_bias'],
+                       data['output_weights'], data['output_bias'])
+
+    def save(self, path):
+        np.savez(path, feature_weights=self.feature_weights, feature_bias=self.feature_bias,
+                 output_weights=self.output_weights, output_bias=np.float32(self.output_bias))
+
+    def board(self, board):
+        """NNUEBoard of a chess.Board or SearchBoard position, for the search"""
+        return NNUEBoard.from_board(board, self)
+
+    def refresh(self, board):
+        """Accumulators (white row, black row) of a position, computed from scratch"""
+        features = []
+        for color in (chess.WHITE, chess.BLACK):
+            for piece_type in chess.PIECE_TYPES:
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    features.append(feature(color, piece_type, square))
+        return self.bias + self.columns[features].sum(axis=0)
+
+    def update(self, accumulator, undo, board):
+        """
+        Accumulators after the move of an undo record from SearchBoard.make(),
+        played on board: only the piece types the move touched are compared
+        """
+        move, piece_type, captured, old_bbs, old_occupied_co = undo[:5]
+        bbs = board.bbs
+        occupied_co = board.occupied_co
+        columns = self.columns
+        touched = {piece_type, captured, move.promotion or 0}
+        if piece_type == chess.KING:
+            touched.add(chess.ROOK)
+        touched.discard(0)
+        for touched_type in touched:
+            for color in (chess.WHITE, chess.BLACK):
+                before = old_bbs[touched_type] & old_occupied_co[color]
+                after = bbs[touched_type] & occupied_co[color]
+                if before == after:
+                    continue
+                for square in chess.scan_forward(after & ~before):
+                    accumulator = accumulator + columns[feature(color, touched_type, square)]
+                for square in chess.scan_forward(before & ~after):
+                    accumulator = accumulator - columns[feature(color, touched_type, square)]
+        return accumulator
+
+    def output(self, accumulator, turn):
+        """Score in centipawns for the side to move"""
+        activated = np.minimum(np.maximum(accumulator, 0), 1).ravel()
+        return float(activated @ self.turn_weights[turn]) + self.output_bias
+
+    def evaluate(self, board):
+        """Score of any board for the side to move; NNUEBoards use their accumulator"""
+        if isinstance(board, NNUEBoard) and board.network is self:
+            return self.output(board.accumulators[-1], board.turn)
+        return self.output(self.refresh(board), board.turn)
+
+
+class NNUEBoard(SearchBoard):
+    """SearchBoard that keeps the network's accumulators in step with push/pop"""
+    __slots__ = ('network', 'accumulators')
+
+    def __init__(self, network, fen=chess.STARTING_FEN):
+        self.network = network
+        SearchBoard.__init__(self, fen)
+
+    @classmethod
+    def from_board(cls, board, network):
+        position = cls.__new__(cls)
+        position.network = network
+        position.set_board(board)
+        return position
+
+    def set_board(self, board):
+        SearchBoard.set_board(self, board)
+        self.accumulators = [self.network.refresh(self)]
+
+    def push(self, move):
+        undo = self.make(move)
+        self.undo_stack.append(undo)
+        self.move_stack.append(move)
+        self.accumulators.append(self.network.update(self.accumulators[-1], undo, self))
+
+    def pop(self):
+        self.accumulators.pop()
+        return SearchBoard.pop(self)
+
+    def evaluate(self):
+        """Network score of the position for the side to move"""
+        return self.network.output(self.accumulators[-1], self.turn)
+
+
+def initial_network(hidden=32):
+    """
+    Network scoring the material and middlegame piece-square terms of
+    evaluate_board: unit 0 of each accumulator holds that side's score, the
+    other units start at zero. White reads the tables rotated and black only
+    flipped, which one first layer shared by both sides can only average, so
+    scores are within a few centipawns of those terms. A starting point for
+    training, not a stronger evaluation.
+    """
+    from Chess_Bot import PIECE_VALUES
+    from Chess_eval import WEIGHTS_MIDDLEGAME
+
+    # The kings are always on the board, so their material value cancels out
+    weights = WEIGHTS_MIDDLEGAME.reshape(12, 64).copy()
+    weights[5] -= PIECE_VALUES[chess.KING]
+    weights[11] += PIECE_VALUES[chess.KING]
+    feature_weights = np.zeros((FEATURES, hidden))
+    feature_weights[:, 0] = weights.reshape(FEATURES) / INIT_SCALE
+    feature_bias = np.zeros(hidden)
+    feature_bias[0] = 0.5
+    output_weights = np.zeros(2 * hidden)
+    output_weights[0] = INIT_SCALE / 2
+    output_weights[hidden] = -INIT_SCALE / 2
+    return Network(feature_weights, feature_bias, output_weights, 0.0)
+
+
+def check_network(network, games=20, max_plies=120, seed=1):
+    """
+    Play random games on an NNUEBoard and compare the incremental score of
+    every position with a full refresh; print the largest difference and the
+    cost of an incremental update plus evaluation
+    """
+    rng = random.Random(seed)
+    max_error = 0.0
+    positions = 0
+    update_time = 0.0
+    for _game in range(games):
+        board = network.board(chess.Board())
+        for _ply in range(max_plies):
+            moves = board.legal_moves
+            if not moves:
+                break
+            move = rng.choice(moves)
+            start_time = time.perf_counter()
+            board.push(move)
+            score = board.evaluate()
+            update_time += time.perf_counter() - start_time
+            max_error = max(max_error, abs(score - network.evaluate(board.to_board())))
+            positions += 1
+    print(f"{positions} positions: largest difference {max_error:.6f} cp, "
+          f"push + evaluate {update_time / positions * 1e6:.1f} us")
+    return max_error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NNUE-style evaluator weights")
+    parser.add_argument('--init', metavar='PATH',
+                        help="Write a network scoring the material and piece-square terms")
+    parser.add_argument('--hidden', type=int, default=32,
+                        help="Hidden units per side of the --init network (default: 32)")
+    parser.add_argument('--check', metavar='PATH',
+                        help="Compare incremental and full evaluation of a network on random games")
+    args = parser.parse_args(argv)
+
+    if args.init:
+        initial_network(args.hidden).save(args.init)
+        print(f"Wrote {args.init}")
+    if args.check:
+        check_network(Network.load(args.check))
+    if not (args.init or args.check):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Perft and move-generation throughput benchmark
+Counts the leaf nodes of the legal move tree to a fixed depth, which checks
+move generation against known results and measures how fast the board
+layer under the search is on its own. --board search runs the same tree on
+the search's SearchBoard, validating it against the python-chess counts.
+
+Usage:
+    python Chess_perft.py --depth 4
+    python Chess_perft.py --position kiwipete --depth 3 --divide
+    python Chess_perft.py --fen "<fen>" --depth 5 --workers 8
+    python Chess_perft.py --board search --depth 4
+    python Chess_perft.py --layers
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+import chess
+
+from Chess_Bot import ChessBot
+from Chess_position import SearchBoard
+
+# Standard perft positions with their known leaf counts for depth 1, 2, 3, ...
+PERFT_POSITIONS = {
+    'startpos': ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                 [20, 400, 8902, 197281, 4865609]),
+    'kiwipete': ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603]),
+    'position3': ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  [14, 191, 2812, 43238, 674624]),
+    'position4': ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  [6, 264, 9467, 422333]),
+    'position5': ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  [44, 1486, 62379, 2103487]),
+    'position6': ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  [46, 2079, 89890, 3894594]),
+}
+
+# Board implementations perft can run on
+BOARD_TYPES = {
+    'python-chess': chess.Board,
+    'search': SearchBoard,
+}
+
+
+def perft(board, depth):
+    """Count the leaf nodes of the legal move tree below board"""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        # Bulk counting: the leaves are exactly the legal moves
+        return board.legal_moves.count()
+
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def _perft_root_move(task):
+    """Worker entry point: perft below a single root move"""
+    fen, uci, depth, board_type = task
+    board = BOARD_TYPES[board_type](fen)
+    board.push(chess.Move.from_uci(uci))
+    return uci, perft(board, depth - 1)
+
+
+def divide(fen, depth, workers=1, board_type='python-chess'):
+    """
+    Return {uci: leaf count} for every root move
+    With more than one worker the root moves are spread over a process pool.
+    """
+    board = BOARD_TYPES[board_type](fen)
+    tasks = [(fen, move.uci(), depth, board_type) for move in board.legal_moves]
+
+    if workers > 1 and depth > 1:
+        with multiprocessing.Pool(workers) as pool:
+            return dict(pool.map(_perft_root_move, tasks))
+    return dict(_perft_root_move(task) for task in tasks)
+
+
+def run_perft(fen, depth, workers=1, show_divide=False, expected=None, board_type='python-chess'):
+    """Run perft on one position, print the results and return the leaf count"""
+    start_time = time.perf_counter()
+    if depth == 0:
+        counts = {}
+        nodes = 1
+    else:
+        counts = divide(fen, depth, workers, board_type)
+        nodes = sum(counts.values())
+    elapsed = time.perf_counter() - start_time
+
+    if show_divide:
+        for uci in sorted(counts):
+            print(f"{uci}: {counts[uci]}")
+        print()
+
+    status = ""
+    if expected is not None:
+        status = "  OK" if nodes == expected else f"  MISMATCH (expected {expected})"
+    rate = nodes / elapsed if elapsed > 0 else 0
+    print(f"perft({depth}) = {nodes}  time {elapsed:.2f}s  leaves/sec {rate:.0f}{status}")
+    return nodes
+
+
+def time_operation(name, positions, operation, min_time=0.5):
+    """Repeat operation over the positions for at least min_time and print its throughput"""
+    calls = 0
+    start_time = time.perf_counter()
+    elapsed = 0
+    while elapsed < min_time:
+        for board in positions:
+            operation(board)
+        calls += len(positions)
+        elapsed = time.perf_counter() - start_time
+    print(f"{name:28s} {calls / elapsed:10.0f} calls/sec  {elapsed / calls * 1e6:8.1f} us/call")
+
+
+def push_pop_all(board):
+    for move in board.legal_moves:
+        board.push(move)
+        board.pop()
+
+
+def run_layer_benchmark():
+    """
+    Measure the cost of each layer the search is built on
+    Comparing these per-call costs with the search NPS shows how a node's time
+    splits between move generation, evaluation and search overhead.
+    """
+    bot = ChessBot(difficulty='hard')
+    boards = [chess.Board(fen) for fen, _counts in PERFT_POSITIONS.values()]
+    # The search helpers and evaluation run on SearchBoards, like in the search.
+    # Its legal move cache is dropped before each generation so it is timed in full.
+    positions = [SearchBoard(fen) for fen, _counts in PERFT_POSITIONS.values()]
+
+    def fresh_legal_moves(board):
+        board.legal_cache = None
+        return board.generate_legal_moves()
+
+    print("Move generation (python-chess):")
+    time_operation("legal move generation", boards, lambda b: list(b.legal_moves))
+    time_operation("push/pop all legal moves", boards, push_pop_all)
+    time_operation("is_checkmate", boards, lambda b: b.is_checkmate())
+    time_operation("fen()", boards, lambda b: b.fen())
+
+    print("Move generation (SearchBoard):")
+    time_operation("legal move generation", positions, fresh_legal_moves)
+    time_operation("push/pop all legal moves", positions, push_pop_all)
+    time_operation("is_checkmate", positions, lambda b: b.is_checkmate())
+    time_operation("key() hashing", positions, bot.get_board_hash)
+
+    print("Search helpers:")
+    time_operation("order_moves", positions, bot.order_moves)
+    time_operation("see (all captures)", positions,
+                   lambda b: [bot.see(b, move) for move in b.generate_legal_captures()])
+
+    print("Evaluation:")
+    time_operation("evaluate_board", positions, bot.evaluate_board)
+    time_operation("  evaluate_material", positions, bot.evaluate_material)
+    time_operation("  evaluate_position", positions, bot.evaluate_position)
+    time_operation("  evaluate_mobility", positions, bot.evaluate_mobility)
+    time_operation("  evaluate_king_safety", positions, bot.evaluate_king_safety)
+    time_operation("  evaluate_pawn_structure", positions, bot.evaluate_pawn_structure)
+
+    print("Search:")
+    start_time = time.perf_counter()
+    nodes = 0
+    for board in boards:
+        bot.transposition_table.clear()
+        bot.set_fixed_depth(2)
+        nodes += bot.search(board).nodes
+    elapsed = time.perf_counter() - start_time
+    print(f"{'search (depth 2)':28s} {nodes / elapsed:10.0f} nodes/sec  "
+          f"{elapsed / nodes * 1e6:8.1f} us/node")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft and move-generation benchmark")
+    parser.add_argument('--position', choices=sorted(PERFT_POSITIONS),
+                        help="Standard position to run (default: all of them)")
+    parser.add_argument('--fen', help="Run perft on a custom position")
+    parser.add_argument('--depth', type=int, default=3, help="Perft depth (default: 3)")
+    parser.add_argument('--divide', action='store_true', help="Print the count for each root move")
+    parser.add_argument('--board', choices=sorted(BOARD_TYPES), default='python-chess',
+                        help="Board implementation to run perft on (default: python-chess)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Spread root moves over this many processes (0: CPU count)")
+    parser.add_argument('--layers', action='store_true',
+                        help="Measure move generation, evaluation and search throughput")
+    args = parser.parse_args(argv)
+
+    if args.layers:
+        run_layer_benchmark()
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    if args.fen:
+        run_perft(args.fen, args.depth, workers, args.divide, board_type=args.board)
+        return
+
+    names = [args.position] if args.position else list(PERFT_POSITIONS)
+    total_nodes = 0
+    start_time = time.perf_counter()
+    for name in names:
+        fen, counts = PERFT_POSITIONS[name]
+        expected = counts[args.depth - 1] if 0 < args.depth <= len(counts) else None
+        print(f"{name}: {fen}")
+        total_nodes += run_perft(fen, args.depth, workers, args.divide, expected, args.board)
+    elapsed = time.perf_counter() - start_time
+
+    if len(names) > 1:
+        print(f"Total: {total_nodes} leaves in {elapsed:.2f}s ({total_nodes / elapsed:.0f} leaves/sec)")
+
+
+if __name__ == "__main__":
+    main()
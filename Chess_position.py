@@ -0,0 +1,608 @@
+"""
+Search-only chess position
+SearchBoard holds a position as plain integer bitboards plus a square ->
+piece type mailbox and implements the part of the chess.Board interface the
+search uses. make() returns an undo record and unmake() restores the position
+from it, so nothing else is copied per move. Moves are generated
+pseudo-legally; only king moves, en passant captures and moves of pinned
+pieces get a legality test, as in python-chess, and the moves come out in
+the same order python-chess generates them.
+
+python-chess stays at the API boundary: ChessBot converts the board it is
+given with SearchBoard.from_board, and the moves it hands back are ordinary
+chess.Move objects. Standard chess only (no chess960 castling).
+
+Checked against python-chess with:
+    python Chess_perft.py --board search --depth 4
+"""
+import chess
+from chess import (BB_SQUARES, BB_KING_ATTACKS, BB_KNIGHT_ATTACKS, BB_PAWN_ATTACKS,
+                   BB_DIAG_ATTACKS, BB_DIAG_MASKS, BB_FILE_ATTACKS, BB_FILE_MASKS,
+                   BB_RANK_ATTACKS, BB_RANK_MASKS, BB_RAYS, BB_ALL, BB_RANKS,
+                   BB_RANK_1, BB_RANK_8, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                   WHITE, BLACK)
+
+# Squares strictly between two squares on a line, 0 when they are not aligned
+BB_BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+
+# Every move is one of these objects, so generating a move allocates nothing
+MOVES = [[chess.Move(from_square, to_square) for to_square in chess.SQUARES]
+         for from_square in chess.SQUARES]
+PROMOTIONS = {}
+for _from_square in chess.SQUARES:
+    for _to_square in chess.SQUARES:
+        if chess.square_rank(_to_square) in (0, 7):
+            PROMOTIONS[_from_square, _to_square] = [
+                chess.Move(_from_square, _to_square, promotion)
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT)]
+
+# chess.Piece objects for piece_at, by [color][piece type]
+PIECES = [[None] + [chess.Piece(piece_type, color) for piece_type in chess.PIECE_TYPES]
+          for color in (BLACK, WHITE)]
+
+# Rook moves of the castling moves, by king (from, to) square
+CASTLING_ROOKS = {
+    (chess.E1, chess.G1): (chess.H1, chess.F1),
+    (chess.E1, chess.C1): (chess.A1, chess.D1),
+    (chess.E8, chess.G8): (chess.H8, chess.F8),
+    (chess.E8, chess.C8): (chess.A8, chess.D8),
+}
+
+
+class MoveList(list):
+    """List of moves; count() without an argument counts them, like chess.Board.legal_moves"""
+    def count(self, *args):
+        return list.count(self, *args) if args else len(self)
+
+
+class SearchBoard:
+    """
+    Lightweight position for the search
+    bbs[piece_type] is the bitboard of that piece type (both colors),
+    occupied_co[color] the squares of one side and mailbox[square] the piece
+    type on a square (0 when empty). The legal moves of the position are
+    cached until the next make/unmake; the cached list must not be modified.
+    """
+    __slots__ = ('bbs', 'occupied_co', 'occupied', 'mailbox', 'turn', 'castling_rights',
+                 'ep_square', 'halfmove_clock', 'fullmove_number', 'move_stack',
+                 'undo_stack', 'legal_cache')
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        self.set_board(chess.Board(fen))
+
+    @classmethod
+    def from_board(cls, board):
+        """The position of a chess.Board (its move history is not copied)"""
+        position = cls.__new__(cls)
+        position.set_board(board)
+        return position
+
+    def set_board(self, board):
+        self.bbs = [0, board.pawns, board.knights, board.bishops,
+                    board.rooks, board.queens, board.kings]
+        self.occupied_co = [board.occupied_co[BLACK], board.occupied_co[WHITE]]
+        self.occupied = board.occupied
+        self.mailbox = [board.piece_type_at(square) or 0 for square in chess.SQUARES]
+        self.turn = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.move_stack = []
+        self.undo_stack = []
+        self.legal_cache = None
+
+    def to_board(self):
+        """The position as a chess.Board (without move history)"""
+        board = chess.Board.empty()
+        (_, board.pawns, board.knights, board.bishops,
+         board.rooks, board.queens, board.kings) = self.bbs
+        board.occupied_co = [self.occupied_co[BLACK], self.occupied_co[WHITE]]
+        board.occupied = self.occupied
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def copy(self):
+        """Copy of the position (without move history)"""
+        return SearchBoard.from_board(self.to_board())
+
+    def fen(self):
+        return self.to_board().fen()
+
+    def key(self):
+        """
+        Hashable identity of the position for transposition and repetition
+        lookups: pieces, side to move, castling rights and a capturable en
+        passant square, without the move clocks
+        """
+        ep_square = self.ep_square
+        if ep_square is not None and not (self.bbs[PAWN] & self.occupied_co[self.turn] &
+                                          BB_PAWN_ATTACKS[not self.turn][ep_square]):
+            ep_square = None
+        bbs = self.bbs
+        return (bbs[PAWN], bbs[KNIGHT], bbs[BISHOP], bbs[ROOK], bbs[QUEEN], bbs[KING],
+                self.occupied_co[WHITE], self.turn, self.castling_rights, ep_square)
+
+    # Make / unmake
+
+    def make(self, move):
+        """Play a pseudo-legal move and return the undo record that takes it back"""
+        from_square = move.from_square
+        to_square = move.to_square
+        turn = self.turn
+        bbs = self.bbs
+        occupied_co = self.occupied_co
+        mailbox = self.mailbox
+        piece_type = mailbox[from_square]
+        captured = mailbox[to_square]
+        ep_square = self.ep_square
+        undo = (move, piece_type, captured, bbs[:], occupied_co[:], self.occupied,
+                self.castling_rights, ep_square, self.halfmove_clock, self.fullmove_number,
+                self.legal_cache)
+
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        self.ep_square = None
+        self.halfmove_clock += 1
+        if turn == BLACK:
+            self.fullmove_number += 1
+        self.castling_rights &= ~(from_bb | to_bb)
+
+        bbs[piece_type] ^= from_bb
+        occupied_co[turn] ^= from_bb
+        mailbox[from_square] = 0
+        if captured:
+            bbs[captured] ^= to_bb
+            occupied_co[not turn] ^= to_bb
+            self.halfmove_clock = 0
+
+        if piece_type == PAWN:
+            self.halfmove_clock = 0
+            diff = to_square - from_square
+            if diff == 16 or diff == -16:
+                self.ep_square = from_square + diff // 2
+            elif to_square == ep_square and not captured and diff != 8 and diff != -8:
+                capture_square = to_square - 8 if turn == WHITE else to_square + 8
+                capture_bb = BB_SQUARES[capture_square]
+                bbs[PAWN] ^= capture_bb
+                occupied_co[not turn] ^= capture_bb
+                mailbox[capture_square] = 0
+            if move.promotion:
+                piece_type = move.promotion
+        elif piece_type == KING:
+            self.castling_rights &= ~(BB_RANK_1 if turn == WHITE else BB_RANK_8)
+            rook_squares = CASTLING_ROOKS.get((from_square, to_square))
+            if rook_squares:
+                rook_bb = BB_SQUARES[rook_squares[0]] | BB_SQUARES[rook_squares[1]]
+                bbs[ROOK] ^= rook_bb
+                occupied_co[turn] ^= rook_bb
+                mailbox[rook_squares[0]] = 0
+                mailbox[rook_squares[1]] = ROOK
+
+        bbs[piece_type] |= to_bb
+        occupied_co[turn] |= to_bb
+        mailbox[to_square] = piece_type
+        self.occupied = occupied_co[BLACK] | occupied_co[WHITE]
+        self.turn = not turn
+        self.legal_cache = None
+        return undo
+
+    def unmake(self, undo):
+        """Take back the move of an undo record returned by make()"""
+        (move, piece_type, captured, self.bbs, self.occupied_co, self.occupied,
+         self.castling_rights, ep_square, self.halfmove_clock, self.fullmove_number,
+         self.legal_cache) = undo
+        self.ep_square = ep_square
+        turn = self.turn = not self.turn
+
+        from_square = move.from_square
+        to_square = move.to_square
+        mailbox = self.mailbox
+        mailbox[from_square] = piece_type
+        mailbox[to_square] = captured
+        if piece_type == PAWN:
+            if to_square == ep_square and not captured and (to_square - from_square) % 8:
+                mailbox[to_square - 8 if turn == WHITE else to_square + 8] = PAWN
+        elif piece_type == KING:
+            rook_squares = CASTLING_ROOKS.get((from_square, to_square))
+            if rook_squares:
+                mailbox[rook_squares[0]] = ROOK
+                mailbox[rook_squares[1]] = 0
+
+    def push(self, move):
+        self.undo_stack.append(self.make(move))
+        self.move_stack.append(move)
+
+    def pop(self):
+        self.unmake(self.undo_stack.pop())
+        return self.move_stack.pop()
+
+    def peek(self):
+        return self.move_stack[-1]
+
+    # Board queries
+
+    def piece_type_at(self, square):
+        return self.mailbox[square] or None
+
+    def piece_at(self, square):
+        piece_type = self.mailbox[square]
+        if not piece_type:
+            return None
+        return PIECES[bool(self.occupied_co[WHITE] & BB_SQUARES[square])][piece_type]
+
+    def pieces_mask(self, piece_type, color):
+        return self.bbs[piece_type] & self.occupied_co[color]
+
+    def pieces(self, piece_type, color):
+        return chess.SquareSet(self.bbs[piece_type] & self.occupied_co[color])
+
+    def king(self, color):
+        king_mask = self.bbs[KING] & self.occupied_co[color]
+        return king_mask.bit_length() - 1 if king_mask else None
+
+    def attackers_mask(self, color, square, occupied=None):
+        """Pieces of color attacking square, with sliders seeing through to occupied"""
+        if occupied is None:
+            occupied = self.occupied
+        bbs = self.bbs
+        queens_and_rooks = bbs[QUEEN] | bbs[ROOK]
+        queens_and_bishops = bbs[QUEEN] | bbs[BISHOP]
+        attackers = (
+            (BB_KING_ATTACKS[square] & bbs[KING]) |
+            (BB_KNIGHT_ATTACKS[square] & bbs[KNIGHT]) |
+            (BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] & queens_and_rooks) |
+            (BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied] & queens_and_rooks) |
+            (BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied] & queens_and_bishops) |
+            (BB_PAWN_ATTACKS[not color][square] & bbs[PAWN]))
+        return attackers & self.occupied_co[color]
+
+    def is_attacked_by(self, color, square):
+        return bool(self.attackers_mask(color, square))
+
+    def attacks_mask(self, square):
+        """Squares attacked by the piece on square"""
+        piece_type = self.mailbox[square]
+        if piece_type == PAWN:
+            return BB_PAWN_ATTACKS[bool(self.occupied_co[WHITE] & BB_SQUARES[square])][square]
+        if piece_type == KNIGHT:
+            return BB_KNIGHT_ATTACKS[square]
+        if piece_type == KING:
+            return BB_KING_ATTACKS[square]
+        occupied = self.occupied
+        attacks = 0
+        if piece_type == BISHOP or piece_type == QUEEN:
+            attacks = BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied]
+        if piece_type == ROOK or piece_type == QUEEN:
+            attacks |= (BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] |
+                        BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied])
+        return attacks
+
+    def checkers_mask(self):
+        king = self.king(self.turn)
+        return 0 if king is None else self.attackers_mask(not self.turn, king)
+
+    def is_check(self):
+        return bool(self.checkers_mask())
+
+    def is_checkmate(self):
+        return self.is_check() and not self.generate_legal_moves()
+
+    def is_stalemate(self):
+        return not self.is_check() and not self.generate_legal_moves()
+
+    def is_en_passant(self, move):
+        to_square = move.to_square
+        return (self.ep_square == to_square and
+                self.mailbox[move.from_square] == PAWN and
+                abs(to_square - move.from_square) in (7, 9) and
+                not self.occupied & BB_SQUARES[to_square])
+
+    def is_capture(self, move):
+        touched = BB_SQUARES[move.from_square] ^ BB_SQUARES[move.to_square]
+        return bool(touched & self.occupied_co[not self.turn]) or self.is_en_passant(move)
+
+    def is_castling(self, move):
+        return (self.mailbox[move.from_square] == KING and
+                (move.from_square, move.to_square) in CASTLING_ROOKS)
+
+    def gives_check(self, move):
+        undo = self.make(move)
+        try:
+            return self.is_check()
+        finally:
+            self.unmake(undo)
+
+    def is_legal(self, move):
+        return move in self.generate_legal_moves()
+
+    def has_insufficient_material(self, color):
+        bbs = self.bbs
+        ours = self.occupied_co[color]
+        if ours & (bbs[PAWN] | bbs[ROOK] | bbs[QUEEN]):
+            return False
+        if ours & bbs[KNIGHT]:
+            return (chess.popcount(ours) <= 2 and
+                    not (self.occupied_co[not color] & ~bbs[KING] & ~bbs[QUEEN]))
+        if ours & bbs[BISHOP]:
+            bishops = bbs[BISHOP]
+            same_color = not bishops & chess.BB_DARK_SQUARES or not bishops & chess.BB_LIGHT_SQUARES
+            return same_color and not bbs[PAWN] and not bbs[KNIGHT]
+        return True
+
+    def is_insufficient_material(self):
+        return self.has_insufficient_material(WHITE) and self.has_insufficient_material(BLACK)
+
+    # Move generation
+
+    @property
+    def legal_moves(self):
+        return self.generate_legal_moves()
+
+    def generate_legal_captures(self):
+        """Legal captures (en passant last), in python-chess order"""
+        opponent = self.occupied_co[not self.turn]
+        ep_square = self.ep_square
+        return [move for move in self.generate_legal_moves()
+                if BB_SQUARES[move.to_square] & opponent or
+                (move.to_square == ep_square and self.is_en_passant(move))]
+
+    def generate_legal_moves(self):
+        """MoveList of the legal moves, cached until the position changes"""
+        cache = self.legal_cache
+        if cache is not None and cache[0] == self.turn:
+            return cache[1]
+
+        turn = self.turn
+        moves = MoveList()
+        king_mask = self.bbs[KING] & self.occupied_co[turn]
+        if not king_mask:
+            self.generate_pseudo_legal_moves(moves)
+        else:
+            king = king_mask.bit_length() - 1
+            blockers = self.slider_blockers(king)
+            checkers = self.attackers_mask(not turn, king)
+            pseudo_legal = MoveList()
+            if checkers:
+                self.generate_evasions(pseudo_legal, king, checkers)
+            else:
+                self.generate_pseudo_legal_moves(pseudo_legal)
+
+            # Lazy legality: only king moves, en passant and moves of
+            # pinned pieces can leave the king in check
+            ep_square = self.ep_square
+            for move in pseudo_legal:
+                from_square = move.from_square
+                if from_square == king:
+                    if (from_square, move.to_square) in CASTLING_ROOKS or \
+                            not self.attackers_mask(not turn, move.to_square):
+                        moves.append(move)
+                elif move.to_square == ep_square and self.is_en_passant(move):
+                    if self.pin_mask(turn, from_square) & BB_SQUARES[ep_square] and \
+                            not self.ep_skewered(king, from_square):
+                        moves.append(move)
+                elif not blockers & BB_SQUARES[from_square] or \
+                        BB_RAYS[from_square][move.to_square] & BB_SQUARES[king]:
+                    moves.append(move)
+
+        self.legal_cache = (turn, moves)
+        return moves
+
+    def generate_pseudo_legal_moves(self, moves, from_mask=BB_ALL, to_mask=BB_ALL):
+        """Append the pseudo-legal moves to moves"""
+        turn = self.turn
+        bbs = self.bbs
+        ours = self.occupied_co[turn]
+        occupied = self.occupied
+        mailbox = self.mailbox
+
+        # Pieces
+        pieces = ours & ~bbs[PAWN] & from_mask
+        while pieces:
+            from_square = pieces.bit_length() - 1
+            pieces ^= BB_SQUARES[from_square]
+            piece_type = mailbox[from_square]
+            if piece_type == KNIGHT:
+                targets = BB_KNIGHT_ATTACKS[from_square]
+            elif piece_type == KING:
+                targets = BB_KING_ATTACKS[from_square]
+            else:
+                targets = 0
+                if piece_type != ROOK:
+                    targets = BB_DIAG_ATTACKS[from_square][BB_DIAG_MASKS[from_square] & occupied]
+                if piece_type != BISHOP:
+                    targets |= (BB_RANK_ATTACKS[from_square][BB_RANK_MASKS[from_square] & occupied] |
+                                BB_FILE_ATTACKS[from_square][BB_FILE_MASKS[from_square] & occupied])
+            targets &= ~ours & to_mask
+            row = MOVES[from_square]
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                moves.append(row[to_square])
+
+        if from_mask & bbs[KING]:
+            self.generate_castling_moves(moves, from_mask, to_mask)
+
+        pawns = bbs[PAWN] & ours & from_mask
+        if not pawns:
+            return
+
+        # Pawn captures
+        opponent = self.occupied_co[not turn] & to_mask
+        pawn_attacks = BB_PAWN_ATTACKS[turn]
+        capturers = pawns
+        while capturers:
+            from_square = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[from_square]
+            targets = pawn_attacks[from_square] & opponent
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                if to_square < 8 or to_square >= 56:
+                    moves.extend(PROMOTIONS[from_square, to_square])
+                else:
+                    moves.append(MOVES[from_square][to_square])
+
+        # Pawn advances
+        if turn == WHITE:
+            single_moves = pawns << 8 & ~occupied
+            double_moves = single_moves << 8 & ~occupied & (BB_RANKS[2] | BB_RANKS[3])
+            step = -8
+        else:
+            single_moves = pawns >> 8 & ~occupied
+            double_moves = single_moves >> 8 & ~occupied & (BB_RANKS[5] | BB_RANKS[4])
+            step = 8
+        single_moves &= to_mask
+        double_moves &= to_mask
+        while single_moves:
+            to_square = single_moves.bit_length() - 1
+            single_moves ^= BB_SQUARES[to_square]
+            if to_square < 8 or to_square >= 56:
+                moves.extend(PROMOTIONS[to_square + step, to_square])
+            else:
+                moves.append(MOVES[to_square + step][to_square])
+        while double_moves:
+            to_square = double_moves.bit_length() - 1
+            double_moves ^= BB_SQUARES[to_square]
+            moves.append(MOVES[to_square + 2 * step][to_square])
+
+        if self.ep_square is not None:
+            self.generate_pseudo_legal_ep(moves, from_mask, to_mask)
+
+    def generate_pseudo_legal_ep(self, moves, from_mask=BB_ALL, to_mask=BB_ALL):
+        ep_square = self.ep_square
+        if not ep_square or not BB_SQUARES[ep_square] & to_mask or \
+                BB_SQUARES[ep_square] & self.occupied:
+            return
+        capturers = (self.bbs[PAWN] & self.occupied_co[self.turn] & from_mask &
+                     BB_PAWN_ATTACKS[not self.turn][ep_square] &
+                     BB_RANKS[4 if self.turn else 3])
+        while capturers:
+            from_square = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[from_square]
+            moves.append(MOVES[from_square][ep_square])
+
+    def generate_castling_moves(self, moves, from_mask=BB_ALL, to_mask=BB_ALL):
+        turn = self.turn
+        backrank = BB_RANK_1 if turn == WHITE else BB_RANK_8
+        king = self.occupied_co[turn] & self.bbs[KING] & backrank & from_mask
+        king &= -king
+        if not king:
+            return
+        king_square = king.bit_length() - 1
+        occupied = self.occupied
+
+        candidates = self.castling_rights & backrank & to_mask
+        while candidates:
+            candidate = candidates.bit_length() - 1
+            candidates ^= BB_SQUARES[candidate]
+            rook = BB_SQUARES[candidate]
+            a_side = rook < king
+            king_to = king_square - 2 if a_side else king_square + 2
+            rook_to = king_square - 1 if a_side else king_square + 1
+            king_to_bb = BB_SQUARES[king_to]
+            rook_to_bb = BB_SQUARES[rook_to]
+            king_path = BB_BETWEEN[king_square][king_to]
+            rook_path = BB_BETWEEN[candidate][rook_to]
+
+            if not ((occupied ^ king ^ rook) & (king_path | rook_path | king_to_bb | rook_to_bb) or
+                    self.attacked_for_king(king_path | king, occupied ^ king) or
+                    self.attacked_for_king(king_to_bb, occupied ^ king ^ rook ^ rook_to_bb)):
+                moves.append(MOVES[king_square][king_to])
+
+    def generate_evasions(self, moves, king, checkers):
+        """Append the pseudo-legal moves that may get the king out of check"""
+        bbs = self.bbs
+        sliders = checkers & (bbs[BISHOP] | bbs[ROOK] | bbs[QUEEN])
+        attacked = 0
+        while sliders:
+            checker = sliders.bit_length() - 1
+            sliders ^= BB_SQUARES[checker]
+            attacked |= BB_RAYS[king][checker] & ~BB_SQUARES[checker]
+
+        targets = BB_KING_ATTACKS[king] & ~self.occupied_co[self.turn] & ~attacked
+        while targets:
+            to_square = targets.bit_length() - 1
+            targets ^= BB_SQUARES[to_square]
+            moves.append(MOVES[king][to_square])
+
+        checker = checkers.bit_length() - 1
+        if BB_SQUARES[checker] == checkers:
+            # Capture or block a single checker
+            target = BB_BETWEEN[king][checker] | checkers
+            self.generate_pseudo_legal_moves(moves, ~bbs[KING], target)
+
+            # Capture the checking pawn en passant
+            ep_square = self.ep_square
+            if ep_square and not BB_SQUARES[ep_square] & target:
+                last_double = ep_square + (-8 if self.turn == WHITE else 8)
+                if last_double == checker:
+                    self.generate_pseudo_legal_ep(moves)
+
+    def attacked_for_king(self, path, occupied):
+        while path:
+            square = path.bit_length() - 1
+            path ^= BB_SQUARES[square]
+            if self.attackers_mask(not self.turn, square, occupied):
+                return True
+        return False
+
+    def slider_blockers(self, king):
+        """Pieces of the side to move that are pinned to its king"""
+        bbs = self.bbs
+        rooks_and_queens = bbs[ROOK] | bbs[QUEEN]
+        bishops_and_queens = bbs[BISHOP] | bbs[QUEEN]
+        snipers = ((BB_RANK_ATTACKS[king][0] & rooks_and_queens) |
+                   (BB_FILE_ATTACKS[king][0] & rooks_and_queens) |
+                   (BB_DIAG_ATTACKS[king][0] & bishops_and_queens))
+        snipers &= self.occupied_co[not self.turn]
+
+        blockers = 0
+        occupied = self.occupied
+        between = BB_BETWEEN[king]
+        while snipers:
+            sniper = snipers.bit_length() - 1
+            snipers ^= BB_SQUARES[sniper]
+            blocker = between[sniper] & occupied
+            # Pinned if exactly one piece is in between
+            if blocker and not blocker & (blocker - 1):
+                blockers |= blocker
+        return blockers & self.occupied_co[self.turn]
+
+    def pin_mask(self, color, square):
+        """Squares a piece on square may move to without exposing color's king"""
+        king = self.king(color)
+        if king is None:
+            return BB_ALL
+        square_mask = BB_SQUARES[square]
+        bbs = self.bbs
+        for attacks, sliders in ((BB_FILE_ATTACKS, bbs[ROOK] | bbs[QUEEN]),
+                                 (BB_RANK_ATTACKS, bbs[ROOK] | bbs[QUEEN]),
+                                 (BB_DIAG_ATTACKS, bbs[BISHOP] | bbs[QUEEN])):
+            rays = attacks[king][0]
+            if rays & square_mask:
+                snipers = rays & sliders & self.occupied_co[not color]
+                while snipers:
+                    sniper = snipers.bit_length() - 1
+                    snipers ^= BB_SQUARES[sniper]
+                    if BB_BETWEEN[sniper][king] & (self.occupied | square_mask) == square_mask:
+                        return BB_RAYS[king][sniper]
+                break
+        return BB_ALL
+
+    def ep_skewered(self, king, capturer):
+        """True if capturing en passant would expose the king along the rank (or a diagonal)"""
+        last_double = self.ep_square + (-8 if self.turn == WHITE else 8)
+        occupancy = (self.occupied & ~BB_SQUARES[last_double] &
+                     ~BB_SQUARES[capturer] | BB_SQUARES[self.ep_square])
+        bbs = self.bbs
+        opponent = self.occupied_co[not self.turn]
+        if BB_RANK_ATTACKS[king][BB_RANK_MASKS[king] & occupancy] & opponent & (bbs[ROOK] | bbs[QUEEN]):
+            return True
+        if BB_DIAG_ATTACKS[king][BB_DIAG_MASKS[king] & occupancy] & opponent & (bbs[BISHOP] | bbs[QUEEN]):
+            return True
+        return False
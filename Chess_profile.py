@@ -0,0 +1,325 @@
+"""
+Profiling support for ChessBot searches
+Two modes are available:
+- 'cprofile': wraps each search in cProfile (complete, but slows the search down a lot)
+- 'timers':   low-overhead timers around the hot paths only (evaluation terms,
+              move ordering, TT get/put, hashing, move generation, push/pop)
+
+Reports are written as pstats (cprofile mode), collapsed stacks for
+flamegraph tools and a plain-text table, either once per search or
+aggregated over the whole session.
+
+Usage:
+    bot = ChessBot('hard', profile='timers')
+    bot.get_best_move(board)
+    bot.profiler.dump('profile')      # profile.collapsed, profile.txt
+
+    python Chess_profile.py --depth 3 --mode cprofile --out profile
+"""
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import defaultdict
+
+PROFILE_MODES = ('cprofile', 'timers')
+
+# ChessBot methods timed in 'timers' mode, with the name used in the reports
+BOT_HOT_PATHS = {
+    'order_moves': 'order_moves',
+    'order_captures': 'order_captures',
+    'see': 'see',
+    'quiescence': 'quiescence',
+    'get_board_hash': 'board_key',
+    'evaluate_board': 'evaluate_board',
+    'evaluate_material': 'evaluate_material',
+    'evaluate_position': 'evaluate_position',
+    'evaluate_mobility': 'evaluate_mobility',
+    'evaluate_king_safety': 'evaluate_king_safety',
+    'evaluate_pawn_structure': 'evaluate_pawn_structure',
+}
+
+# SearchBoard methods timed in 'timers' mode. The search makes its SearchBoard
+# itself, so these are replaced on the class while a search is profiled.
+BOARD_HOT_PATHS = {
+    'push': 'push',
+    'pop': 'pop',
+    'is_checkmate': 'is_checkmate',
+    'generate_legal_moves': 'movegen',
+}
+
+
+class HotPathTimers:
+    """
+    Nested wall-clock timers keyed by call stack
+    Self time is recorded per stack so the result can be written directly
+    as collapsed stacks; calls and inclusive time are kept per name.
+    """
+    def __init__(self):
+        self.stack = []
+        self.child_time = []
+        self.self_times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.inclusive = defaultdict(float)
+
+    def enter(self, name):
+        self.stack.append(name)
+        self.child_time.append(0.0)
+        return time.perf_counter()
+
+    def exit(self, start):
+        elapsed = time.perf_counter() - start
+        name = self.stack[-1]
+        children = self.child_time.pop()
+        self.self_times[';'.join(self.stack)] += elapsed - children
+        self.stack.pop()
+        self.calls[name] += 1
+        # Only the outermost call of a name counts towards its inclusive time
+        if name not in self.stack:
+            self.inclusive[name] += elapsed
+        if self.child_time:
+            self.child_time[-1] += elapsed
+
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            start = self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit(start)
+        return timed
+
+    def wrap_generator(self, name, func):
+        """Time each step of a generator, leaving the consumer's time out"""
+        def timed(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            while True:
+                start = self.enter(name)
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    self.exit(start)
+                yield item
+        return timed
+
+    def collapsed(self):
+        """Collapsed-stack lines ("a;b;c <microseconds>") for flamegraph tools"""
+        return [f"{stack} {int(seconds * 1e6)}"
+                for stack, seconds in sorted(self.self_times.items()) if seconds > 0]
+
+    def table(self):
+        """Per-name calls, inclusive and self time, slowest first"""
+        self_by_name = defaultdict(float)
+        for stack, seconds in self.self_times.items():
+            self_by_name[stack.rsplit(';', 1)[-1]] += seconds
+        total = self.inclusive.get('search', 0) or sum(self_by_name.values())
+
+        lines = [f"{'function':26s} {'calls':>10s} {'total ms':>10s} {'self ms':>10s} {'self %':>7s}"]
+        for name in sorted(self.inclusive, key=self.inclusive.get, reverse=True):
+            share = self_by_name[name] / total if total else 0
+            lines.append(f"{name:26s} {self.calls[name]:10d} {self.inclusive[name] * 1e3:10.1f} "
+                         f"{self_by_name[name] * 1e3:10.1f} {share:7.1%}")
+        return lines
+
+
+def _frame_name(func):
+    filename, line, name = func
+    return f"{os.path.basename(filename)}:{name}" if filename != '~' else name
+
+
+def pstats_to_collapsed(stats, min_seconds=1e-5, max_depth=40):
+    """
+    Approximate collapsed stacks from cProfile's caller graph
+    cProfile only records caller/callee pairs, so a callee's time is split
+    over its callers in proportion to the time each of them spent in it.
+    Recursive calls are folded into the outermost frame.
+    """
+    entries = stats.stats
+    callees = defaultdict(dict)
+    for func, (_cc, _nc, _tt, _ct, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge
+
+    roots = [func for func, entry in entries.items()
+             if not any(caller in entries for caller in entry[4])]
+    self_times = defaultdict(float)
+
+    def walk(func, path, names, fraction):
+        total_time = entries[func][2] * fraction
+        if total_time > 0:
+            self_times[';'.join(names)] += total_time
+        if len(path) >= max_depth:
+            return
+        for child, edge in callees.get(func, {}).items():
+            if child in path or child not in entries:
+                continue
+            child_total = entries[child][3]
+            child_fraction = fraction * edge[3] / child_total if child_total else 0
+            if child_fraction * child_total < min_seconds:
+                continue
+            walk(child, path | {child}, names + [_frame_name(child)], child_fraction)
+
+    for root in roots:
+        walk(root, {root}, [_frame_name(root)], 1.0)
+
+    return [f"{stack} {int(seconds * 1e6)}"
+            for stack, seconds in sorted(self_times.items()) if seconds * 1e6 >= 1]
+
+
+class SearchProfiler:
+    """
+    Collects profiles of the searches of one ChessBot
+    :param mode: 'cprofile' or 'timers'
+    :param output: file prefix for per-search reports (None keeps only the session profile)
+    """
+    def __init__(self, mode='timers', output=None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.output = output
+        self.searches = 0
+        self.session = self._new_profile()
+        self.current = None
+        self.session_stats = None
+        self.search_start = None
+        self.board_methods = {}
+
+    def _new_profile(self):
+        return cProfile.Profile() if self.mode == 'cprofile' else HotPathTimers()
+
+    def start_search(self, bot, board):
+        """Start profiling a search of board by bot"""
+        self.searches += 1
+        profiles = [self.session]
+        if self.output:
+            profiles.append(self._new_profile())
+        self.current = profiles
+
+        if self.mode == 'cprofile':
+            # Only one cProfile can be active at a time, so per-search reports
+            # come from a dedicated profile and are merged into the session
+            profile = profiles[-1]
+            profile.enable()
+        else:
+            self._install(bot, board, profiles[-1])
+            self.search_start = profiles[-1].enter('search')
+
+    def end_search(self, bot, board):
+        """Stop profiling the current search and write its report if requested"""
+        profiles = self.current
+        self.current = None
+        if self.mode == 'cprofile':
+            profiles[-1].disable()
+            if len(profiles) > 1:
+                self.dump(f"{self.output}-{self.searches}", profiles[-1])
+                self._merge_cprofile(profiles[-1])
+        else:
+            timers = profiles[-1]
+            timers.exit(self.search_start)
+            self._uninstall(bot, board)
+            if len(profiles) > 1:
+                self.dump(f"{self.output}-{self.searches}", timers)
+                self._merge_timers(timers)
+
+    def _merge_cprofile(self, profile):
+        profile.create_stats()
+        if self.session_stats is None:
+            self.session_stats = pstats.Stats(profile)
+        else:
+            self.session_stats.add(profile)
+
+    def _merge_timers(self, timers):
+        for stack, seconds in timers.self_times.items():
+            self.session.self_times[stack] += seconds
+        for name, calls in timers.calls.items():
+            self.session.calls[name] += calls
+        for name, seconds in timers.inclusive.items():
+            self.session.inclusive[name] += seconds
+
+    def _install(self, bot, board, timers):
+        """Shadow the hot-path methods of bot and SearchBoard with timed versions"""
+        from Chess_position import SearchBoard
+
+        for method, name in BOT_HOT_PATHS.items():
+            setattr(bot, method, timers.wrap(name, getattr(type(bot), method).__get__(bot)))
+        table = bot.transposition_table
+        table.get = timers.wrap('tt_get', type(table).get.__get__(table))
+        table.put = timers.wrap('tt_put', type(table).put.__get__(table))
+
+        # SearchBoard has __slots__, so its methods can only be replaced on the
+        # class; boards searched by other bots meanwhile are timed as well
+        for method, name in BOARD_HOT_PATHS.items():
+            original = self.board_methods[method] = SearchBoard.__dict__[method]
+            setattr(SearchBoard, method, timers.wrap(name, original))
+
+    def _uninstall(self, bot, board):
+        from Chess_position import SearchBoard
+
+        for method in BOT_HOT_PATHS:
+            bot.__dict__.pop(method, None)
+        bot.transposition_table.__dict__.pop('get', None)
+        bot.transposition_table.__dict__.pop('put', None)
+        for method, original in self.board_methods.items():
+            setattr(SearchBoard, method, original)
+        self.board_methods = {}
+
+    def _pstats(self, profile):
+        if profile is self.session and self.session_stats is not None:
+            return self.session_stats
+        return pstats.Stats(profile)
+
+    def report(self, profile=None):
+        """Text report of a profile (default: the whole session)"""
+        profile = profile or self.session
+        if self.mode == 'cprofile':
+            stream = io.StringIO()
+            stats = self._pstats(profile)
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(30)
+            return stream.getvalue()
+        return '\n'.join(profile.table())
+
+    def dump(self, prefix, profile=None):
+        """
+        Write the reports for a profile (default: the whole session)
+        Creates <prefix>.collapsed and <prefix>.txt, plus <prefix>.pstats in cprofile mode.
+        """
+        profile = profile or self.session
+        if self.mode == 'cprofile':
+            stats = self._pstats(profile)
+            stats.dump_stats(prefix + '.pstats')
+            collapsed = pstats_to_collapsed(stats)
+        else:
+            collapsed = profile.collapsed()
+
+        with open(prefix + '.collapsed', 'w') as f:
+            f.write('\n'.join(collapsed) + '\n')
+        with open(prefix + '.txt', 'w') as f:
+            f.write(self.report(profile) + '\n')
+
+
+def main(argv=None):
+    import chess
+    from Chess_Bot import ChessBot
+
+    parser = argparse.ArgumentParser(description="Profile a ChessBot search")
+    parser.add_argument('--fen', default=chess.STARTING_FEN, help="Position to search")
+    parser.add_argument('--depth', type=int, default=3, help="Search depth (default: 3)")
+    parser.add_argument('--mode', choices=PROFILE_MODES, default='timers')
+    parser.add_argument('--out', default='profile', help="Report file prefix (default: profile)")
+    args = parser.parse_args(argv)
+
+    bot = ChessBot(difficulty='hard', profile=args.mode)
+    bot.set_fixed_depth(args.depth)
+    bot.search(chess.Board(args.fen))
+
+    bot.profiler.dump(args.out)
+    print(bot.profiler.report())
+
+
+if __name__ == "__main__":
+    main()
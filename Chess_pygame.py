@@ -2,7 +2,8 @@ import pygame as pg
 import chess
 import sys
 import os
-from Chess_Bot import ChessBot
+from Chess_engine import BOT_INFO_EVENT, BOT_MOVE_EVENT, BOT_PROGRESS_EVENT, EngineHost
+from Chess_render import IMAGE_DIR, get_font
 
 # Constants
 WIDTH = HEIGHT = 512
@@ -10,27 +11,78 @@ DIMENSION = 8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+STATUS_AREA = pg.Rect(0, HEIGHT, WIDTH, 100)
+NEW_GAME_BUTTON = pg.Rect(10, HEIGHT + 40, 100, 30)
+
+# Board background, rendered once by get_board_surface
+BOARD_SURFACE = None
 
 # Game states
 MENU_STATE = 0
 GAME_STATE = 1
 PROMOTION_STATE = 2
 
-def load_images():
-    """Load the chess piece images"""
-    pieces = ['wp', 'wR', 'wN', 'wB', 'wK', 'wQ', 'bp', 'bR', 'bN', 'bB', 'bK', 'bQ']
-    for piece in pieces:
-        # Use the path to the images folder
-        image_path = os.path.join("images", piece + ".png")
-        IMAGES[piece] = pg.transform.scale(pg.image.load(image_path), (SQ_SIZE, SQ_SIZE))
+def get_image(piece):
+    """Return the image of a piece, loading it on first use"""
+    image = IMAGES.get(piece)
+    if image is None:
+        image_path = os.path.join(IMAGE_DIR, piece + ".png")
+        image = IMAGES[piece] = pg.transform.scale(pg.image.load(image_path), (SQ_SIZE, SQ_SIZE))
+    return image
+
+def get_board_surface():
+    """Return the board background, rendering it on first use"""
+    global BOARD_SURFACE
+    if BOARD_SURFACE is None:
+        BOARD_SURFACE = pg.Surface((WIDTH, HEIGHT))
+        colors = [pg.Color("white"), pg.Color("pink")]
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                color = colors[(r + c) % 2]
+                pg.draw.rect(BOARD_SURFACE, color, pg.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+    return BOARD_SURFACE
 
 def draw_board(screen):
     """Draw the chess board"""
-    colors = [pg.Color("white"), pg.Color("pink")]
-    for r in range(DIMENSION):
-        for c in range(DIMENSION):
-            color = colors[(r + c) % 2]
-            pg.draw.rect(screen, color, pg.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+    screen.blit(get_board_surface(), (0, 0))
+
+def draw_square(screen, board, row, col, selected_square):
+    """Redraw a single square: background, selection highlight and piece"""
+    rect = pg.Rect(col*SQ_SIZE, row*SQ_SIZE, SQ_SIZE, SQ_SIZE)
+    screen.blit(get_board_surface(), rect, rect)
+    if selected_square == (row, col):
+        s = pg.Surface((SQ_SIZE, SQ_SIZE))
+        s.set_alpha(100)
+        s.fill(pg.Color('blue'))
+        screen.blit(s, rect)
+    piece = board[row][col]
+    if piece != "--":
+        screen.blit(get_image(piece), rect)
+    return rect
+
+def changed_squares(board, drawn_board, selected_square, drawn_selection):
+    """Squares whose piece or selection state differs from what is on screen"""
+    if drawn_board is None:
+        return [(r, c) for r in range(DIMENSION) for c in range(DIMENSION)]
+    changed = [(r, c) for r in range(DIMENSION) for c in range(DIMENSION)
+               if board[r][c] != drawn_board[r][c]]
+    if selected_square != drawn_selection:
+        for square in (selected_square, drawn_selection):
+            if square and square not in changed:
+                changed.append(square)
+    return changed
+
+def draw_status_panel(screen, font, status_message):
+    """Draw the status message and new game button below the board"""
+    screen.fill(pg.Color("white"), STATUS_AREA)
+    status_text = font.render(status_message, True, pg.Color("black"))
+    screen.blit(status_text, (10, HEIGHT + 10))
+    
+    pg.draw.rect(screen, pg.Color("light gray"), NEW_GAME_BUTTON)
+    pg.draw.rect(screen, pg.Color("black"), NEW_GAME_BUTTON, 2)
+    new_game_text = font.render('New Game', True, pg.Color("black"))
+    screen.blit(new_game_text, (NEW_GAME_BUTTON.x + 10, NEW_GAME_BUTTON.y + 5))
+    return STATUS_AREA
 
 def draw_pieces(screen, board):
     """Draw the pieces on the board"""
@@ -38,7 +90,7 @@ def draw_pieces(screen, board):
         for c in range(DIMENSION):
             piece = board[r][c]
             if piece != "--":
-                screen.blit(IMAGES[piece], pg.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+                screen.blit(get_image(piece), pg.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
 
 def convert_chess_piece_to_pygame(piece):
     """Convert a chess.py piece to the corresponding image key"""
@@ -83,13 +135,13 @@ def draw_start_menu(screen, font, selected_difficulty):
     screen.fill(pg.Color("white"))
     
     # Title
-    title_font = pg.font.SysFont('Arial', 48, bold=True)
+    title_font = get_font('Arial', 48, bold=True)
     title_text = title_font.render('Chess Bot', True, pg.Color("black"))
     title_rect = title_text.get_rect(center=(WIDTH//2, 100))
     screen.blit(title_text, title_rect)
     
     # Subtitle
-    subtitle_font = pg.font.SysFont('Arial', 24)
+    subtitle_font = get_font('Arial', 24)
     subtitle_text = subtitle_font.render('Choose your difficulty level', True, pg.Color("gray"))
     subtitle_rect = subtitle_text.get_rect(center=(WIDTH//2, 150))
     screen.blit(subtitle_text, subtitle_rect)
@@ -179,21 +231,19 @@ def draw_promotion_dialog(screen, font, player_color):
         pg.draw.rect(screen, pg.Color("lightgray"), button_rect)
         pg.draw.rect(screen, pg.Color("black"), button_rect, 2)
         
-        # Draw piece image if available
-        piece_key = color_prefix + piece
-        if piece_key in IMAGES:
-            piece_image = pg.transform.scale(IMAGES[piece_key], (piece_size - 10, piece_size - 10))
-            screen.blit(piece_image, (x + 5, piece_y + 5))
+        # Draw piece image
+        piece_image = pg.transform.scale(get_image(color_prefix + piece), (piece_size - 10, piece_size - 10))
+        screen.blit(piece_image, (x + 5, piece_y + 5))
         
         # Draw piece name below
-        name_text = pg.font.SysFont('Arial', 12).render(name, True, pg.Color("black"))
+        name_text = get_font('Arial', 12).render(name, True, pg.Color("black"))
         name_rect = name_text.get_rect(center=(x + piece_size//2, piece_y + piece_size + 15))
         screen.blit(name_text, name_rect)
     
     return buttons
 
-def main():
-    """Main function to run the game"""
+def main(record_path=None):
+    """Main function to run the game; record_path appends every game to a Chess_record file"""
     pg.init()
     screen = pg.display.set_mode((WIDTH, HEIGHT + 100))  # Extra space for status
     clock = pg.time.Clock()
@@ -203,12 +253,12 @@ def main():
     selected_difficulty = 'medium'  # Default difficulty
     
     # Font for text
-    font = pg.font.SysFont('Arial', 20)
+    font = get_font('Arial', 20)
     
     # Game variables (initialized when game starts)
     chess_board = None
     pygame_board = None
-    bot = None
+    engine = None
     selected_square = None
     player_color = chess.WHITE  # Player plays as white (bottom)
     game_over = False
@@ -218,8 +268,20 @@ def main():
     promotion_move = None
     promotion_buttons = []
     
-    # Load images
-    load_images()
+    # Game record, written when the next game starts or the window closes
+    record_writer = None
+    recorder = None
+    if record_path:
+        from Chess_record import GameWriter, GameRecorder
+        record_writer = GameWriter(record_path)
+    
+    # What is currently on screen, so a frame only redraws what changed
+    full_redraw = True
+    drawn_state = None
+    drawn_difficulty = None
+    drawn_board = None
+    drawn_selection = None
+    drawn_status = None
     
     # Main game loop
     running = True
@@ -227,6 +289,29 @@ def main():
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 running = False
+            elif event.type == BOT_MOVE_EVENT:
+                if engine.is_current(event):
+                    engine.finish()
+                    
+                    # Make bot's move
+                    chess_board.push(event.move)
+                    pygame_board = convert_board_to_pygame_format(chess_board)
+                    if recorder:
+                        recorder.sync(chess_board, event.stats)
+                    
+                    # Check if the game is over after bot's move
+                    if chess_board.is_checkmate():
+                        status_message = "Checkmate! Bot wins!"
+                        game_over = True
+                    elif chess_board.is_stalemate() or chess_board.is_insufficient_material():
+                        status_message = "Draw!"
+                        game_over = True
+                    else:
+                        status_message = "Your turn"
+            elif event.type in (BOT_INFO_EVENT, BOT_PROGRESS_EVENT):
+                # Search progress readout
+                if engine and engine.thinking:
+                    status_message = f"Bot is thinking... {engine.progress_text()}"
             elif event.type == pg.MOUSEBUTTONDOWN:
                 location = pg.mouse.get_pos()
                 
@@ -242,9 +327,18 @@ def main():
                         selected_difficulty = 'hard'
                     elif start_button.collidepoint(location):
                         # Start the game
+                        if recorder:
+                            recorder.finish(chess_board)
+                        if record_writer:
+                            recorder = GameRecorder(record_writer, metadata={
+                                'Event': 'ChessBot game', 'White': 'human',
+                                'Black': f"ChessBot ({selected_difficulty})"})
                         chess_board = chess.Board()
                         pygame_board = convert_board_to_pygame_format(chess_board)
-                        bot = ChessBot(difficulty=selected_difficulty)
+                        # Engine host process running the bot; a new game gets a fresh one
+                        if engine:
+                            engine.close()
+                        engine = EngineHost(selected_difficulty)
                         selected_square = None
                         game_over = False
                         status_message = "Your turn (White)"
@@ -275,33 +369,10 @@ def main():
                                 status_message = "Draw!"
                                 game_over = True
                             else:
-                                # Bot's turn
+                                # Bot's turn: the search runs in the background and
+                                # its move arrives as a BOT_MOVE_EVENT
                                 status_message = f"Bot is thinking... ({selected_difficulty} difficulty)"
-                                
-                                # Update display before bot moves
-                                screen.fill(pg.Color("white"))
-                                draw_board(screen)
-                                draw_pieces(screen, pygame_board)
-                                status_text = font.render(status_message, True, pg.Color("black"))
-                                screen.blit(status_text, (10, HEIGHT + 10))
-                                pg.display.flip()
-                                
-                                # Get bot's move
-                                bot_move = bot.get_best_move(chess_board)
-                                
-                                # Make bot's move
-                                chess_board.push(bot_move)
-                                pygame_board = convert_board_to_pygame_format(chess_board)
-                                
-                                # Check if the game is over after bot's move
-                                if chess_board.is_checkmate():
-                                    status_message = "Checkmate! Bot wins!"
-                                    game_over = True
-                                elif chess_board.is_stalemate() or chess_board.is_insufficient_material():
-                                    status_message = "Draw!"
-                                    game_over = True
-                                else:
-                                    status_message = "Your turn"
+                                engine.start_search(chess_board)
                             break
                 
                 elif game_state == GAME_STATE:
@@ -362,33 +433,10 @@ def main():
                                             status_message = "Draw!"
                                             game_over = True
                                         else:
-                                            # Bot's turn
+                                            # Bot's turn: the search runs in the background and
+                                            # its move arrives as a BOT_MOVE_EVENT
                                             status_message = f"Bot is thinking... ({selected_difficulty} difficulty)"
-                                            
-                                            # Update display before bot moves
-                                            screen.fill(pg.Color("white"))
-                                            draw_board(screen)
-                                            draw_pieces(screen, pygame_board)
-                                            status_text = font.render(status_message, True, pg.Color("black"))
-                                            screen.blit(status_text, (10, HEIGHT + 10))
-                                            pg.display.flip()
-                                            
-                                            # Get bot's move
-                                            bot_move = bot.get_best_move(chess_board)
-                                            
-                                            # Make bot's move
-                                            chess_board.push(bot_move)
-                                            pygame_board = convert_board_to_pygame_format(chess_board)
-                                            
-                                            # Check if the game is over after bot's move
-                                            if chess_board.is_checkmate():
-                                                status_message = "Checkmate! Bot wins!"
-                                                game_over = True
-                                            elif chess_board.is_stalemate() or chess_board.is_insufficient_material():
-                                                status_message = "Draw!"
-                                                game_over = True
-                                            else:
-                                                status_message = "Your turn"
+                                            engine.start_search(chess_board)
                                     else:
                                         # Illegal move, try to select new square
                                         square = chess.square(chess_col, chess_row)
@@ -404,53 +452,66 @@ def main():
                                 if piece is not None and piece.color == player_color:
                                     selected_square = (row, col)
         
-        # Drawing
+        # Handle new game button click
+        if game_state == GAME_STATE and pg.mouse.get_pressed()[0]:
+            if NEW_GAME_BUTTON.collidepoint(pg.mouse.get_pos()):
+                # Abandon the bot's search for the old game
+                engine.stop()
+                game_state = MENU_STATE
+        
+        # Drawing: switching screens repaints everything, otherwise only
+        # the squares and status text that changed are redrawn
+        if game_state != drawn_state:
+            full_redraw = True
+            drawn_state = game_state
+        dirty_rects = []
+        
         if game_state == MENU_STATE:
-            draw_start_menu(screen, font, selected_difficulty)
+            if full_redraw or selected_difficulty != drawn_difficulty:
+                draw_start_menu(screen, font, selected_difficulty)
+                drawn_difficulty = selected_difficulty
+                full_redraw = True
         
         elif game_state == GAME_STATE:
-            screen.fill(pg.Color("white"))
-            draw_board(screen)
+            if full_redraw:
+                screen.fill(pg.Color("white"))
+                draw_board(screen)
+                drawn_board = None
+                drawn_status = None
             
-            # Highlight selected square
-            if selected_square:
-                s = pg.Surface((SQ_SIZE, SQ_SIZE))
-                s.set_alpha(100)
-                s.fill(pg.Color('blue'))
-                screen.blit(s, (selected_square[1] * SQ_SIZE, selected_square[0] * SQ_SIZE))
+            for row, col in changed_squares(pygame_board, drawn_board, selected_square, drawn_selection):
+                dirty_rects.append(draw_square(screen, pygame_board, row, col, selected_square))
+            drawn_board = [row[:] for row in pygame_board]
+            drawn_selection = selected_square
             
-            draw_pieces(screen, pygame_board)
-            
-            # Draw status message
-            status_text = font.render(status_message, True, pg.Color("black"))
-            screen.blit(status_text, (10, HEIGHT + 10))
-            
-            # Draw new game button
-            new_game_button = pg.Rect(10, HEIGHT + 40, 100, 30)
-            pg.draw.rect(screen, pg.Color("light gray"), new_game_button)
-            pg.draw.rect(screen, pg.Color("black"), new_game_button, 2)
-            new_game_text = font.render('New Game', True, pg.Color("black"))
-            screen.blit(new_game_text, (new_game_button.x + 10, new_game_button.y + 5))
-            
-            # Handle new game button click
-            if pg.mouse.get_pressed()[0]:
-                mouse_pos = pg.mouse.get_pos()
-                if new_game_button.collidepoint(mouse_pos):
-                    game_state = MENU_STATE
+            if status_message != drawn_status:
+                dirty_rects.append(draw_status_panel(screen, font, status_message))
+                drawn_status = status_message
         
         elif game_state == PROMOTION_STATE:
-            # Draw the game board first
-            screen.fill(pg.Color("white"))
-            draw_board(screen)
-            draw_pieces(screen, pygame_board)
-            
-            # Draw promotion dialog
-            promotion_buttons = draw_promotion_dialog(screen, font, player_color)
+            if full_redraw:
+                # Draw the game board first
+                screen.fill(pg.Color("white"))
+                draw_board(screen)
+                draw_pieces(screen, pygame_board)
+                
+                # Draw promotion dialog
+                promotion_buttons = draw_promotion_dialog(screen, font, player_color)
         
         # Update display
-        pg.display.flip()
+        if full_redraw:
+            pg.display.flip()
+            full_redraw = False
+        elif dirty_rects:
+            pg.display.update(dirty_rects)
         clock.tick(MAX_FPS)
     
+    if engine:
+        engine.close()
+    if recorder:
+        recorder.finish(chess_board)
+    if record_writer:
+        record_writer.close()
     pg.quit()
     sys.exit()
 
@@ -0,0 +1,423 @@
+"""
+Compact binary game records for training data and analysis
+A record file starts with FILE_MAGIC, holds one record per game appended as
+games finish, and ends with an index of the record offsets:
+
+    record   RECORD_HEADER: b'GAME', record size, move count, result, start
+             FEN length, metadata length; then the start FEN (empty for the
+             standard position), the metadata (a JSON object) and one
+             MOVE_ENTRY per move: move, score, depth, time
+    index    one uint64 offset per record, then INDEX_TRAILER: b'CIDX',
+             game count, index offset
+
+Moves take 16 bits: from square, to square << 6 and promotion << 12 (0 for
+none, else the piece type). Scores are centipawns from white's point of view
+(MISSING_SCORE if unknown; a mate in n plies is stored as +-(MATE_RECORD - n)),
+depths are plies and times milliseconds.
+
+A writer opening an existing file drops its index, appends after the last
+complete record and writes a new index when it is closed. A file whose writer
+never closed has no index; readers then find the records by scanning them.
+The writer only needs the standard library; GameReader memory-maps the file
+and returns the per-move entries as NumPy arrays without copying them.
+
+Usage:
+    writer = GameWriter('games.cbr')
+    recorder = GameRecorder(writer, metadata={'White': 'ChessBot', 'Black': 'human'})
+    recorder.sync(board, stats)             # after each move; stats of a bot move
+    recorder.finish(board)                  # writes the game
+    python Chess_record.py games.cbr                    # summary
+    python Chess_record.py games.cbr --pgn games.pgn    # export
+    python Chess_record.py games.cbr --import games.pgn # append PGN games
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import chess
+
+from Chess_Bot import MATE_SCORE, MATE_THRESHOLD
+from Chess_position import SearchBoard, MOVES
+
+FILE_MAGIC = b'CBR1'
+RECORD_MAGIC = b'GAME'
+INDEX_MAGIC = b'CIDX'
+
+# magic, record size, move count, result, start FEN length, metadata length
+RECORD_HEADER = struct.Struct('<4sIHBBI')
+# move, score, depth, time (ms)
+MOVE_ENTRY = struct.Struct('<HhBI')
+# magic, game count, index offset
+INDEX_TRAILER = struct.Struct('<4sQQ')
+OFFSET = struct.Struct('<Q')
+
+RESULTS = ('*', '1-0', '0-1', '1/2-1/2')
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+MISSING_SCORE = -32768
+MATE_RECORD = 32000
+# Scores beyond this are mates
+MATE_RECORD_THRESHOLD = MATE_RECORD - (MATE_SCORE - MATE_THRESHOLD)
+MAX_TIME_MS = 2 ** 32 - 1
+
+# NumPy dtype of MOVE_ENTRY, created on first use so writers do not need NumPy
+_entry_dtype = None
+
+
+def encode_move(move):
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    from_square = code & 63
+    to_square = code >> 6 & 63
+    promotion = code >> 12
+    if promotion:
+        return chess.Move(from_square, to_square, promotion)
+    return MOVES[from_square][to_square]
+
+
+def encode_score(score):
+    """int16 of a search score; None becomes MISSING_SCORE"""
+    if score is None:
+        return MISSING_SCORE
+    if abs(score) > MATE_THRESHOLD:
+        plies = min(MATE_SCORE - abs(score), MATE_SCORE - MATE_THRESHOLD)
+        return int(MATE_RECORD - plies) if score > 0 else -int(MATE_RECORD - plies)
+    return int(round(max(-MATE_RECORD_THRESHOLD, min(MATE_RECORD_THRESHOLD, score))))
+
+
+def decode_score(value):
+    """Search score (mates as MATE_SCORE - plies) of a stored score, None if missing"""
+    if value == MISSING_SCORE:
+        return None
+    if abs(value) > MATE_RECORD_THRESHOLD:
+        plies = MATE_RECORD - abs(value)
+        return MATE_SCORE - plies if value > 0 else -(MATE_SCORE - plies)
+    return value
+
+
+def entry_dtype():
+    """NumPy structured dtype of a MOVE_ENTRY (move, score, depth, time)"""
+    global _entry_dtype
+    if _entry_dtype is None:
+        import numpy as np
+        _entry_dtype = np.dtype([('move', '<u2'), ('score', '<i2'), ('depth', 'u1'),
+                                 ('time', '<u4')])
+    return _entry_dtype
+
+
+def read_offsets(data):
+    """
+    (record offsets, end of the last record) of a record file's contents
+    Uses the index when the file has a valid one, otherwise scans the records
+    and ignores a trailing partial one.
+    """
+    size = len(data)
+    if size < len(FILE_MAGIC) or data[:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError("Not a game record file")
+    if size >= len(FILE_MAGIC) + INDEX_TRAILER.size:
+        magic, count, index_offset = INDEX_TRAILER.unpack_from(data, size - INDEX_TRAILER.size)
+        if magic == INDEX_MAGIC and index_offset + count * OFFSET.size + INDEX_TRAILER.size == size:
+            offsets = list(struct.unpack_from(f'<{count}Q', data, index_offset))
+            return offsets, index_offset
+
+    offsets = []
+    offset = len(FILE_MAGIC)
+    while offset + RECORD_HEADER.size <= size:
+        magic, record_size = RECORD_HEADER.unpack_from(data, offset)[:2]
+        if magic != RECORD_MAGIC or offset + record_size > size:
+            break
+        offsets.append(offset)
+        offset += record_size
+    return offsets, offset
+
+
+class GameWriter:
+    """
+    Appends game records to a file, flushing each one
+    Call close() (or use it as a context manager) to write the index.
+    """
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            self.file = open(path, 'r+b')
+            with mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.offsets, end = read_offsets(data)
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(path, 'w+b')
+            self.file.write(FILE_MAGIC)
+            self.offsets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_game(self, moves, result='*', fen=None, metadata=None, scores=None, depths=None,
+                   times=None):
+        """
+        Append one game and return its index
+        :param moves: chess.Moves from the start position (fen, default: standard)
+        :param scores: per-move search scores from white's view (None where unknown)
+        :param depths: per-move search depths
+        :param times: per-move think times in seconds
+        """
+        count = len(moves)
+        scores = scores or [None] * count
+        depths = depths or [0] * count
+        times = times or [0.0] * count
+        fen_bytes = b'' if fen in (None, chess.STARTING_FEN) else fen.encode('ascii')
+        metadata_bytes = json.dumps(metadata or {}).encode('utf-8')
+        entries = b''.join(
+            MOVE_ENTRY.pack(encode_move(move), encode_score(score), min(depth or 0, 255),
+                            min(int(round((seconds or 0) * 1000)), MAX_TIME_MS))
+            for move, score, depth, seconds in zip(moves, scores, depths, times))
+        record_size = RECORD_HEADER.size + len(fen_bytes) + len(metadata_bytes) + len(entries)
+        header = RECORD_HEADER.pack(RECORD_MAGIC, record_size, count, RESULT_CODES.get(result, 0),
+                                    len(fen_bytes), len(metadata_bytes))
+
+        self.offsets.append(self.file.tell())
+        self.file.write(header + fen_bytes + metadata_bytes + entries)
+        self.file.flush()
+        return len(self.offsets) - 1
+
+    def close(self):
+        """Write the index after the last record and close the file"""
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(struct.pack(f'<{len(self.offsets)}Q', *self.offsets))
+        self.file.write(INDEX_TRAILER.pack(INDEX_MAGIC, len(self.offsets), index_offset))
+        self.file.close()
+
+
+class GameRecorder:
+    """
+    One game being recorded: moves are added as they are played, finish()
+    writes the record. Search info may be a SearchStats or its as_dict().
+    """
+    def __init__(self, writer, fen=None, metadata=None):
+        self.writer = writer
+        self.fen = fen
+        self.metadata = dict(metadata or {})
+        self.turn = chess.Board(fen).turn if fen else chess.WHITE
+        self.moves = []
+        self.scores = []
+        self.depths = []
+        self.times = []
+        self.finished = False
+
+    def add(self, move, info=None, seconds=None):
+        """Record the next move, with the search info of the side that played it"""
+        white_to_move = (len(self.moves) % 2 == 0) == (self.turn == chess.WHITE)
+        score = depth = None
+        if info is not None:
+            if isinstance(info, dict):
+                score, depth, elapsed = info.get('score'), info.get('depth'), info.get('elapsed')
+            else:
+                score, depth, elapsed = info.score, info.depth, info.elapsed
+            if seconds is None:
+                seconds = elapsed
+            if score is not None and not white_to_move:
+                score = -score
+        self.moves.append(move)
+        self.scores.append(score)
+        self.depths.append(depth or 0)
+        self.times.append(seconds or 0.0)
+
+    def sync(self, board, info=None):
+        """
+        Bring the record up to board.move_stack (moves taken back are dropped);
+        info belongs to the last new move
+        """
+        stack = board.move_stack
+        common = min(len(stack), len(self.moves))
+        while common and stack[common - 1] != self.moves[common - 1]:
+            common -= 1
+        for values in (self.moves, self.scores, self.depths, self.times):
+            del values[common:]
+        for index in range(common, len(stack)):
+            self.add(stack[index], info if index == len(stack) - 1 else None)
+
+    def finish(self, board=None, result=None):
+        """Write the game once; result defaults to the board's result (or '*')"""
+        if self.finished:
+            return None
+        self.finished = True
+        if board is not None:
+            self.sync(board)
+            if result is None:
+                result = board.result(claim_draw=True)
+        return self.writer.write_game(self.moves, result or '*', self.fen, self.metadata,
+                                      self.scores, self.depths, self.times)
+
+
+class GameRecord:
+    """A game of a GameReader; the metadata and moves are decoded on access"""
+    def __init__(self, data, offset):
+        (_magic, self.size, self.move_count, result, fen_length,
+         metadata_length) = RECORD_HEADER.unpack_from(data, offset)
+        self.data = data
+        self.result = RESULTS[result] if result < len(RESULTS) else '*'
+        start = offset + RECORD_HEADER.size
+        self.fen = bytes(data[start:start + fen_length]).decode('ascii') or chess.STARTING_FEN
+        self.metadata_span = (start + fen_length, start + fen_length + metadata_length)
+        self.entries_offset = start + fen_length + metadata_length
+
+    @property
+    def metadata(self):
+        start, end = self.metadata_span
+        return json.loads(bytes(self.data[start:end]).decode('utf-8'))
+
+    @property
+    def entries(self):
+        """Structured NumPy array (move, score, depth, time) viewing the file"""
+        import numpy as np
+        if not self.move_count:
+            return np.zeros(0, dtype=entry_dtype())
+        return np.frombuffer(self.data, dtype=entry_dtype(), count=self.move_count,
+                             offset=self.entries_offset)
+
+    @property
+    def moves(self):
+        start = self.entries_offset
+        end = start + self.move_count * MOVE_ENTRY.size
+        return [decode_move(entry[0]) for entry in MOVE_ENTRY.iter_unpack(self.data[start:end])]
+
+    def board(self):
+        """chess.Board of the final position, with the moves on its stack"""
+        board = chess.Board(self.fen)
+        for move in self.moves:
+            board.push(move)
+        return board
+
+
+class GameReader:
+    """
+    Memory-mapped read access to a record file: len(reader), reader[index],
+    iteration over the games and over every position
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets, _end = read_offsets(self.data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return GameRecord(self.data, self.offsets[index])
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield GameRecord(self.data, offset)
+
+    def positions(self):
+        """
+        Yield (game, ply, board, move, score, depth, time_ms) for every move of
+        every game, with board the position before the move. The board is a
+        SearchBoard that is reused, so copy it (board.fen()) to keep it.
+        """
+        for game in self:
+            board = SearchBoard(game.fen)
+            entries = game.entries.tolist()
+            for ply, (code, score, depth, time_ms) in enumerate(entries):
+                move = decode_move(code)
+                yield game, ply, board, move, decode_score(score), depth, time_ms
+                board.push(move)
+
+    def all_entries(self):
+        """One structured array with the move entries of every game, in file order"""
+        import numpy as np
+        if not self.offsets:
+            return np.zeros(0, dtype=entry_dtype())
+        return np.concatenate([game.entries for game in self])
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def import_pgn(pgn_path, writer):
+    """Append every game of a PGN file, with its headers as metadata; return the count"""
+    import chess.pgn
+
+    count = 0
+    with open(pgn_path, encoding='utf-8', errors='replace') as stream:
+        while True:
+            game = chess.pgn.read_game(stream)
+            if game is None:
+                break
+            board = game.board()
+            fen = board.fen() if board.fen() != chess.STARTING_FEN else None
+            writer.write_game(list(game.mainline_moves()), game.headers.get('Result', '*'),
+                              fen, dict(game.headers))
+            count += 1
+    return count
+
+
+def export_pgn(reader, pgn_path):
+    """Write every game of a reader as PGN, with score/depth/time comments"""
+    import chess.pgn
+
+    with open(pgn_path, 'w', encoding='utf-8') as stream:
+        for game_record in reader:
+            game = chess.pgn.Game()
+            for key, value in game_record.metadata.items():
+                game.headers[key] = str(value)
+            game.headers['Result'] = game_record.result
+            if game_record.fen != chess.STARTING_FEN:
+                game.setup(game_record.fen)
+            node = game
+            for code, score, depth, time_ms in game_record.entries.tolist():
+                node = node.add_variation(decode_move(code))
+                if depth:
+                    score = decode_score(score)
+                    score_text = f"{score / 100:+.2f}" if score is not None else "?"
+                    node.comment = f"{score_text}/{depth} {time_ms / 1000:.2f}s"
+            print(game, file=stream, end='\n\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Binary game record files")
+    parser.add_argument('path', help="Game record file")
+    parser.add_argument('--import', dest='import_path', metavar='PGN',
+                        help="Append the games of a PGN file")
+    parser.add_argument('--pgn', help="Export all games as PGN")
+    args = parser.parse_args(argv)
+
+    if args.import_path:
+        with GameWriter(args.path) as writer:
+            count = import_pgn(args.import_path, writer)
+        print(f"Imported {count} games", file=sys.stderr)
+
+    start_time = time.perf_counter()
+    with GameReader(args.path) as reader:
+        if args.pgn:
+            export_pgn(reader, args.pgn)
+        results = {result: 0 for result in RESULTS}
+        for game in reader:
+            results[game.result] += 1
+        moves = len(reader.all_entries())
+        elapsed = time.perf_counter() - start_time
+        print(f"{len(reader)} games, {moves} moves "
+              f"({', '.join(f'{result}: {count}' for result, count in results.items())}), "
+              f"read in {elapsed:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
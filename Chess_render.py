@@ -0,0 +1,204 @@
+"""
+Sprite-cached board renderer for the pygame front ends
+The board background and the piece sprites are rasterized once per size;
+after that each update only redraws the squares whose piece or highlight
+changed, which keeps a typical update well under a millisecond.
+"""
+import os
+
+import chess
+import pygame as pg
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Images")
+
+LIGHT_SQUARE = (240, 217, 181)
+DARK_SQUARE = (181, 136, 99)
+
+# Highlight overlays as (color, alpha)
+HIGHLIGHTS = {
+    'lastmove': ((205, 210, 106), 150),
+    'selected': ((20, 85, 30), 110),
+    'check': ((220, 30, 30), 150),
+}
+
+# Sprites and backgrounds shared by every renderer, keyed by square size
+_sprite_cache = {}
+_background_cache = {}
+
+# Fonts by (name, size, bold)
+_font_cache = {}
+
+
+def piece_key(piece):
+    """Image name of a piece, e.g. 'wN' or 'bp'"""
+    color = 'w' if piece.color == chess.WHITE else 'b'
+    symbol = piece.symbol()
+    return color + ('p' if symbol in 'Pp' else symbol.upper())
+
+
+def get_font(name, size, bold=False):
+    """System font, looked up on first use only (SysFont scans every installed font)"""
+    key = (name, size, bold)
+    font = _font_cache.get(key)
+    if font is None:
+        if not pg.font.get_init():
+            pg.font.init()
+        font = _font_cache[key] = pg.font.SysFont(name, size, bold=bold)
+    return font
+
+
+def load_sprites(square_size):
+    """Piece sprites scaled to square_size, loaded once per size"""
+    sprites = _sprite_cache.get(square_size)
+    if sprites is None:
+        sprites = {}
+        for color in 'wb':
+            for symbol in 'pRNBQK':
+                image = pg.image.load(os.path.join(IMAGE_DIR, color + symbol + ".png"))
+                if pg.display.get_surface():
+                    image = image.convert_alpha()
+                sprites[color + symbol] = pg.transform.smoothscale(image, (square_size, square_size))
+        _sprite_cache[square_size] = sprites
+    return sprites
+
+
+def render_background(square_size):
+    """Checkerboard surface, rendered once per size (it looks the same from both sides)"""
+    background = _background_cache.get(square_size)
+    if background is None:
+        background = pg.Surface((square_size * 8, square_size * 8))
+        for row in range(8):
+            for col in range(8):
+                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
+                background.fill(color, pg.Rect(col * square_size, row * square_size,
+                                               square_size, square_size))
+        _background_cache[square_size] = background
+    return background
+
+
+class BoardRenderer:
+    """
+    Keeps a board surface in sync with a chess.Board
+    Only squares whose piece or highlight changed since the previous update
+    are redrawn.
+    """
+    def __init__(self, size, white_at_bottom=True):
+        self.square_size = size // 8
+        self.size = self.square_size * 8
+        self.white_at_bottom = white_at_bottom
+
+        self.sprites = load_sprites(self.square_size)
+        self.background = render_background(self.square_size)
+        self.overlays = {}
+        for name, (color, alpha) in HIGHLIGHTS.items():
+            overlay = pg.Surface((self.square_size, self.square_size))
+            overlay.fill(color)
+            overlay.set_alpha(alpha)
+            self.overlays[name] = overlay
+
+        self.surface = pg.Surface((self.size, self.size))
+        self.surface.blit(self.background, (0, 0))
+        # What is currently drawn on each square: (piece key, highlight)
+        self.drawn = [(None, None)] * 64
+
+    def square_rect(self, square):
+        """Rectangle of a square on the board surface"""
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        if self.white_at_bottom:
+            col, row = file, 7 - rank
+        else:
+            col, row = 7 - file, rank
+        return pg.Rect(col * self.square_size, row * self.square_size,
+                       self.square_size, self.square_size)
+
+    def set_orientation(self, white_at_bottom):
+        """Flip the board; every square is redrawn on the next update"""
+        if white_at_bottom != self.white_at_bottom:
+            self.white_at_bottom = white_at_bottom
+            self.drawn = [(None, None)] * 64
+            self.surface.blit(self.background, (0, 0))
+
+    def update(self, board, selected_square=None):
+        """
+        Bring the surface up to date with board
+        :return: list of rectangles (in surface coordinates) that were redrawn
+        """
+        highlights = {}
+        if board.move_stack:
+            last_move = board.peek()
+            highlights[last_move.from_square] = 'lastmove'
+            highlights[last_move.to_square] = 'lastmove'
+        if selected_square is not None:
+            highlights[selected_square] = 'selected'
+        if board.is_check():
+            highlights[board.king(board.turn)] = 'check'
+
+        dirty = []
+        for square in chess.SQUARES:
+            piece = board.piece_at(square)
+            state = (piece_key(piece) if piece else None, highlights.get(square))
+            if state == self.drawn[square]:
+                continue
+            self.drawn[square] = state
+
+            rect = self.square_rect(square)
+            self.surface.blit(self.background, rect, rect)
+            if state[1]:
+                self.surface.blit(self.overlays[state[1]], rect)
+            if state[0]:
+                self.surface.blit(self.sprites[state[0]], rect)
+            dirty.append(rect)
+        return dirty
+
+
+class RenderScheduler:
+    """
+    Event-driven redraw scheduling for a pygame main loop
+    The loop blocks in pg.event.wait while nothing needs repainting and only
+    draws after a redraw was requested or while an animation is running.
+    :param max_fps: optional frame cap while drawing continuously
+    :param idle_timeout: milliseconds to block waiting for events when idle
+    """
+    # Events that change what is on screen even if the game state did not
+    REPAINT_EVENTS = (pg.VIDEOEXPOSE, pg.VIDEORESIZE, pg.WINDOWEXPOSED,
+                      pg.WINDOWRESTORED, pg.WINDOWSIZECHANGED)
+
+    def __init__(self, max_fps=None, idle_timeout=250):
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.clock = pg.time.Clock()
+        self.needs_redraw = True
+        self.animations = 0
+
+    def request_redraw(self):
+        """Repaint on the next frame"""
+        self.needs_redraw = True
+
+    def start_animation(self):
+        """Keep drawing every frame until the matching stop_animation"""
+        self.animations += 1
+
+    def stop_animation(self):
+        self.animations = max(0, self.animations - 1)
+        self.needs_redraw = True
+
+    def wait_events(self):
+        """Return pending events, blocking while there is nothing to draw"""
+        if self.needs_redraw or self.animations:
+            events = pg.event.get()
+        else:
+            event = pg.event.wait(self.idle_timeout)
+            events = [event] + pg.event.get() if event.type != pg.NOEVENT else []
+        if any(event.type in self.REPAINT_EVENTS for event in events):
+            self.needs_redraw = True
+        return events
+
+    def should_draw(self):
+        return self.needs_redraw or self.animations > 0
+
+    def frame_done(self):
+        """Call after drawing a frame; applies the frame cap"""
+        self.needs_redraw = False
+        if self.max_fps:
+            self.clock.tick(self.max_fps)
@@ -0,0 +1,571 @@
+"""
+Local multi-game server
+Hosts many human-vs-bot games over HTTP and WebSocket on one asyncio event
+loop. Bot moves are computed by a fixed pool of engine worker processes, so
+throughput scales with the number of cores rather than the number of games.
+
+Jobs wait in one queue per difficulty; a free worker takes the job with the
+earliest deadline across the queues. A full queue rejects new jobs (HTTP 503)
+instead of letting latency grow without bound, a job whose deadline passes
+while it waits is dropped (HTTP 504), and a running search is stopped at its
+deadline (but not before depth 1 is complete) and answers with the best move
+found so far.
+
+HTTP API (JSON bodies):
+    POST   /games                 {"difficulty": "medium", "color": "white", "deadline": 5.0}
+    GET    /games/<id>
+    POST   /games/<id>/move       {"move": "e2e4"}   plays the move and returns the bot's reply
+    DELETE /games/<id>
+    GET    /stats                 queue lengths and job counters
+
+WebSocket: GET /games/<id>/ws, then send {"move": "e2e4"} messages; every
+update is answered with the game state.
+
+Usage:
+    python Chess_server.py --port 8765 --workers 4
+    python Chess_server.py --record games.cbr   # keep every game (see Chess_record)
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import struct
+import threading
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+import chess
+
+from Chess_Bot import ChessBotPool
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# Default seconds a bot move may take, from the moment the job is queued
+DEFAULT_DEADLINE = 10.0
+
+# Jobs waiting per difficulty before new ones are rejected
+DEFAULT_QUEUE_LIMIT = 64
+
+# Seconds kept back from a search's budget for the result to get back to the loop
+RESULT_MARGIN = 0.05
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+HTTP_STATUS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 409: 'Conflict', 500: 'Internal Server Error',
+               503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+# Bots of each worker process, reused across jobs
+_worker_pool = ChessBotPool()
+
+
+def search_job(difficulty, fen, moves, budget):
+    """Worker entry point: search a game position for at most budget seconds"""
+    board = chess.Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+
+    # The stop only takes effect once depth 1 has produced a move, so a job
+    # short of time still gets a searched move instead of a random one
+    stop_event = threading.Event()
+    budget_spent = threading.Event()
+    first_depth_done = threading.Event()
+
+    def expire():
+        budget_spent.set()
+        if first_depth_done.is_set():
+            stop_event.set()
+
+    def on_info(stats):
+        first_depth_done.set()
+        if budget_spent.is_set():
+            stop_event.set()
+
+    # Jobs come from different games; acquire() hands out a reset bot, whose
+    # transposition table holds no scores relative to another game's root side
+    timer = threading.Timer(max(budget, 0), expire)
+    timer.start()
+    try:
+        with _worker_pool.bot(difficulty) as bot:
+            stats = bot.search(board, on_info=on_info, stop_event=stop_event)
+    finally:
+        timer.cancel()
+    return stats.best_move.uci(), stats.as_dict()
+
+
+class EngineBusy(Exception):
+    """The queue for a difficulty is full"""
+
+
+class DeadlineExpired(Exception):
+    """A job's deadline passed before a worker picked it up"""
+
+
+class Job:
+    def __init__(self, difficulty, board, deadline, future):
+        self.difficulty = difficulty
+        self.fen = board.root().fen()
+        self.moves = [move.uci() for move in board.move_stack]
+        self.deadline = deadline
+        self.future = future
+
+
+class EnginePool:
+    """
+    Bounded pool of engine worker processes fed from per-difficulty queues
+    At most one job per worker is in flight; everything else waits in the
+    queues, where it can still expire or be rejected.
+    """
+    def __init__(self, workers=None, queue_limit=DEFAULT_QUEUE_LIMIT):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.queues = {difficulty: deque() for difficulty in DIFFICULTIES}
+        self.executor = None
+        self.wakeup = None
+        self.dispatchers = []
+        self.busy = 0
+        self.counters = {'completed': 0, 'rejected': 0, 'expired': 0, 'failed': 0}
+
+    async def start(self):
+        self.executor = self.create_executor()
+        self.wakeup = asyncio.Condition()
+        self.dispatchers = [asyncio.ensure_future(self.dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        for queue in self.queues.values():
+            while queue:
+                queue.popleft().future.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+    def create_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def replace_executor(self, broken):
+        """
+        Replace an executor whose worker process died; the dispatchers whose
+        jobs ran on it all report it, but only the first replaces it
+        """
+        if self.executor is broken:
+            self.executor = self.create_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, difficulty, board, deadline):
+        """
+        Queue a search of board and wait for (uci, info)
+        :param deadline: loop.time() by which the move is needed
+        :raises EngineBusy: the difficulty's queue is full
+        :raises DeadlineExpired: no worker was free before the deadline
+        """
+        queue = self.queues[difficulty]
+        if len(queue) >= self.queue_limit:
+            self.counters['rejected'] += 1
+            raise EngineBusy(difficulty)
+
+        job = Job(difficulty, board, deadline, asyncio.get_running_loop().create_future())
+        queue.append(job)
+        async with self.wakeup:
+            self.wakeup.notify()
+        return await job.future
+
+    def next_job(self):
+        """Pop the queued job with the earliest deadline, dropping expired ones"""
+        now = asyncio.get_running_loop().time()
+        best = None
+        for queue in self.queues.values():
+            while queue and (queue[0].deadline <= now or queue[0].future.done()):
+                job = queue.popleft()
+                if not job.future.done():
+                    self.counters['expired'] += 1
+                    job.future.set_exception(DeadlineExpired())
+            if queue and (best is None or queue[0].deadline < best[0].deadline):
+                best = queue
+        return best.popleft() if best else None
+
+    async def dispatch(self):
+        """One per worker: feed it jobs as long as there are any"""
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self.wakeup:
+                job = self.next_job()
+                while job is None:
+                    await self.wakeup.wait()
+                    job = self.next_job()
+
+            budget = job.deadline - loop.time() - RESULT_MARGIN
+            if budget <= 0:
+                # Too late to search: answer like a job that expired in the queue
+                self.counters['expired'] += 1
+                if not job.future.done():
+                    job.future.set_exception(DeadlineExpired())
+                continue
+            executor = self.executor
+            self.busy += 1
+            try:
+                result = await loop.run_in_executor(executor, search_job, job.difficulty,
+                                                    job.fen, job.moves, budget)
+            except BrokenProcessPool as error:
+                # A dead engine process breaks the whole executor: fail the
+                # job that was running and go on with a fresh one
+                self.counters['failed'] += 1
+                self.replace_executor(executor)
+                if not job.future.done():
+                    job.future.set_exception(error)
+            except Exception as error:
+                self.counters['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(error)
+            else:
+                self.counters['completed'] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.busy -= 1
+
+    def stats(self):
+        stats = {'workers': self.workers, 'busy': self.busy,
+                 'queued': {difficulty: len(queue) for difficulty, queue in self.queues.items()}}
+        stats.update(self.counters)
+        return stats
+
+
+class GameSession:
+    """One human-vs-bot game; a lock keeps its moves in order"""
+    def __init__(self, game_id, difficulty, human_color, deadline):
+        self.id = game_id
+        self.difficulty = difficulty
+        self.human_color = human_color
+        self.deadline = deadline
+        self.board = chess.Board()
+        self.lock = asyncio.Lock()
+        self.last_bot_move = None
+        self.last_info = None
+        self.recorder = None
+
+    def state(self):
+        board = self.board
+        return {
+            'id': self.id,
+            'difficulty': self.difficulty,
+            'human': 'white' if self.human_color == chess.WHITE else 'black',
+            'fen': board.fen(),
+            'moves': [move.uci() for move in board.move_stack],
+            'turn': 'white' if board.turn == chess.WHITE else 'black',
+            'bot_move': self.last_bot_move,
+            'bot_info': self.last_info,
+            'result': board.result() if board.is_game_over() else None,
+        }
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ChessServer:
+    """Game sessions plus the HTTP/WebSocket front end"""
+    def __init__(self, pool, default_deadline=DEFAULT_DEADLINE, record_writer=None):
+        self.pool = pool
+        self.default_deadline = default_deadline
+        self.record_writer = record_writer
+        self.games = {}
+        self.ids = itertools.count(1)
+
+    # ---- game logic ----
+
+    async def create_game(self, difficulty='medium', color='white', deadline=None):
+        if difficulty not in DIFFICULTIES:
+            raise HTTPError(400, f"Unknown difficulty: {difficulty}")
+        if color not in ('white', 'black'):
+            raise HTTPError(400, f"Unknown color: {color}")
+        try:
+            deadline = float(deadline or self.default_deadline)
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"Bad deadline: {deadline}")
+        if not deadline > 0:
+            raise HTTPError(400, f"Bad deadline: {deadline}")
+        game = GameSession(str(next(self.ids)), difficulty,
+                           chess.WHITE if color == 'white' else chess.BLACK, deadline)
+        self.games[game.id] = game
+        if self.record_writer:
+            from Chess_record import GameRecorder
+            bot_name = f"ChessBot ({difficulty})"
+            game.recorder = GameRecorder(self.record_writer, metadata={
+                'Event': 'ChessBot server', 'Game': game.id,
+                'White': 'human' if game.human_color == chess.WHITE else bot_name,
+                'Black': bot_name if game.human_color == chess.WHITE else 'human'})
+        if game.human_color == chess.BLACK:
+            async with game.lock:
+                try:
+                    await self.bot_move(game)
+                except BaseException:
+                    # A game waiting for a bot move that never comes is no use
+                    del self.games[game.id]
+                    raise
+        return game
+
+    def get_game(self, game_id):
+        game = self.games.get(game_id)
+        if game is None:
+            raise HTTPError(404, f"No game {game_id}")
+        return game
+
+    async def play_move(self, game, uci):
+        """Play the human's move and the bot's reply"""
+        async with game.lock:
+            board = game.board
+            if board.is_game_over():
+                raise HTTPError(409, "Game is over")
+            if board.turn != game.human_color:
+                raise HTTPError(409, "Not your turn")
+            try:
+                move = chess.Move.from_uci(uci)
+            except (ValueError, TypeError):
+                raise HTTPError(400, f"Bad move: {uci}")
+            if move not in board.legal_moves:
+                raise HTTPError(400, f"Illegal move: {uci}")
+            ply = len(board.move_stack)
+            board.push(move)
+            try:
+                if not board.is_game_over():
+                    await self.bot_move(game)
+                self.record(game)
+            except BaseException:
+                # Whatever went wrong (busy or failed engine, recording,
+                # cancellation), leave the position as it was before the
+                # human's move, so the client can retry
+                while len(board.move_stack) > ply:
+                    board.pop()
+                raise
+
+    async def bot_move(self, game):
+        deadline = asyncio.get_running_loop().time() + game.deadline
+        try:
+            uci, info = await self.pool.submit(game.difficulty, game.board, deadline)
+        except EngineBusy:
+            raise HTTPError(503, "Engine queue is full, try again later")
+        except DeadlineExpired:
+            raise HTTPError(504, "No engine was free before the deadline")
+        game.board.push_uci(uci)
+        game.last_bot_move = uci
+        game.last_info = info
+        self.record(game, info)
+
+    def record(self, game, info=None):
+        """Bring the game's record up to date and write it once the game is over"""
+        if game.recorder is None:
+            return
+        game.recorder.sync(game.board, info)
+        if game.board.is_game_over():
+            game.recorder.finish(game.board)
+
+    def finish_records(self, games=None):
+        """Write the records of unfinished games as they stand (result '*')"""
+        for game in games or list(self.games.values()):
+            if game.recorder:
+                game.recorder.finish(game.board)
+
+    # ---- HTTP ----
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, headers, body = request
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self.handle_websocket(reader, writer, path, headers)
+                return
+            try:
+                status, payload = await self.route(method, path, body)
+            except HTTPError as error:
+                status, payload = error.status, {'error': str(error)}
+            except Exception as error:
+                status, payload = 500, {'error': internal_error(error)}
+            write_response(writer, status, payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        if parts == ['stats'] and method == 'GET':
+            return 200, dict(self.pool.stats(), games=len(self.games))
+        if parts == ['games'] and method == 'POST':
+            game = await self.create_game(data.get('difficulty', 'medium'),
+                                          data.get('color', 'white'), data.get('deadline'))
+            return 201, game.state()
+        if len(parts) == 2 and parts[0] == 'games':
+            game = self.get_game(parts[1])
+            if method == 'GET':
+                return 200, game.state()
+            if method == 'DELETE':
+                del self.games[game.id]
+                self.finish_records([game])
+                return 200, {'deleted': game.id}
+            raise HTTPError(405, f"{method} not allowed")
+        if len(parts) == 3 and parts[0] == 'games' and parts[2] == 'move' and method == 'POST':
+            game = self.get_game(parts[1])
+            await self.play_move(game, data.get('move'))
+            return 200, game.state()
+        raise HTTPError(404, f"No route for {method} {path}")
+
+    # ---- WebSocket ----
+
+    async def handle_websocket(self, reader, writer, path, headers):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        game = self.games.get(parts[1]) if len(parts) == 3 and parts[2] == 'ws' else None
+        key = headers.get('sec-websocket-key')
+        if game is None or not key:
+            write_response(writer, 404 if key else 400, {'error': "Not a game WebSocket"})
+            await writer.drain()
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        write_frame(writer, 0x1, json.dumps(game.state()).encode())
+        await writer.drain()
+
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == 0x8:
+                write_frame(writer, 0x8, payload[:2])
+                await writer.drain()
+                return
+            if opcode == 0x9:
+                write_frame(writer, 0xA, payload)
+            elif opcode == 0x1:
+                try:
+                    message = json.loads(payload)
+                    await self.play_move(game, message.get('move'))
+                    reply = game.state()
+                except HTTPError as error:
+                    reply = {'error': str(error), 'status': error.status}
+                except (ValueError, AttributeError):
+                    reply = {'error': "Messages must be JSON objects", 'status': 400}
+                except Exception as error:
+                    reply = {'error': internal_error(error), 'status': 500}
+                write_frame(writer, 0x1, json.dumps(reply).encode())
+            await writer.drain()
+
+
+def internal_error(error):
+    """Error message of an unexpected exception (e.g. a crashed engine worker)"""
+    return f"Internal error: {type(error).__name__}: {error}"
+
+
+async def read_request(reader):
+    """Read one HTTP request: (method, path, headers, body), or None if the client went away"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _version = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload):
+    body = json.dumps(payload).encode()
+    writer.write((f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+                  "Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body)
+
+
+async def read_frame(reader):
+    """Read one WebSocket frame (client frames are masked): (opcode, payload)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+def write_frame(writer, opcode, payload):
+    """Write one unfragmented, unmasked WebSocket frame"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack('>H', length)
+    else:
+        header += bytes([127]) + struct.pack('>Q', length)
+    writer.write(header + payload)
+
+
+async def serve(host, port, workers, queue_limit, deadline, record_path=None):
+    pool = EnginePool(workers, queue_limit)
+    await pool.start()
+    record_writer = None
+    if record_path:
+        from Chess_record import GameWriter
+        record_writer = GameWriter(record_path)
+    server = ChessServer(pool, deadline, record_writer)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port} with {pool.workers} engine workers")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await pool.close()
+        if record_writer:
+            server.finish_records()
+            record_writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many human-vs-bot games over HTTP/WebSocket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, help="Engine worker processes (default: CPU count)")
+    parser.add_argument('--queue-limit', type=int, default=DEFAULT_QUEUE_LIMIT,
+                        help=f"Jobs waiting per difficulty before new ones are rejected "
+                             f"(default: {DEFAULT_QUEUE_LIMIT})")
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE,
+                        help=f"Default seconds per bot move (default: {DEFAULT_DEADLINE})")
+    parser.add_argument('--record', help="Append every game to this binary game record file")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_limit, args.deadline,
+                          args.record))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Texel tuning of the evaluation constants
+Fits the piece values, piece-square tables and term weights of evaluate_board
+(Chess_Bot.EvalParams) to game results. With the king table picked by
+is_endgame, the classic evaluation is linear in those constants:
+- every piece adds its value and one table entry (white reads the table
+  rotated, black flipped and negated, as in evaluate_position)
+- mobility, king safety and pawn structure add their raw term times a weight
+so each position is stored as the table columns of its pieces plus the three
+raw terms. Positions are extracted from EPD/PGN files on a pool of worker
+processes, keeping only quiet ones (not in check, no capture winning material
+by static exchange), and cached as raw arrays that are memory-mapped for
+fitting. The fit minimizes the squared error between each game result and
+sigmoid(K * score) with full-batch Adam steps, after choosing K for the
+starting constants, and writes an EvalParams JSON file.
+
+Results come from the PGN Result header, or for EPD lines from a c9 or
+result operation or a trailing [1.0] / [0.5] / [0.0] or 1-0 / 1/2-1/2 / 0-1,
+always from white's point of view.
+
+Usage:
+    python Chess_tune.py games.pgn -o tuned.json
+    python Chess_tune.py quiet.epd -o tuned.json --cache features --workers 8 --epochs 500
+    python Chess_tune.py --cache features -o tuned.json     # refit from cached features
+    bot = ChessBot(params='tuned.json')
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import deque
+
+import chess
+import numpy as np
+
+from Chess_Bot import ChessBot, EvalParams, DEFAULT_EVAL_PARAMS
+from Chess_position import SearchBoard
+
+# Table columns: the pawn to queen tables, then the middlegame and endgame king tables
+TABLE_COLUMNS = 7 * 64
+# Black pieces use the negated white columns after them; the padding column is always zero
+PAD_COLUMN = 2 * TABLE_COLUMNS
+MAX_PIECES = 32
+TERMS = ('mobility', 'king_safety', 'pawn_structure')
+
+# Material value (index into the pawn to queen values, 5: none) of each table column
+COLUMN_MATERIAL = np.repeat([0, 1, 2, 3, 4, 5, 5], 64)
+
+# Parameter vector layout: table entries, pawn to queen values, term weights
+MATERIAL_OFFSET = TABLE_COLUMNS
+TERMS_OFFSET = MATERIAL_OFFSET + 5
+PARAMETERS = TERMS_OFFSET + len(TERMS)
+
+# The raw terms are tens of units where the tables are in centipawns, so their
+# weights take proportionally smaller steps
+TERM_STEP_SCALE = 0.01
+
+# Positions per extraction task, and PGN plies skipped at the start of each game
+CHUNK = 4096
+OPENING_PLIES = 8
+
+RESULT_SCORES = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5, '1.0': 1.0, '0.0': 0.0, '0.5': 0.5,
+                 '1': 1.0, '0': 0.0}
+TRAILING_RESULT = re.compile(r'\s*(?:\[([01](?:\.[05]0*)?)\]|"?(1-0|0-1|1/2-1/2)"?;?)\s*$')
+
+# Cached arrays: name -> (dtype, row width)
+CACHE_ARRAYS = {
+    'columns': (np.int16, MAX_PIECES),
+    'terms': (np.float32, len(TERMS)),
+    'results': (np.float32, 1),
+}
+
+# Bot owned by each worker process, for its evaluation terms and static exchange evaluation
+_worker_bot = None
+
+
+def read_epd_results(stream):
+    """Yield (fen, result) for every EPD/FEN line of the stream that carries a result"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        result = None
+        try:
+            board, operations = chess.Board.from_epd(line)
+            result = operations.get('c9', operations.get('result'))
+        except ValueError:
+            match = TRAILING_RESULT.search(line)
+            if match:
+                result = match.group(1) or match.group(2)
+                position = line[:match.start()]
+                try:
+                    board = chess.Board(position)
+                except ValueError:
+                    try:
+                        board, _operations = chess.Board.from_epd(position)
+                    except ValueError:
+                        result = None
+        result = RESULT_SCORES.get(str(result))
+        if result is None:
+            print(f"Skipping line {line_number} without a valid position and result",
+                  file=sys.stderr)
+            continue
+        yield board.fen(), result
+
+
+def read_pgn_results(stream):
+    """Yield (fen, result) for the mainline positions of every finished game after the opening"""
+    import chess.pgn
+
+    while True:
+        game = chess.pgn.read_game(stream)
+        if game is None:
+            break
+        result = RESULT_SCORES.get(game.headers.get('Result'))
+        if result is None:
+            continue
+        board = game.board()
+        for ply, move in enumerate(game.mainline_moves(), 1):
+            board.push(move)
+            if ply >= OPENING_PLIES:
+                yield board.fen(), result
+
+
+def read_labelled_positions(path, input_format=None):
+    """Stream (fen, result) pairs from an EPD or PGN file"""
+    if input_format is None:
+        input_format = 'pgn' if path.lower().endswith('.pgn') else 'epd'
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        if input_format == 'pgn':
+            yield from read_pgn_results(stream)
+        else:
+            yield from read_epd_results(stream)
+
+
+def table_column(piece_type, index, endgame):
+    """Column of a table entry; kings use the endgame table in endgames"""
+    if piece_type == chess.KING and endgame:
+        return 6 * 64 + index
+    return (piece_type - 1) * 64 + index
+
+
+def is_quiet(bot, board):
+    """No check, no game end and no capture that wins material by static exchange"""
+    if board.is_check() or not board.legal_moves:
+        return False
+    return not any(bot.see(board, move) > 0 for move in board.generate_legal_captures())
+
+
+def position_features(bot, board):
+    """Padded table columns of the pieces and the raw terms of a SearchBoard position"""
+    endgame = bot.is_endgame(board)
+    columns = []
+    for piece_type in chess.PIECE_TYPES:
+        for square in chess.scan_forward(board.pieces_mask(piece_type, chess.WHITE)):
+            columns.append(table_column(piece_type, 63 - square, endgame))
+        for square in chess.scan_forward(board.pieces_mask(piece_type, chess.BLACK)):
+            columns.append(TABLE_COLUMNS + table_column(piece_type, square, endgame))
+    columns += [PAD_COLUMN] * (MAX_PIECES - len(columns))
+    terms = (bot.evaluate_mobility(board), bot.evaluate_king_safety(board),
+             bot.evaluate_pawn_structure(board))
+    return columns, terms
+
+
+def init_worker():
+    global _worker_bot
+    _worker_bot = ChessBot()
+
+
+def extract_chunk(tasks):
+    """Features of the quiet positions among a chunk of (fen, result) pairs"""
+    columns = []
+    terms = []
+    results = []
+    for fen, result in tasks:
+        board = SearchBoard(fen)
+        if chess.popcount(board.occupied) > MAX_PIECES or not is_quiet(_worker_bot, board):
+            continue
+        position_columns, position_terms = position_features(_worker_bot, board)
+        columns.append(position_columns)
+        terms.append(position_terms)
+        results.append(result)
+    return (np.array(columns, dtype=np.int16).reshape(-1, MAX_PIECES),
+            np.array(terms, dtype=np.float32).reshape(-1, len(TERMS)),
+            np.array(results, dtype=np.float32))
+
+
+def extract_features(input_path, cache_dir, input_format=None, workers=None, limit=None):
+    """
+    Extract the quiet positions of input_path into cache_dir on a pool of
+    worker processes and return their count
+    Chunks are appended to the cache files as they finish, with a bounded
+    number in flight, so the input is never held in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4
+    os.makedirs(cache_dir, exist_ok=True)
+    files = {name: open(os.path.join(cache_dir, name + '.bin'), 'wb') for name in CACHE_ARRAYS}
+    read = 0
+    count = 0
+    start_time = time.time()
+
+    def write(arrays):
+        nonlocal count
+        for name, array in zip(CACHE_ARRAYS, arrays):
+            files[name].write(array.tobytes())
+        count += len(arrays[-1])
+
+    try:
+        with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+            pending = deque()
+            chunk = []
+            for fen, result in read_labelled_positions(input_path, input_format):
+                if limit is not None and read >= limit:
+                    break
+                read += 1
+                chunk.append((fen, result))
+                if len(chunk) < CHUNK:
+                    continue
+                pending.append(pool.apply_async(extract_chunk, (chunk,)))
+                chunk = []
+                while len(pending) >= window:
+                    write(pending.popleft().get())
+            if chunk:
+                pending.append(pool.apply_async(extract_chunk, (chunk,)))
+            while pending:
+                write(pending.popleft().get())
+    finally:
+        for file in files.values():
+            file.close()
+
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as stream:
+        json.dump({'source': input_path, 'read': read, 'positions': count}, stream)
+    elapsed = time.time() - start_time
+    print(f"Extracted {count} quiet positions out of {read} in {elapsed:.1f} seconds",
+          file=sys.stderr)
+    return count
+
+
+def load_features(cache_dir):
+    """Memory-mapped (columns, terms, results) arrays of a feature cache"""
+    with open(os.path.join(cache_dir, 'meta.json')) as stream:
+        count = json.load(stream)['positions']
+    arrays = []
+    for name, (dtype, width) in CACHE_ARRAYS.items():
+        shape = (count, width) if width > 1 else (count,)
+        if not count:
+            arrays.append(np.zeros(shape, dtype=dtype))
+            continue
+        arrays.append(np.memmap(os.path.join(cache_dir, name + '.bin'), dtype=dtype,
+                                mode='r', shape=shape))
+    return tuple(arrays)
+
+
+def params_to_vector(params):
+    """Parameter vector of an EvalParams, in the MATERIAL_OFFSET / TERMS_OFFSET layout"""
+    tables = [params.piece_tables[piece_type] for piece_type in chess.PIECE_TYPES]
+    tables.append(params.king_table_endgame)
+    material = [params.piece_values[piece_type] for piece_type in chess.PIECE_TYPES[:5]]
+    terms = [params.term_weights[term] for term in TERMS]
+    return np.concatenate([np.ravel(tables), material, terms]).astype(np.float64)
+
+
+def vector_to_params(vector):
+    """EvalParams of a parameter vector, rounded for the JSON file"""
+    tables = np.round(vector[:TABLE_COLUMNS], 2).reshape(7, 64).tolist()
+    return EvalParams(
+        piece_values={piece_type: round(float(vector[MATERIAL_OFFSET + index]), 2)
+                      for index, piece_type in enumerate(chess.PIECE_TYPES[:5])},
+        piece_tables=dict(zip(chess.PIECE_TYPES, tables[:6])),
+        king_table_endgame=tables[6],
+        term_weights={term: round(float(vector[TERMS_OFFSET + index]), 4)
+                      for index, term in enumerate(TERMS)})
+
+
+class TexelTuner:
+    """
+    Full-batch gradient descent on the mean squared error between game
+    results and sigmoid(K * score) over cached features
+    Positions are processed in slices of batch_size rows, so the memory-mapped
+    arrays never have to fit in memory.
+    """
+    def __init__(self, features, params=None, batch_size=1 << 20):
+        self.columns, self.terms, self.results = features
+        self.vector = params_to_vector(params or DEFAULT_EVAL_PARAMS)
+        self.batch_size = batch_size
+        self.scale = 1.0
+
+    def slices(self):
+        for start in range(0, len(self.results), self.batch_size):
+            end = start + self.batch_size
+            yield (np.asarray(self.columns[start:end]), np.asarray(self.terms[start:end]),
+                   np.asarray(self.results[start:end]))
+
+    def column_values(self, vector):
+        """Score contribution of each piece column: white, negated black, padding"""
+        material = np.append(vector[MATERIAL_OFFSET:TERMS_OFFSET], 0)
+        values = vector[:TABLE_COLUMNS] + material[COLUMN_MATERIAL]
+        return np.concatenate([values, -values, [0]])
+
+    def scores(self, vector=None):
+        """Evaluation of every cached position from white's point of view"""
+        vector = self.vector if vector is None else vector
+        values = self.column_values(vector)
+        return np.concatenate([values[columns].sum(axis=1) + terms @ vector[TERMS_OFFSET:]
+                               for columns, terms, _results in self.slices()])
+
+    def loss(self, scores, scale):
+        expected = 1 / (1 + 10 ** (-scale * scores / 400))
+        return float(np.mean((np.asarray(self.results) - expected) ** 2))
+
+    def fit_scale(self, low=0.05, high=5.0, steps=40):
+        """Golden-section search for the K that fits the starting constants best"""
+        scores = self.scores()
+        ratio = (5 ** 0.5 - 1) / 2
+        for _ in range(steps):
+            left = high - ratio * (high - low)
+            right = low + ratio * (high - low)
+            if self.loss(scores, left) < self.loss(scores, right):
+                high = right
+            else:
+                low = left
+        self.scale = (low + high) / 2
+        return self.scale
+
+    def gradient(self):
+        """(loss, gradient) of the mean squared error at the current parameters"""
+        vector = self.vector
+        values = self.column_values(vector)
+        scale = self.scale * np.log(10) / 400
+        count = len(self.results)
+        column_gradient = np.zeros(PAD_COLUMN + 1)
+        term_gradient = np.zeros(len(TERMS))
+        total = 0.0
+        for columns, terms, results in self.slices():
+            scores = values[columns].sum(axis=1) + terms @ vector[TERMS_OFFSET:]
+            expected = 1 / (1 + np.exp(-scale * scores))
+            error = results - expected
+            total += float(error @ error)
+            # Derivative of the squared error by each position's score
+            score_gradient = -2 * error * expected * (1 - expected) * scale / count
+            column_gradient += np.bincount(columns.ravel(), minlength=PAD_COLUMN + 1,
+                                           weights=np.repeat(score_gradient, MAX_PIECES))
+            term_gradient += terms.T @ score_gradient
+
+        # Black columns hold the negated white values
+        table_gradient = column_gradient[:TABLE_COLUMNS] - column_gradient[TABLE_COLUMNS:PAD_COLUMN]
+        material_gradient = np.bincount(COLUMN_MATERIAL, weights=table_gradient, minlength=6)[:5]
+        return total / count, np.concatenate([table_gradient, material_gradient, term_gradient])
+
+    def fit(self, epochs=200, learning_rate=1.0, report_every=20):
+        """Adam steps of about learning_rate centipawns; returns the final loss"""
+        steps = np.full(PARAMETERS, learning_rate)
+        steps[TERMS_OFFSET:] *= TERM_STEP_SCALE
+        first_moment = np.zeros(PARAMETERS)
+        second_moment = np.zeros(PARAMETERS)
+        beta1, beta2 = 0.9, 0.999
+        loss = None
+        for epoch in range(1, epochs + 1):
+            loss, gradient = self.gradient()
+            first_moment = beta1 * first_moment + (1 - beta1) * gradient
+            second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+            corrected_first = first_moment / (1 - beta1 ** epoch)
+            corrected_second = second_moment / (1 - beta2 ** epoch)
+            self.vector -= steps * corrected_first / (np.sqrt(corrected_second) + 1e-12)
+            if report_every and (epoch % report_every == 0 or epoch == 1):
+                print(f"epoch {epoch}: loss {loss:.6f}", file=sys.stderr)
+        return loss
+
+    def params(self):
+        return vector_to_params(self.vector)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the evaluation constants on game results")
+    parser.add_argument('input', nargs='?', help="EPD or PGN file with game results")
+    parser.add_argument('-o', '--output', required=True, help="EvalParams JSON file to write")
+    parser.add_argument('--input-format', choices=['epd', 'pgn'],
+                        help="Input format (default: from the file extension)")
+    parser.add_argument('--cache', help="Feature cache directory; without an input it is reused "
+                                        "(default: <input>.features)")
+    parser.add_argument('--workers', type=int, help="Extraction processes (default: CPU count)")
+    parser.add_argument('--limit', type=int, help="Read at most this many input positions")
+    parser.add_argument('--params', help="EvalParams JSON file to start from (default: built-in)")
+    parser.add_argument('--epochs', type=int, default=200, help="Gradient steps (default: 200)")
+    parser.add_argument('--learning-rate', type=float, default=1.0,
+                        help="Step size in centipawns (default: 1.0)")
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.cache:
+        parser.error("an input file or --cache is required")
+    cache_dir = args.cache or args.input + '.features'
+    if args.input:
+        extract_features(args.input, cache_dir, args.input_format, args.workers, args.limit)
+
+    features = load_features(cache_dir)
+    if not len(features[2]):
+        parser.error("no quiet positions with results to tune on")
+    tuner = TexelTuner(features, EvalParams.load(args.params) if args.params else None)
+    start_time = time.time()
+    scale = tuner.fit_scale()
+    start_loss = tuner.loss(tuner.scores(), scale)
+    print(f"{len(features[2])} positions, K = {scale:.3f}, loss {start_loss:.6f}", file=sys.stderr)
+    loss = tuner.fit(args.epochs, args.learning_rate)
+    tuner.params().save(args.output)
+    print(f"Loss {start_loss:.6f} -> {loss:.6f} in {time.time() - start_time:.1f} seconds, "
+          f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()